@@ -0,0 +1,225 @@
+"""Executive brief PDF generation, run in the background and cached on disk.
+
+`submit_brief` queues a brief on a small shared worker pool and returns a `BriefJob`
+the page polls for progress. Finished PDFs are stored under `data/.cache/briefs/`,
+keyed on the CSV and DB versions plus the brief parameters, so asking for the same
+brief again (from any session, or after a restart) returns the stored file at once.
+
+Charts are drawn with matplotlib's object API (no pyplot global state), which lets
+them render concurrently on the chart pool.
+"""
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from io import BytesIO
+from pathlib import Path
+
+from matplotlib.figure import Figure
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+import db
+from ingest import source_version
+from utils import SUMMARY_CACHE_DIR, compute_company_yoy_growth, industry_heatmap_matrix, stored_stream_summary
+
+BRIEF_CACHE_DIR = os.path.join(SUMMARY_CACHE_DIR, 'briefs')
+BRIEF_VERSION = '3'  # bump when the PDF layout or its inputs change
+BRIEF_WORKERS = 2  # briefs generated at once
+CHART_WORKERS = 3  # charts rendered at once per brief
+
+_briefs = ThreadPoolExecutor(max_workers=BRIEF_WORKERS, thread_name_prefix='brief')
+_charts = ThreadPoolExecutor(max_workers=CHART_WORKERS, thread_name_prefix='brief-chart')
+_jobs = {}
+_lock = threading.Lock()
+
+
+def brief_path(csv_path, db_path, sample_size=20000, clip_pct=99, cache_dir=BRIEF_CACHE_DIR):
+    """Artifact file of a brief; the name changes whenever the CSV, the DB or a parameter does."""
+    slot = (str(Path(csv_path).resolve()), str(Path(db_path).resolve()), int(sample_size), int(clip_pct), BRIEF_VERSION)
+    version = (source_version(csv_path), db.db_version(db_path))
+    return Path(cache_dir) / f'brief-{_digest(slot)}-{_digest(version)}.pdf'
+
+
+def _digest(key):
+    return hashlib.sha1(repr(key).encode()).hexdigest()[:16]
+
+
+class BriefJob:
+    """Handle of one brief: `progress` (0..1) and `message` while it runs, then `pdf()` or `error`."""
+
+    def __init__(self, path):
+        self.path = path
+        self.progress = 0.0
+        self.message = 'Queued'
+        self.error = None
+        self.cached = False
+        self.future = None
+
+    @property
+    def done(self):
+        return self.future is None or self.future.done()
+
+    def update(self, progress, message):
+        self.progress, self.message = progress, message
+
+    def pdf(self):
+        return self.path.read_bytes()
+
+
+def _png(fig):
+    buf = BytesIO()
+    fig.savefig(buf, format='png', bbox_inches='tight')
+    return buf.getvalue()
+
+
+def postings_chart(summary):
+    fig = Figure(figsize=(8, 3))
+    ax = fig.subplots()
+    summary['postings_over_time'].plot(ax=ax)
+    ax.set_title('Postings over time')
+    ax.set_xlabel('Period')
+    ax.set_ylabel('Postings')
+    return _png(fig)
+
+
+def salary_chart(summary, clip_pct=99):
+    digest = summary['salary_digest']
+    fig = Figure(figsize=(8, 3))
+    ax = fig.subplots()
+    if digest.count:
+        bins = summary['salary_hist'].to_frame(upper=digest.quantile(clip_pct / 100), max_bins=40)
+        ax.bar(bins['bin_start'], bins['count'], width=bins['bin_end'] - bins['bin_start'], align='edge', color='tab:green')
+        ax.set_title(f'Salary distribution (all postings, clipped at p{clip_pct})')
+    else:
+        ax.text(0.5, 0.5, 'No salary data', ha='center')
+    return _png(fig)
+
+
+def heatmap_chart(hm):
+    """Industry x period heatmap of an `industry_heatmap_matrix` frame."""
+    fig = Figure(figsize=(8, 4))
+    ax = fig.subplots()
+    im = ax.imshow(hm.to_numpy(), aspect='auto', cmap='Reds', interpolation='nearest')
+    fig.colorbar(im, ax=ax)
+    ax.set_yticks(range(len(hm.index)), hm.index)
+    ticks = list(range(0, hm.shape[1], max(1, hm.shape[1] // 8)))
+    ax.set_xticks(ticks, [str(hm.columns[i]).split('/')[0] for i in ticks], rotation=45, ha='right')
+    ax.set_title('Industry heatmap (top 10)')
+    return _png(fig)
+
+
+def render_pdf(summary, imgs, yoy):
+    """The brief as PDF bytes: KPIs, the chart images and the top YoY movers."""
+    pdf_buf = BytesIO()
+    c = canvas.Canvas(pdf_buf, pagesize=letter)
+    width, height = letter
+    # Title
+    c.setFont('Helvetica-Bold', 16)
+    c.drawString(40, height - 40, 'Executive Brief — SG Job Market')
+    c.setFont('Helvetica', 10)
+    c.drawString(40, height - 58, f'Generated: {datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")}')
+    # Write KPIs
+    c.drawString(40, height - 80, f"Total postings: {summary['total_rows']:,}")
+    c.drawString(240, height - 80, f"Open: {summary['status_counts'].get('Open', 0):,}")
+    c.drawString(40, height - 96, f"Avg salary: ${summary['average_salary']:.0f}")
+    # Add images
+    y = height - 140
+    for title, img in imgs:
+        if y < 200:
+            c.showPage()
+            y = height - 40
+        c.setFont('Helvetica-Bold', 12)
+        c.drawString(40, y, title)
+        y -= 16
+        c.drawImage(ImageReader(BytesIO(img)), 40, y - 160, width=520, height=150, preserveAspectRatio=True)
+        y -= 170
+    # Add YoY table
+    if not yoy.empty:
+        c.showPage()
+        c.setFont('Helvetica-Bold', 12)
+        c.drawString(40, height - 40, 'Top YoY company movers')
+        y = height - 60
+        c.setFont('Helvetica', 9)
+        for row in yoy.itertuples(index=False):
+            c.drawString(40, y, f"{row.company[:40]:40} | {row.last_year_total:6} | {row.prev_year_total:6} | {row.yoy_pct:.1f}%")
+            y -= 14
+            if y < 60:
+                c.showPage()
+                y = height - 40
+    c.save()
+    return pdf_buf.getvalue()
+
+
+def render_charts(summary, hm, clip_pct=99, pool=None):
+    """(title, PNG bytes) of the brief's charts, rendered concurrently on `pool` when given."""
+    charts = [('Postings', postings_chart, (summary,)), ('Salaries', salary_chart, (summary, clip_pct))]
+    if not hm.empty:
+        charts.append(('Heatmap', heatmap_chart, (hm,)))
+    if pool is None:
+        return [(title, fn(*args)) for title, fn, args in charts]
+    futures = [(title, pool.submit(fn, *args)) for title, fn, args in charts]
+    return [(title, future.result()) for title, future in futures]
+
+
+def generate_brief(csv_path, hm, yoy, sample_size=20000, clip_pct=99, progress=lambda fraction, message: None):
+    """Build the brief PDF bytes from the industry heatmap and company YoY frames of the DB.
+
+    Reports `progress(fraction, message)` between steps. Runs off the script thread, so it only
+    uses the on-disk summary cache; the DB frames are read by the caller.
+    """
+    progress(0.05, 'Summarising postings (first run after the CSV changes scans the whole file)...')
+    summary = stored_stream_summary(csv_path, sample_size=sample_size, date_freq='W')
+    progress(0.5, 'Rendering charts...')
+    imgs = render_charts(summary, hm, clip_pct, _charts)
+    progress(0.9, 'Laying out PDF...')
+    return render_pdf(summary, imgs, yoy)
+
+
+def _run(job, csv_path, hm, yoy, sample_size, clip_pct):
+    try:
+        pdf = generate_brief(csv_path, hm, yoy, sample_size, clip_pct, job.update)
+        job.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = job.path.with_name(f'{job.path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        tmp.write_bytes(pdf)
+        os.replace(tmp, job.path)
+        # drop briefs of older data versions with the same settings
+        slot = job.path.name.rsplit('-', 1)[0]
+        for stale in job.path.parent.glob(f'{slot}-*.pdf'):
+            if stale != job.path:
+                stale.unlink(missing_ok=True)
+        job.update(1.0, 'PDF ready')
+    except Exception as e:
+        job.error = e
+    finally:
+        with _lock:
+            _jobs.pop(job.path, None)
+
+
+def submit_brief(csv_path, db_path, sample_size=20000, clip_pct=99, cache_dir=BRIEF_CACHE_DIR):
+    """Start (or join) generation of a brief and return its BriefJob.
+
+    A brief already on disk comes back as a finished job; a brief already being generated
+    by another session is shared rather than started twice.
+    """
+    path = brief_path(csv_path, db_path, sample_size, clip_pct, cache_dir)
+    with _lock:
+        if path in _jobs:
+            return _jobs[path]
+        if path.exists():
+            job = BriefJob(path)
+            job.cached = True
+            job.update(1.0, 'PDF ready (cached)')
+            return job
+    # the DB reads use Streamlit caches, so they run here on the script thread, not in the worker
+    hm = industry_heatmap_matrix(db_path, top_n=10)
+    yoy = compute_company_yoy_growth(db_path, top_n=10)
+    with _lock:
+        if path in _jobs:
+            return _jobs[path]
+        job = BriefJob(path)
+        _jobs[path] = job
+        job.future = _briefs.submit(_run, job, csv_path, hm, yoy, int(sample_size), int(clip_pct))
+    return job
@@ -0,0 +1,134 @@
+"""Chart data reduction: shrink long frames before they are serialized to the browser.
+
+Every Altair chart ships its data to the browser on each rerun (Streamlit sends it as
+Arrow). These helpers keep that payload bounded however large the selection is:
+time series are downsampled per line (LTTB or min-max), categories beyond the top k
+are folded into one "Other" series, and a final row cap catches anything left over.
+"""
+import numpy as np
+import pandas as pd
+
+from ingest import compact_dtypes
+
+CHART_MAX_POINTS = 400  # per line
+CHART_MAX_ROWS = 20000  # per chart
+CHART_MAX_CELLS = 5000  # per heatmap
+
+
+def _buckets(n, n_buckets):
+    """Boundaries of n_buckets contiguous, non-empty buckets over positions 1..n-2."""
+    return np.linspace(1, n - 1, n_buckets + 1).astype('int64')
+
+
+def lttb(x, y, n_out):
+    """Positions of the n_out points kept by Largest-Triangle-Three-Buckets (first and last always kept)."""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    edges = _buckets(n, n_out - 2)
+    keep = np.empty(n_out, dtype='int64')
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            nx, ny = x[hi:edges[i + 2]].mean(), y[hi:edges[i + 2]].mean()
+        else:
+            nx, ny = x[-1], y[-1]
+        # twice the area of the triangle (previous pick, candidate, next bucket's centroid)
+        area = np.abs((x[a] - nx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (ny - y[a]))
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+def minmax(y, n_out):
+    """Positions of each bucket's minimum and maximum (about n_out points, spikes always kept)."""
+    n = len(y)
+    if n_out >= n or n_out < 4:
+        return np.arange(n)
+    y = np.asarray(y, dtype='float64')
+    edges = _buckets(n, (n_out - 2) // 2)
+    keep = [0, n - 1]
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        keep += [lo + int(y[lo:hi].argmin()), lo + int(y[lo:hi].argmax())]
+    return np.unique(keep)
+
+
+DOWNSAMPLERS = {'lttb': lttb, 'minmax': lambda x, y, n_out: minmax(y, n_out)}
+
+
+def downsample(df, x, y, by=None, max_points=CHART_MAX_POINTS, method='lttb'):
+    """At most max_points rows per line (per `by` group), sorted by x; shorter lines are kept whole."""
+    pick = DOWNSAMPLERS[method]
+    groups = df.groupby(by, sort=False, observed=True) if by else [(None, df)]
+    parts = []
+    for _, g in groups:
+        g = g.sort_values(x)
+        xs = g[x]
+        xs = xs.astype('int64') if pd.api.types.is_datetime64_any_dtype(xs) else xs.astype('float64')
+        parts.append(g.iloc[pick(xs.to_numpy(), g[y].to_numpy(), max_points)])
+    return pd.concat(parts, ignore_index=True) if parts else df
+
+
+def top_k_other(df, category, value, k=10, other='Other', agg='sum'):
+    """Keep the k largest categories (by `agg` of `value`) and fold the rest into one `other` row per key.
+
+    The keys are every column other than `category` and `value` (e.g. the period), so the
+    folded series lines up with the kept ones.
+    """
+    ranked = df.groupby(category, observed=True)[value].agg(agg).sort_values(ascending=False)
+    if len(ranked) <= k + 1:
+        return df
+    kept = df[category].isin(ranked.index[:k])
+    keys = [c for c in df.columns if c not in (category, value)]
+    rest = df[~kept].groupby(keys, observed=True, dropna=False)[value].agg(agg).reset_index()
+    rest[category] = f'{other} ({len(ranked) - k} more)'
+    out = pd.concat([df[kept].astype({category: object}), rest[df.columns]], ignore_index=True)
+    return out
+
+
+def cap_rows(df, max_rows=CHART_MAX_ROWS):
+    """(first max_rows rows, number of rows dropped)."""
+    return df.iloc[:max_rows], max(0, len(df) - max_rows)
+
+
+def chart_data(df, x, y, color=None, top_k=None, agg='sum', max_points=CHART_MAX_POINTS, max_rows=CHART_MAX_ROWS,
+               method='lttb'):
+    """Reduce a long (x, y[, color]) frame for a line chart; returns (frame, notes for the page to show).
+
+    Only the chart columns are kept and their dtypes compacted (repeated labels become
+    categoricals, i.e. dictionary-encoded in the Arrow payload).
+    """
+    cols = [c for c in (x, y, color) if c]
+    df = df[cols]
+    notes = []
+    if color and top_k:
+        n = df[color].nunique()
+        df = top_k_other(df, color, y, k=top_k, agg=agg)
+        if df[color].nunique() < n:
+            notes.append(f'Showing the top {top_k} of {n:,} {color} series; the rest are combined as "Other".')
+    n = len(df)
+    df = downsample(df, x, y, by=color, max_points=max_points, method=method)
+    if len(df) < n:
+        notes.append(f'Lines downsampled to at most {max_points} points each ({len(df):,} of {n:,} points drawn).')
+    df, dropped = cap_rows(df, max_rows)
+    if dropped:
+        notes.append(f'Chart capped at {max_rows:,} points; {dropped:,} not drawn. Narrow the selection to see them.')
+    return compact_dtypes(df.copy()), notes
+
+
+def coarsen_columns(values, max_cells=CHART_MAX_CELLS):
+    """Average adjacent columns of a (rows x time) array so it has at most max_cells cells.
+
+    Returns (values, first column of each merged cell); values are unchanged when they fit.
+    """
+    n_rows, n = values.shape
+    step = -(-n // max(1, max_cells // max(1, n_rows)))
+    starts = np.arange(0, n, max(1, step))
+    if step <= 1:
+        return values, starts
+    sums = np.add.reduceat(values.astype('float64'), starts, axis=1)
+    return sums / np.diff(np.append(starts, n)), starts
@@ -0,0 +1,170 @@
+"""Shared read-only access to `visual.db` for the Streamlit pages and `utils` helpers.
+
+- `get_pool` keeps one process-wide pool of read-only SQLite connections per DB file
+  (`st.cache_resource`), so sessions and reruns do not reconnect.
+- `read_sql` / `fetch_all` cache results keyed on (DB, SQL, params, DB version) in a
+  size-bounded LRU shared by all sessions. The DB version is the mtime/size of the DB
+  and its WAL file, so a rebuild invalidates every cached result automatically.
+
+Cached DataFrames are copied on the way out; callers may modify what they get back.
+"""
+import os
+import queue
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+
+DEFAULT_DB = 'data/visual.db'
+POOL_SIZE = 4
+CACHE_MAX_ENTRIES = 256
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+class ConnectionPool:
+    """A small, thread-safe pool of read-only connections to one SQLite file."""
+
+    def __init__(self, db_path, size=POOL_SIZE):
+        self.db_path = str(db_path)
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+
+    def _connect(self):
+        uri = Path(self.db_path).resolve().as_uri() + '?mode=ro'
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn.execute('PRAGMA query_only=ON')
+        conn.execute('PRAGMA mmap_size=268435456')
+        conn.execute('PRAGMA cache_size=-32768')  # 32MB per connection
+        return conn
+
+    @contextmanager
+    def connection(self, timeout=30):
+        """Check a connection out for the duration of the `with` block."""
+        conn = None
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                grow = self._created < self.size
+                if grow:
+                    self._created += 1
+            if grow:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                conn = self._idle.get(timeout=timeout)
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+
+class QueryCache:
+    """Thread-safe LRU of query results, bounded by entry count and approximate bytes."""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _sizeof(value):
+        if isinstance(value, pd.DataFrame):
+            return int(value.memory_usage(index=True, deep=True).sum())
+        return sys.getsizeof(value) + sum(sys.getsizeof(r) for r in value)
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            return self._items[key][0]
+
+    def put(self, key, value):
+        size = self._sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                self._bytes -= self._items.pop(key)[1]
+            self._items[key] = (value, size)
+            self._bytes += size
+            while len(self._items) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self._bytes -= evicted
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+
+def db_version(db_path=DEFAULT_DB):
+    """Fingerprint that changes whenever the DB (or its WAL) is written."""
+    parts = []
+    for p in (db_path, f'{db_path}-wal'):
+        try:
+            st_ = os.stat(p)
+            parts.append((st_.st_ino, st_.st_size, st_.st_mtime_ns))
+        except FileNotFoundError:
+            parts.append(None)
+    return tuple(parts)
+
+
+@st.cache_resource
+def _pool(db_path, inode):
+    return ConnectionPool(db_path)
+
+
+def get_pool(db_path=DEFAULT_DB):
+    """Process-wide pool for `db_path` (a new pool if the file was replaced)."""
+    db_path = str(db_path)
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f'SQLite DB not found: {db_path}')
+    return _pool(os.path.abspath(db_path), os.stat(db_path).st_ino)
+
+
+@st.cache_resource
+def query_cache():
+    """The process-wide result cache shared by all sessions."""
+    return QueryCache()
+
+
+def _cached(kind, sql, params, db_path, run):
+    key = (kind, os.path.abspath(str(db_path)), db_version(db_path), sql, tuple(params))
+    cache = query_cache()
+    hit = cache.get(key)
+    if hit is None:
+        with get_pool(db_path).connection() as conn:
+            hit = run(conn)
+        cache.put(key, hit)
+    return hit
+
+
+def read_sql(sql, params=(), db_path=DEFAULT_DB):
+    """Run a SELECT through the pool and return a DataFrame (cached per DB version)."""
+    df = _cached('df', sql, params, db_path, lambda conn: pd.read_sql(sql, conn, params=tuple(params)))
+    return df.copy()
+
+
+def fetch_all(sql, params=(), db_path=DEFAULT_DB):
+    """Run a SELECT through the pool and return a list of row tuples (cached per DB version)."""
+    rows = _cached('rows', sql, params, db_path, lambda conn: conn.execute(sql, tuple(params)).fetchall())
+    return list(rows)
+
+
+def has_table(name, db_path=DEFAULT_DB):
+    return bool(fetch_all("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,), db_path))
@@ -0,0 +1,277 @@
+"""Optional DuckDB engine for the full-scan workloads (`build_visual_db`, `stream_summary`).
+
+DuckDB reads the CSV (or its fresher Parquet copy, see `ingest.resolve_source`) once
+with its parallel reader; the joins and group-bys then run as multi-threaded SQL.
+Parsing is not re-implemented in SQL: each messy column (dates, vacancies,
+categories, salaries, experience, titles) is reduced to its distinct values, those
+go through the pandas path's own functions (`coerce_chunk`, `parse_salary_strings`,
+`title_keywords`, ...) once, and the results are joined back, so both engines agree
+by construction.
+
+`aggregate` returns exactly what `build_visual_db.aggregate_source` does and
+`summary` what `utils.stream_summary` does (sample rows are drawn differently).
+Select the engine with `build_visual_db.py --engine duckdb` or
+`stream_summary(..., engine='duckdb')`; `python scripts/benchmark.py engine` checks
+parity and times both.
+"""
+from collections import Counter
+
+import pandas as pd
+
+from ingest import _raw_columns, coerce_chunk, primary_categories, resolve_source, title_keywords, title_token_counts
+from salary import SALARY_BIN_WIDTH, SALARY_BINS, experience_bucket, parse_salary_strings, salary_type_factor
+from sketches import FixedHistogram, TDigest
+
+try:
+    import duckdb
+except ImportError:  # pragma: no cover - optional engine, the pandas path needs nothing extra
+    duckdb = None
+
+# pandas.read_csv's default missing-value strings, so both readers see the same nulls
+NA_STRINGS = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN', '<NA>', 'N/A',
+              'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null']
+
+SOURCE_COLUMNS = ['metadata_newPostingDate', 'postedCompany_name', 'numberOfVacancies', 'categories', 'primary_category',
+                  'salary_minimum', 'salary_maximum', 'average_salary', 'salary_type', 'positionLevels',
+                  'minimumYearsExperience', 'title', 'status_jobStatus']
+
+
+def available():
+    return duckdb is not None
+
+
+def connect(threads=None):
+    """In-memory DuckDB connection (all cores unless `threads` is given)."""
+    if duckdb is None:
+        raise ImportError('the duckdb engine needs the duckdb package (pip install duckdb)')
+    con = duckdb.connect()
+    if threads:
+        con.execute(f'SET threads = {int(threads)}')
+    return con
+
+
+def _quote(path):
+    return "'" + str(path).replace("'", "''") + "'"
+
+
+def _load_source(con, path):
+    """Read the source once into temp table `src` with every SOURCE_COLUMNS column (NULL when absent).
+
+    CSV columns stay text, as the pandas reader sees them (dtype=str); the Parquet copy keeps
+    its types. Returns the columns the source actually has.
+    """
+    kind, p = resolve_source(path)
+    if kind == 'parquet':
+        reader = f'read_parquet({_quote(p)})'
+    else:
+        nulls = ', '.join(_quote(s) for s in NA_STRINGS)
+        reader = (f"read_csv({_quote(p)}, header = true, all_varchar = true, delim = ',', quote = '\"', "
+                  f"escape = '\"', null_padding = true, nullstr = [{nulls}])")
+    present = [r[0] for r in con.execute(f'DESCRIBE SELECT * FROM {reader}').fetchall()]
+    cols = ', '.join(f'"{c}"' if c in present else f'NULL::VARCHAR AS "{c}"' for c in SOURCE_COLUMNS)
+    con.execute(f'CREATE OR REPLACE TEMP TABLE src AS SELECT {cols} FROM {reader}')
+    return [c for c in SOURCE_COLUMNS if c in present]
+
+
+def _mapping(con, name, col, derived):
+    """Register table `name`: the distinct values of src column `col` (as `raw`) plus `derived` columns.
+
+    `derived` gets the values typed by `coerce_chunk` and returns {column: values}.
+    """
+    raw = con.execute(f'SELECT DISTINCT "{col}" FROM src').df()
+    out = pd.DataFrame({'raw': raw[col]})
+    for c, values in derived(coerce_chunk(raw)[col]).items():
+        out[c] = values.to_numpy() if isinstance(values, pd.Series) else values
+    con.register(name, out)
+    return f'LEFT JOIN {name} ON src."{col}" IS NOT DISTINCT FROM {name}.raw'
+
+
+def _salary_sql():
+    """SQL of the monthly salary midpoint; the row-wise half of `salary.normalize_salaries`.
+
+    The per-value half (`parse_salary_strings`, `salary_type_factor`) comes from the
+    s_min / s_max / s_avg / s_type mappings.
+    """
+    lo = 'COALESCE(s_min.low, s_max.low)'
+    hi = 'COALESCE(s_max.high, s_min.high)'
+    # LEAST / GREATEST skip NULLs like np.fmin / np.fmax
+    mid = f'COALESCE(s_avg.mid, (LEAST({lo}, {hi}) + GREATEST({lo}, {hi})) / 2)'
+    has_period = '(s_min.has_period OR s_max.has_period)'
+    scaled = f'(s_avg.has_period OR (s_avg.mid IS NULL AND {has_period}))'
+    return f'{mid} * CASE WHEN {scaled} THEN 1.0 ELSE s_type.factor END'
+
+
+def _prepare(con, path, date_freq='W'):
+    """Create table `r`: one row per posting with every derived column both workloads need.
+
+    Returns the columns the source has (see `_load_source`).
+    """
+    present = _load_source(con, path)
+
+    def dates(ts):
+        return {'ts': ts, 'period_start': ts.dt.to_period(date_freq).dt.start_time,
+                'month_key': (ts.dt.year * 100 + ts.dt.month).astype('Int64')}
+
+    def vacancies(n):
+        # the build counts a missing value as one vacancy, the summary as none
+        return {'vacancies': n.fillna(1).astype('int64'), 'vacancies_whole': n.fillna(0).astype('int64')}
+
+    def categories(primary):
+        return {'primary_category': primary.astype(object),
+                'industry': primary.fillna('Unknown').replace('', 'Unknown').astype(object)}
+
+    def salary_part(values):
+        return parse_salary_strings(values)[['low', 'high', 'mid', 'has_period']].to_dict('series')
+
+    def experience(years):
+        return {'experience_bucket': experience_bucket(years).astype(object), 'experience_years': years}
+
+    # the CSV reader derives primary_category from categories; the Parquet copy stores it
+    if 'categories' in present:
+        cat_col, category_mapping = 'categories', lambda cats: categories(primary_categories(cats))
+    else:
+        cat_col, category_mapping = 'primary_category', categories
+    joins = [
+        _mapping(con, 'm_date', 'metadata_newPostingDate', dates),
+        _mapping(con, 'm_vac', 'numberOfVacancies', vacancies),
+        _mapping(con, 'm_cat', cat_col, category_mapping),
+        _mapping(con, 's_min', 'salary_minimum', salary_part),
+        _mapping(con, 's_max', 'salary_maximum', salary_part),
+        # the summary's average_salary KPI is the mean of the raw column
+        _mapping(con, 's_avg', 'average_salary',
+                 lambda v: {**salary_part(v), 'value': pd.to_numeric(v, errors='coerce').astype('float64')}),
+        _mapping(con, 's_type', 'salary_type', lambda v: {'factor': salary_type_factor(v)}),
+        _mapping(con, 'm_exp', 'minimumYearsExperience', experience),
+    ]
+    titles = con.execute('SELECT DISTINCT title FROM src WHERE title IS NOT NULL').df()['title']
+    codes, terms = title_keywords(titles)
+    con.register('m_title', pd.DataFrame({'raw': titles.to_numpy(object), 'code': codes}))
+    con.register('terms', terms)
+    joins.append('LEFT JOIN m_title ON src.title = m_title.raw')
+    con.execute(f'''
+        CREATE OR REPLACE TEMP TABLE r AS
+        WITH j AS (
+            SELECT src.postedCompany_name AS company, src.status_jobStatus AS status, src.title, src.positionLevels,
+                   m_date.ts, m_date.period_start, m_date.month_key, m_cat.primary_category, m_cat.industry,
+                   m_vac.vacancies, m_vac.vacancies_whole, {_salary_sql()} AS salary_mid,
+                   s_avg.value AS average_salary_value, m_exp.experience_bucket, m_exp.experience_years, m_title.code
+            FROM src {' '.join(joins)}
+        )
+        SELECT * EXCLUDE (positionLevels),
+               CASE WHEN salary_mid > 0 THEN LEAST(FLOOR(salary_mid / {SALARY_BIN_WIDTH}), {SALARY_BINS})::BIGINT
+               END AS salary_bin,
+               COALESCE(NULLIF(positionLevels, ''), 'Unspecified') AS position_level
+        FROM j
+    ''')
+    return present
+
+
+def _agg(con, sql, names, date_freq=None):
+    """Run a GROUP BY query whose first len(names) columns are the keys; periods come back as pd.Period."""
+    df = con.execute(sql).df()
+    if date_freq is not None:
+        df['period'] = pd.PeriodIndex(pd.DatetimeIndex(df['period']), freq=date_freq)
+    index = pd.MultiIndex.from_frame(df[names]) if len(df) else pd.MultiIndex.from_tuples([], names=names)
+    out = df.drop(columns=names)
+    out.index = index
+    return out.astype({c: 'int64' for c in out.columns if c != 'salary_sum'})
+
+
+def aggregate(path, date_freq='W', threads=None):
+    """The `aggregate_source` tuple: company, industry, salary cube, keyword and pair aggregates, rows, max date."""
+    con = connect(threads)
+    try:
+        _prepare(con, path, date_freq)
+        dated = 'FROM r WHERE period_start IS NOT NULL'
+        comp = _agg(con, f'SELECT COALESCE(company, \'UNKNOWN\') AS name, period_start AS period, '
+                         f'SUM(vacancies) AS vacancies, COUNT(*) AS postings {dated} GROUP BY 1, 2',
+                    ['name', 'period'], date_freq)
+        ind = _agg(con, f'SELECT industry AS name, period_start AS period, SUM(vacancies) AS vacancies, '
+                        f'COUNT(*) AS postings {dated} GROUP BY 1, 2', ['name', 'period'], date_freq)
+        cube = _agg(con, '''SELECT industry AS category, position_level, experience_bucket, month_key,
+                                   salary_bin AS bin, COUNT(*) AS postings, SUM(salary_mid) AS salary_sum
+                            FROM r WHERE salary_mid > 0 AND ts IS NOT NULL GROUP BY ALL''',
+                    ['category', 'position_level', 'experience_bucket', 'month_key', 'bin'])
+        by_term = _agg(con, f'''SELECT terms.term AS name, period_start AS period, SUM(vacancies) AS vacancies,
+                                       COUNT(*) AS postings
+                                FROM r JOIN terms ON r.code = terms.code
+                                WHERE period_start IS NOT NULL GROUP BY 1, 2''', ['name', 'period'], date_freq)
+        # pairs per distinct title, weighted by the dated postings carrying it
+        pairs = _agg(con, '''WITH w AS (SELECT code, COUNT(*) AS n FROM r
+                                        WHERE period_start IS NOT NULL AND code IS NOT NULL GROUP BY code)
+                             SELECT a.term AS term_a, b.term AS term_b, SUM(w.n) AS postings
+                             FROM terms a JOIN terms b ON a.code = b.code AND a.term <> b.term
+                             JOIN w ON w.code = a.code GROUP BY 1, 2''', ['term_a', 'term_b'])
+        rows, max_date = con.execute('SELECT COUNT(*), MAX(ts) FROM r').fetchone()
+    finally:
+        con.close()
+    return comp, ind, cube, by_term, pairs, int(rows), pd.Timestamp(max_date) if max_date is not None else pd.NaT
+
+
+def _sample_rows(con, present, sample_size, columns):
+    """Uniform sample of the source rows, typed like the pandas reader's chunks."""
+    if sample_size <= 0:
+        return pd.DataFrame()
+    cols = ', '.join(f'"{c}"' for c in dict.fromkeys(_raw_columns(columns) + columns) if c in present)
+    sample = con.execute(f'SELECT {cols} FROM src USING SAMPLE reservoir({int(sample_size)} ROWS) REPEATABLE (42)').df()
+    typed = coerce_chunk(sample)
+    return typed[[c for c in columns if c in typed.columns]].reset_index(drop=True)
+
+
+def summary(path, sample_size=20000, date_freq='W', threads=None):
+    """The `stream_summary` dict (sketch=False) computed by DuckDB; sample_rows is DuckDB's reservoir sample."""
+    from utils import SUMMARY_COLUMNS  # utils imports this module lazily
+    con = connect(threads)
+    try:
+        present = _prepare(con, path, date_freq)
+
+        def pairs(sql):
+            return [tuple(r) for r in con.execute(sql).fetchall()]
+
+        total_rows = con.execute('SELECT COUNT(*) FROM r').fetchone()[0]
+        status_counts = Counter(dict(pairs('SELECT COALESCE(status, \'\'), COUNT(*) FROM r GROUP BY 1')))
+        top_companies = pairs('SELECT COALESCE(company, \'\') AS c, COUNT(*) AS n FROM r GROUP BY 1 '
+                              'ORDER BY n DESC, c LIMIT 50')
+        unique_companies = con.execute('SELECT COUNT(DISTINCT COALESCE(company, \'\')) FROM r').fetchone()[0]
+        top_categories = pairs('SELECT primary_category AS c, COUNT(*) AS n FROM r WHERE primary_category IS NOT NULL '
+                               'GROUP BY 1 ORDER BY n DESC, c LIMIT 50')
+        titles = con.execute('SELECT title, COUNT(*) AS n FROM r WHERE title IS NOT NULL GROUP BY 1').df()
+        words = title_token_counts(titles['title'], titles['n'])
+        words = words.reset_index().sort_values(['n', 'token'], ascending=[False, True]).head(50)
+        experience_counts = Counter(dict(pairs('SELECT experience_years, COUNT(*) FROM r '
+                                               'WHERE experience_years IS NOT NULL GROUP BY 1')))
+        unspecified = con.execute('SELECT COUNT(*) FROM r WHERE experience_years IS NULL').fetchone()[0]
+        if unspecified:
+            experience_counts['unspecified'] += unspecified
+        avg_salary = con.execute('SELECT AVG(average_salary_value) FROM r').fetchone()[0] or 0.0
+        mids = con.execute('SELECT salary_mid, COUNT(*) AS n FROM r WHERE salary_mid > 0 GROUP BY 1').df()
+        salary_digest = TDigest()
+        salary_digest.update(mids['salary_mid'].to_numpy(), mids['n'].to_numpy())
+        salary_hist = FixedHistogram()
+        salary_hist.update(mids['salary_mid'].to_numpy(), mids['n'].to_numpy())
+        by_period = con.execute('SELECT period_start, COUNT(*) AS postings, SUM(vacancies_whole) AS vacancies FROM r '
+                                'WHERE period_start IS NOT NULL GROUP BY 1 ORDER BY 1').df()
+        periods = pd.PeriodIndex(pd.DatetimeIndex(by_period['period_start']), freq=date_freq)
+        postings_series = pd.Series(by_period['postings'].to_numpy('int64'), index=periods.start_time)
+        vacancies_series = pd.Series(by_period['vacancies'].to_numpy('int64'),
+                                     index=periods.strftime('%Y-%m-%d')).sort_index()
+        sample_rows = _sample_rows(con, present, sample_size, SUMMARY_COLUMNS)
+    finally:
+        con.close()
+    return {
+        'total_rows': int(total_rows),
+        'status_counts': status_counts,
+        'top_companies': top_companies,
+        'top_categories': top_categories,
+        'top_title_words': list(zip(words['token'].tolist(), words['n'].tolist())),
+        'average_salary': float(avg_salary),
+        'sample_rows': sample_rows,
+        'salary_digest': salary_digest,
+        'salary_hist': salary_hist,
+        'salary_quantiles': dict(zip(['p50', 'p90', 'p99'], salary_digest.quantile([0.5, 0.9, 0.99]).tolist())),
+        'postings_over_time': postings_series,
+        'vacancies_over_time': vacancies_series,
+        'experience_counts': experience_counts,
+        'unique_companies': int(unique_companies),
+        'sketches': None,
+    }
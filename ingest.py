@@ -0,0 +1,456 @@
+"""Typed ingest layer for the SGJobData CSV.
+
+The raw CSV is large (~273MB) and every reader used to re-parse it as all-string
+columns. `convert_csv_to_parquet` writes a one-off, column-pruned Parquet copy next
+to the CSV (`data/SGJobData (2).parquet`) with parsed dates, numeric vacancies /
+salaries / experience and a pre-extracted `primary_category` column.
+
+`iter_chunks` and `read_typed` return the same typed frames whichever source is
+used, and automatically prefer the Parquet copy when it is newer than the CSV.
+
+Usage:
+    python scripts/convert_to_parquet.py --csv "data/SGJobData (2).csv"
+"""
+import io
+import json
+import os
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - parquet cache is optional, CSV still works
+    pa = None
+    pq = None
+
+# bump when the typed schema changes so stale Parquet copies are ignored
+CACHE_VERSION = '2'
+
+DATE_COLUMNS = ['metadata_newPostingDate', 'metadata_originalPostingDate', 'metadata_expiryDate']
+INT_COLUMNS = ['numberOfVacancies', 'minimumYearsExperience', 'metadata_repostCount',
+               'metadata_totalNumberJobApplication', 'metadata_totalNumberOfView']
+# salaries stay raw text ('5k', '4,000-6,000', '3000/month'); salary.normalize_salaries parses them
+SALARY_COLUMNS = ['average_salary', 'salary_minimum', 'salary_maximum']
+STRING_COLUMNS = ['metadata_jobPostId', 'title', 'postedCompany_name', 'categories',
+                  'positionLevels', 'employmentTypes', 'salary_type', 'status_jobStatus']
+# derived columns and the raw column each one is computed from
+DERIVED_COLUMNS = {'primary_category': 'categories'}
+
+# rows per Parquet row group; also the unit parallel readers shard on
+ROW_GROUP_SIZE = 100000
+
+# columns kept in the Parquet copy (intersected with what the CSV actually has)
+KEEP_COLUMNS = STRING_COLUMNS + SALARY_COLUMNS + DATE_COLUMNS + INT_COLUMNS
+
+
+def primary_category(cat_str):
+    """Return the first category name from the stored JSON-like string (or None)."""
+    if not isinstance(cat_str, str) or not cat_str:
+        return None
+    try:
+        arr = json.loads(cat_str)
+        if isinstance(arr, list) and arr:
+            return arr[0].get('category')
+    except Exception:
+        # naive parse
+        try:
+            s = cat_str
+            idx = s.find('"category":')
+            if idx >= 0:
+                sub = s[idx+len('"category":'):]
+                # find next '"'
+                q = sub.find('"')
+                if q >= 0:
+                    return sub[q+1:sub.find('"', q+1)]
+        except Exception:
+            pass
+    return None
+
+
+# a `"category": "<JSON string>"` pair; the anchored form only matches inside the first object
+CATEGORY_RE = r'"category"\s*:\s*"((?:[^"\\]|\\.)*)"'
+FIRST_CATEGORY_RE = r'^\s*\[\s*\{[^{}]*?' + CATEGORY_RE
+CATEGORY_PATTERN = re.compile(CATEGORY_RE)
+
+# distinct `categories` strings seen so far -> primary category (cleared when it grows past the cap)
+CATEGORY_MEMO_SIZE = 100000
+_category_memo = {}
+_MISSING = object()
+
+
+def _unescape(values):
+    """Decode JSON escapes (\\u0026, \\/ ...) in extracted string bodies; most have none."""
+    values = values.copy()
+    esc = values.str.contains('\\', regex=False, na=False)
+    if esc.any():
+        values[esc] = values[esc].map(lambda v: json.loads(f'"{v}"'))
+    return values
+
+
+def primary_categories(cats):
+    """Vectorized `primary_category` over a Series of `categories` strings.
+
+    New distinct strings go through one `str.extract` with a compiled regex and are memoized
+    across calls; the few that do not match (malformed JSON, non-string values) use the
+    scalar `primary_category` fallback.
+    """
+    codes, uniques = pd.factorize(cats)
+    values = [_category_memo.get(c, _MISSING) for c in uniques]
+    new = [i for i, v in enumerate(values) if v is _MISSING]
+    if new:
+        if len(_category_memo) + len(new) > CATEGORY_MEMO_SIZE:
+            _category_memo.clear()
+        raw = pd.Series(uniques[new], dtype=object)
+        got = _unescape(raw.str.extract(FIRST_CATEGORY_RE, expand=False)).tolist()
+        for i, v, c in zip(new, got, raw):
+            values[i] = primary_category(c) if v is None or v != v else v
+            _category_memo[c] = values[i]
+    # factorize codes missing values as -1, which picks the trailing None
+    lookup = np.array(values + [None], dtype=object)
+    return pd.Series(lookup[codes], index=cats.index, dtype=object)
+
+
+def category_labels(cats):
+    """Multi-label table for a Series of `categories` strings.
+
+    One row per (posting, category) with columns `row` (index label in `cats`), `position`
+    (0 = primary) and `category`. Each distinct string is parsed once.
+    """
+    codes, uniques = pd.factorize(cats)
+    found = pd.Series(uniques, dtype=object).str.extractall(CATEGORY_RE)[0]
+    labels = pd.DataFrame({'code': found.index.get_level_values(0), 'position': found.index.get_level_values(1),
+                           'category': _unescape(found).values})
+    rows = pd.DataFrame({'row': cats.index, 'code': codes})
+    return rows.merge(labels, on='code')[['row', 'position', 'category']]
+
+
+# title keywords: the tokenizer the dashboard has always used for its word counts
+TITLE_TOKEN_RE = r"\b[A-Za-z0-9\+#\.\-]+\b"
+TITLE_STOPWORDS = frozenset(("and", "with", "for", "the", "up", "to"))
+
+
+def title_token_counts(titles, counts=None):
+    """Series of keyword -> count for a Series of job titles (each distinct title is tokenized once).
+
+    With `counts`, `titles` are distinct titles and `counts` the number of rows carrying each.
+    """
+    if counts is None:
+        vc = titles.dropna().value_counts(sort=False)
+    else:
+        vc = pd.Series(np.asarray(counts), index=pd.Index(titles, dtype=object))
+        vc = vc[vc.index.notna()]
+    if vc.empty:
+        return pd.Series(dtype='int64')
+    toks = pd.DataFrame({'token': vc.index.to_series().str.lower().str.findall(TITLE_TOKEN_RE).values,
+                         'n': vc.values}).explode('token').dropna()
+    toks = toks[(toks['token'].str.len() > 2) & ~toks['token'].isin(TITLE_STOPWORDS)]
+    return toks.groupby('token', sort=False)['n'].sum()
+
+
+def title_keywords(titles):
+    """Distinct lowercase keywords of each distinct title.
+
+    Returns (codes, terms): `codes` are `pd.factorize` codes of `titles` (-1 = missing) and
+    `terms` has one row per (code, term). Each distinct title is tokenized once.
+    """
+    codes, uniques = pd.factorize(titles)
+    toks = pd.Series(uniques, dtype=object).str.lower().str.findall(TITLE_TOKEN_RE).explode().dropna()
+    toks = toks[(toks.str.len() > 2) & ~toks.isin(TITLE_STOPWORDS)]
+    terms = pd.DataFrame({'code': toks.index.to_numpy(), 'term': toks.to_numpy()}).drop_duplicates()
+    return codes, terms
+
+
+def coerce_chunk(chunk):
+    """Convert an all-string CSV chunk into the typed representation.
+
+    Dates become datetime64, integer-like columns become nullable Int64 (values that
+    are not whole numbers become <NA>) and the primary category is extracted once.
+    Salary columns stay text for `salary.normalize_salaries`; unknown columns are
+    passed through untouched.
+    """
+    out = chunk.copy()
+    for c in DATE_COLUMNS:
+        if c in out.columns:
+            # fixed format: per-chunk inference could parse shards differently
+            out[c] = pd.to_datetime(out[c], errors='coerce', format='ISO8601')
+    for c in INT_COLUMNS:
+        if c in out.columns:
+            num = pd.to_numeric(out[c], errors='coerce')
+            out[c] = num.where(num == num.round()).astype('Int64')
+    if 'categories' in out.columns:
+        out['primary_category'] = primary_categories(out['categories'])
+    return out
+
+
+# string columns with at most this share of distinct values are stored as categoricals
+CATEGORICAL_MAX_RATIO = 0.5
+
+
+def compact_dtypes(df):
+    """Shrink a typed frame in place: repetitive strings -> category, numerics downcast."""
+    for col in df.columns:
+        s = df[col]
+        if pd.api.types.is_string_dtype(s) or s.dtype == object:
+            if s.nunique() <= CATEGORICAL_MAX_RATIO * len(s):
+                df[col] = s.astype('category')
+        elif pd.api.types.is_integer_dtype(s):
+            df[col] = pd.to_numeric(s, downcast='integer')
+        elif pd.api.types.is_float_dtype(s):
+            df[col] = pd.to_numeric(s, downcast='float')
+    return df
+
+
+def parquet_path_for(csv_path):
+    """Location of the Parquet copy for a CSV: same name, `.parquet` suffix."""
+    return Path(csv_path).with_suffix('.parquet')
+
+
+def _arrow_schema(columns):
+    fields = []
+    for c in columns:
+        if c in DATE_COLUMNS:
+            fields.append(pa.field(c, pa.timestamp('ns')))
+        elif c in INT_COLUMNS:
+            fields.append(pa.field(c, pa.int64()))
+        else:
+            fields.append(pa.field(c, pa.string()))
+    return pa.schema(fields, metadata={b'capstone_cache_version': CACHE_VERSION.encode()})
+
+
+def parquet_is_fresh(csv_path):
+    """True when a usable Parquet copy exists and is at least as new as the CSV."""
+    if pq is None:
+        return False
+    p_pq = parquet_path_for(csv_path)
+    p_csv = Path(csv_path)
+    if not p_pq.exists():
+        return False
+    if p_csv.exists() and p_pq.stat().st_mtime < p_csv.stat().st_mtime:
+        return False
+    try:
+        meta = pq.read_schema(p_pq).metadata or {}
+    except Exception:
+        return False
+    return meta.get(b'capstone_cache_version') == CACHE_VERSION.encode()
+
+
+def resolve_source(path):
+    """Return ('parquet', path) or ('csv', path) for the best available copy of `path`."""
+    p = Path(path)
+    if p.suffix == '.parquet':
+        return 'parquet', p
+    if parquet_is_fresh(p):
+        return 'parquet', parquet_path_for(p)
+    return 'csv', p
+
+
+def source_version(path):
+    """Cheap fingerprint of the source behind `path`, for use in cache keys."""
+    kind, p = resolve_source(path)
+    st = p.stat()
+    return kind, str(p), st.st_size, st.st_mtime_ns
+
+
+def convert_csv_to_parquet(csv_path, out_path=None, chunksize=200000):
+    """Stream the CSV once and write the typed, column-pruned Parquet copy.
+
+    The file is written to a temporary name and renamed into place so readers never
+    see a half-written cache.
+    """
+    if pq is None:
+        raise ImportError('pyarrow is required to build the Parquet cache (pip install pyarrow)')
+    p_csv = Path(csv_path)
+    if not p_csv.exists():
+        raise FileNotFoundError(f"CSV not found: {p_csv}")
+    p_out = Path(out_path) if out_path else parquet_path_for(p_csv)
+    header = pd.read_csv(p_csv, nrows=0).columns.tolist()
+    usecols = [c for c in KEEP_COLUMNS if c in header]
+    columns = usecols + [d for d, src in DERIVED_COLUMNS.items() if src in usecols]
+    schema = _arrow_schema(columns)
+
+    tmp = p_out.with_name(p_out.name + '.tmp')
+    total = 0
+    writer = pq.ParquetWriter(str(tmp), schema, compression='zstd')
+    try:
+        for chunk in pd.read_csv(p_csv, chunksize=chunksize, usecols=usecols, dtype=str):
+            typed = coerce_chunk(chunk)[columns]
+            writer.write_table(pa.Table.from_pandas(typed, schema=schema, preserve_index=False),
+                               row_group_size=ROW_GROUP_SIZE)
+            total += len(chunk)
+    finally:
+        writer.close()
+    os.replace(tmp, p_out)
+    return p_out, total
+
+
+def _raw_columns(columns):
+    """Map requested (possibly derived) columns to the raw CSV columns needed."""
+    raw = []
+    for c in columns:
+        c = DERIVED_COLUMNS.get(c, c)
+        if c not in raw:
+            raw.append(c)
+    return raw
+
+
+def _csv_chunks(source, header, columns, chunksize, names=None):
+    """Typed chunks from a CSV path or file object (names given when it has no header row)."""
+    usecols = [c for c in _raw_columns(columns) if c in header] if columns else None
+    reader = pd.read_csv(source, chunksize=chunksize, usecols=usecols, dtype=str,
+                         header=None if names else 'infer', names=names)
+    for chunk in reader:
+        typed = coerce_chunk(chunk)
+        if columns:
+            typed = typed[[c for c in columns if c in typed.columns]]
+        yield typed
+
+
+def _parquet_chunks(path, columns, chunksize, row_groups=None):
+    pf = pq.ParquetFile(str(path))
+    available = pf.schema_arrow.names
+    cols = [c for c in columns if c in available] if columns else None
+    for batch in pf.iter_batches(batch_size=chunksize, columns=cols, row_groups=row_groups):
+        yield batch.to_pandas(types_mapper={pa.int64(): pd.Int64Dtype()}.get)
+
+
+def iter_chunks(path, columns=None, chunksize=20000):
+    """Yield typed DataFrame chunks of `path`, reading the Parquet copy when fresh.
+
+    `columns` limits the columns read; requested columns missing from the source are
+    silently skipped so callers can check `in chunk.columns` as before.
+    """
+    kind, p = resolve_source(path)
+    if kind == 'parquet':
+        yield from _parquet_chunks(p, columns, chunksize)
+        return
+    header = pd.read_csv(p, nrows=0).columns.tolist()
+    yield from _csv_chunks(p, header, columns, chunksize)
+
+
+class _ByteRange(io.RawIOBase):
+    """Read-only view of bytes [start, stop) of a file."""
+
+    def __init__(self, path, start, stop):
+        self._f = open(path, 'rb')
+        self._f.seek(start)
+        self._remaining = stop - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        n = min(len(b), self._remaining)
+        if n <= 0:
+            return 0
+        data = self._f.read(n)
+        b[:len(data)] = data
+        self._remaining -= len(data)
+        return len(data)
+
+    def close(self):
+        self._f.close()
+        super().close()
+
+
+def _record_boundaries(path, targets, start=0, end=None, block_size=1 << 23):
+    """Byte offsets of the first record boundary at or after each target offset.
+
+    A newline ends a record only when an even number of quote characters precede it
+    (RFC 4180 escapes quotes by doubling them), so newlines inside quoted fields
+    are never used as shard boundaries. One sequential pass from `start`, which must
+    itself be a record boundary, up to `end` (the file size if None); nothing past
+    `end` is read.
+    """
+    if end is None:
+        end = Path(path).stat().st_size
+    targets = sorted(targets)
+    out = []
+    parity = 0
+    pos = start
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while targets and pos < end:
+            block = f.read(min(block_size, end - pos))
+            if not block:
+                break
+            i = 0
+            while targets and pos + len(block) > targets[0]:
+                t = max(targets[0] - pos, i)
+                parity = (parity + block.count(b'"', i, t)) % 2
+                i = t
+                # walk newline to newline until one lies outside quotes
+                while True:
+                    nl = block.find(b'\n', i)
+                    if nl < 0:
+                        break
+                    parity = (parity + block.count(b'"', i, nl)) % 2
+                    i = nl + 1
+                    if parity == 0:
+                        break
+                if nl < 0:
+                    break
+                boundary = pos + i
+                while targets and targets[0] <= boundary:
+                    targets.pop(0)
+                    out.append(boundary)
+            parity = (parity + block.count(b'"', i)) % 2
+            pos += len(block)
+    return out + [end] * len(targets)
+
+
+def plan_shards(path, n, start=None, end=None):
+    """Split the source behind `path` into up to `n` shards for parallel readers.
+
+    CSV sources are cut into byte ranges on record boundaries; the Parquet copy is
+    split by row groups. Each shard is a picklable tuple for `iter_shard`.
+    `start` is a CSV byte offset (a record boundary) to begin from; it always reads
+    the CSV itself and is how incremental builds pick up appended rows. `end` caps
+    CSV shards at that byte offset (the file size if None), so rows appended while a
+    build runs are left for the next one.
+    """
+    kind, p = resolve_source(path) if start is None else ('csv', Path(path))
+    if kind == 'parquet':
+        n_groups = pq.ParquetFile(str(p)).num_row_groups
+        edges = sorted(set(round(i * n_groups / n) for i in range(n + 1)))
+        return [('parquet', str(p), a, b) for a, b in zip(edges[:-1], edges[1:])]
+    if start is None:
+        with open(p, 'rb') as f:
+            start = len(f.readline())
+    size = p.stat().st_size if end is None else end
+    if start >= size:
+        return []
+    targets = [start + (size - start) * i // n for i in range(1, n)]
+    edges = sorted(set([start] + _record_boundaries(p, targets, start=start, end=size) + [size]))
+    return [('csv', str(p), a, b) for a, b in zip(edges[:-1], edges[1:])]
+
+
+def iter_shard(shard, columns=None, chunksize=20000):
+    """Yield typed chunks for one shard produced by `plan_shards`."""
+    kind, path, start, stop = shard
+    if kind == 'parquet':
+        yield from _parquet_chunks(path, columns, chunksize, row_groups=list(range(start, stop)))
+        return
+    header = pd.read_csv(path, nrows=0).columns.tolist()
+    with io.BufferedReader(_ByteRange(path, start, stop)) as fh:
+        yield from _csv_chunks(fh, header, columns, chunksize, names=header)
+
+
+def read_typed(path, nrows=None, columns=None):
+    """Read the first `nrows` rows (all rows if None) as one typed DataFrame."""
+    parts = []
+    remaining = nrows
+    chunksize = min(nrows, 200000) if nrows else 200000
+    for chunk in iter_chunks(path, columns=columns, chunksize=chunksize):
+        if remaining is not None:
+            chunk = chunk.iloc[:remaining]
+            remaining -= len(chunk)
+        parts.append(chunk)
+        if remaining is not None and remaining <= 0:
+            break
+    if not parts:
+        return pd.DataFrame(columns=columns or [])
+    return pd.concat(parts, ignore_index=True)
@@ -1,7 +1,8 @@
 import streamlit as st
 import pandas as pd
 import altair as alt
-from utils import stream_summary, read_sample, clean_salary_series, parse_categories
+import duckdb_engine
+from utils import cached_stream_summary, read_sample, clean_salary_series, parse_categories
 
 st.set_page_config(page_title="Executive Dashboard", layout="wide")
 
@@ -16,6 +17,12 @@ with st.sidebar:
     sample_size = st.slider("Sample for interactive views", 1000, 200000, 20000, step=1000)
     date_freq = st.selectbox("Time aggregation", ["W", "M"], format_func=lambda x: "Weekly" if x=="W" else "Monthly")
     top_n = st.slider("Top N", 5, 30, 10)
+    sketch = st.checkbox("Approximate counts (sketches, bounded memory)", value=False,
+                         help="HyperLogLog / Space-Saving for employers, categories and title words on very large files")
+    engine = "pandas"
+    if duckdb_engine.available() and not sketch:
+        engine = "duckdb" if st.checkbox("Scan with DuckDB", value=False,
+                                         help="Multi-threaded scan of the full file; same statistics as the pandas stream") else "pandas"
     st.markdown("---")
     st.markdown("**Pages**")
     st.write("• 1_Overview — general view")
@@ -23,15 +30,16 @@ with st.sidebar:
     st.write("• 3_Company_Trends — employer activity")
     st.write("• 4_Skills_Analysis — skill demand and gaps")
 
-# Load summary (streamed)
+# Load summary (streamed once per CSV version / settings, then served from data/.cache;
+# top_n only slices the cached result)
 with st.spinner("Streaming and summarizing dataset... this may take a moment"):
-    summary = stream_summary(csv_path, sample_size=sample_size, date_freq=date_freq)
+    summary = cached_stream_summary(csv_path, sample_size=sample_size, date_freq=date_freq, sketch=sketch, engine=engine)
 
 # KPI row
 k1, k2, k3, k4 = st.columns(4)
 k1.metric("Total postings", f"{summary['total_rows']:,}")
 k2.metric("Open postings", f"{summary['status_counts'].get('Open', 0):,}")
-k3.metric("Avg. salary (sample)", f"${summary['average_salary']:.0f}")
+k3.metric("Avg. salary", f"${summary['average_salary']:.0f}")
 k4.metric("Unique employers", f"{summary['unique_companies']:,}")
 
 st.markdown("---")
@@ -63,15 +71,19 @@ st.markdown("---")
 
 # Salary snapshot
 st.subheader("Salary snapshot 💵")
-sal = pd.Series(summary['sample_salaries'])
-sal = sal[sal > 0]
-if len(sal) == 0:
-    st.info("No salary sample available.")
+digest = summary['salary_digest']
+if digest.count == 0:
+    st.info("No salary data available.")
 else:
-    sal_df = pd.DataFrame({'salary': sal})
-    hist = alt.Chart(sal_df).mark_bar().encode(x=alt.X('salary:Q', bin=alt.Bin(maxbins=60)), y='count()')
+    # full-population histogram, clipped at the sidebar percentile (main app's clip slider)
+    clip_pct = st.session_state.get("clip_pct", 99)
+    sal_df = summary['salary_hist'].to_frame(upper=digest.quantile(clip_pct / 100), max_bins=60)
+    hist = alt.Chart(sal_df).mark_bar().encode(
+        x=alt.X('bin_start:Q', bin='binned', title='salary'), x2='bin_end:Q', y=alt.Y('count:Q', title='postings'))
     st.altair_chart(hist, use_container_width=True)
-    st.write(f"Sampled salaries: {len(sal):,}; mean = ${sal.mean():.0f}")
+    q = summary['salary_quantiles']
+    st.write(f"Salaries: {digest.count:,}; mean = ${digest.mean:.0f}; p50 ${q['p50']:.0f} · p90 ${q['p90']:.0f} · "
+             f"p99 ${q['p99']:.0f} (chart clipped at p{clip_pct})")
 
 st.markdown("---")
 
@@ -80,19 +92,9 @@ st.subheader("Category & skills signals 🧩")
 cats = pd.DataFrame(summary['top_categories'][:top_n], columns=['category','count'])
 st.table(cats)
 
-# Simple skill extraction from titles (from sample rows)
+# Simple skill extraction from titles (all postings, see ingest.title_token_counts)
 st.markdown("**Top words in job titles (proxy for skill keywords)**")
-from collections import Counter
-import re
-words = Counter()
-for r in summary['sample_rows']:
-    t = r.get('title','')
-    if not t: continue
-    # tokenize
-    for w in re.findall(r"\b[A-Za-z0-9\+#\.\-]+\b", t.lower()):
-        if len(w) > 2 and w not in ("and","with","for","the","up","to"):
-            words[w] += 1
-top_words = pd.DataFrame(words.most_common(top_n), columns=['word','count'])
+top_words = pd.DataFrame(summary['top_title_words'][:top_n], columns=['word','count'])
 st.table(top_words)
 
 st.markdown("---")
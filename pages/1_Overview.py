@@ -1,15 +1,50 @@
 import streamlit as st
-import streamlit as st
-import pandas as pd
+import db
+from utils import SEARCH_COUNT_CAP, SEARCH_FIELDS, count_postings, read_sample, search_postings
 
 st.title("Overview")
 
 csv_path = st.session_state.get("csv_path", "data/SGJobData (2).csv")
 sample_size = st.session_state.get("sample_size", 20000)
+OVERVIEW_COLUMNS = ['title', 'postedCompany_name', 'primary_category', 'positionLevels', 'employmentTypes',
+                    'status_jobStatus', 'metadata_newPostingDate', 'numberOfVacancies', 'minimumYearsExperience',
+                    'salary_minimum', 'salary_maximum', 'salary_type']
+
+# full-text search runs against the FTS5 index in visual.db, not the CSV
+st.subheader("Search postings")
+DB_PATH = st.text_input("SQLite DB path", value="data/visual.db")
+c1, c2 = st.columns([3, 1])
+query = c1.text_input("Search title, company or category", placeholder="e.g. data engineer")
+field = c2.selectbox("In", list(SEARCH_FIELDS))
+PAGE_SIZE = 25
+if query.strip():
+    try:
+        indexed = db.has_table('postings_fts', DB_PATH)
+    except Exception as e:
+        st.error(f"Could not open DB: {e}")
+        indexed = None
+    if indexed is False:
+        st.info("No search index in this DB. Build it with `python scripts/build_visual_db.py --fts`.")
+    elif indexed:
+        total = count_postings(query, DB_PATH, field)
+        n_pages = max(1, -(-min(total, SEARCH_COUNT_CAP) // PAGE_SIZE))
+        page = st.number_input(f"Page (of {n_pages:,})", min_value=1, max_value=n_pages, value=1) - 1
+        results, total = search_postings(query, DB_PATH, field, page=page, page_size=PAGE_SIZE)
+        if total > SEARCH_COUNT_CAP:
+            st.write(f"{SEARCH_COUNT_CAP:,}+ matching postings, newest first (add words to rank by relevance)")
+        else:
+            st.write(f"{total:,} matching postings")
+        if not results.empty:
+            st.dataframe(results.drop(columns='score'), use_container_width=True)
 
-df = pd.read_csv(csv_path, nrows=sample_size)
+st.markdown("---")
+# shared typed sample (cached across pages and sessions, see utils.read_sample)
+try:
+    df = read_sample(csv_path, nrows=sample_size, columns=OVERVIEW_COLUMNS)
+except Exception as e:
+    st.error(f"Could not read CSV: {e}")
+    st.stop()
 
 st.write("Using CSV:", csv_path)
-st.write("Rows loaded:", len(df))
+st.write("Rows loaded:", len(df), f"({df.memory_usage(deep=True).sum() / 1e6:.1f} MB in memory)")
 st.dataframe(df.head(30))
-
@@ -1,18 +1,85 @@
-import streamlit as st
-
 import streamlit as st
 import pandas as pd
+import altair as alt
+import numpy as np
+from sketches import bin_quantiles
+from utils import salary_distribution, salary_months, salary_quantiles_by
 
 st.title("Salary Insights")
 
-csv_path = st.session_state.get("csv_path", "data/SGJobData (2).csv")
-sample_size = st.session_state.get("sample_size", 20000)
+# reads the salary cube built by scripts/build_visual_db.py; the CSV is never touched here
+DB_PATH = st.text_input("SQLite DB path", value="data/visual.db")
 clip_pct = st.session_state.get("clip_pct", 99)
 top_n = st.session_state.get("top_n", 15)
 
-df = pd.read_csv(csv_path, nrows=sample_size)
+try:
+    months = salary_months(DB_PATH)
+except Exception as e:
+    st.error(f"Could not open DB: {e}")
+    st.stop()
+if not months:
+    st.info("No salary cube in this DB. Run `python scripts/build_visual_db.py` (a full build) to generate it.")
+    st.stop()
+
+labels = [f"{m // 100}-{m % 100:02d}" for m in months]
+month_range = None
+if len(months) > 1:
+    first, last = st.select_slider("Posting months", options=labels, value=(labels[0], labels[-1]))
+    if (first, last) != (labels[0], labels[-1]):
+        month_range = (months[labels.index(first)], months[labels.index(last)])
+
+overall = salary_quantiles_by(DB_PATH, 'all', month_range)
+if overall.empty:
+    st.info("No salary data in the selected months.")
+    st.stop()
+q = overall.iloc[0]
+
+# All amounts are monthly: ranges use the midpoint, annual/hourly salaries are converted (see salary.py)
+k1, k2, k3, k4 = st.columns(4)
+k1.metric("Postings with salary", f"{int(q['postings']):,}")
+k2.metric("Median (monthly)", f"${q['p50']:,.0f}")
+k3.metric("90th percentile", f"${q['p90']:,.0f}")
+k4.metric("Mean", f"${q['mean']:,.0f}")
+
+st.subheader(f"Distribution (clipped at p{clip_pct})")
+hist = salary_distribution(DB_PATH, month_range)
+upper = bin_quantiles(np.append(hist.counts, hist.overflow), hist.edges, (clip_pct / 100,))[0, 0]
+bins = hist.to_frame(upper=upper, max_bins=60)
+chart = alt.Chart(bins).mark_bar().encode(
+    x=alt.X('bin_start:Q', bin='binned', title='monthly salary'), x2='bin_end:Q', y=alt.Y('count:Q', title='postings'))
+st.altair_chart(chart, use_container_width=True)
+
+
+def box_chart(table, dimension, sort='-x'):
+    """p10–p90 whiskers, p25–p75 box and a median tick per row of a salary_quantiles_by table."""
+    base = alt.Chart(table).encode(y=alt.Y(f'{dimension}:N', sort=sort, title=None))
+    whisker = base.mark_rule().encode(x=alt.X('p10:Q', title='monthly salary (p10–p90, p25–p75, median)'), x2='p90:Q')
+    box = base.mark_bar(opacity=0.4).encode(x='p25:Q', x2='p75:Q')
+    med = base.mark_tick(color='black', thickness=2).encode(x='p50:Q')
+    return whisker + box + med
+
+
+st.subheader(f"Salary by category (top {top_n} by postings)")
+by_cat = salary_quantiles_by(DB_PATH, 'category', month_range).head(top_n).reset_index()
+if by_cat.empty:
+    st.info("No categorised salaries.")
+else:
+    st.altair_chart(box_chart(by_cat, 'category'), use_container_width=True)
+    st.dataframe(by_cat.round(0), use_container_width=True)
+
+st.subheader("Salary by position level")
+by_level = salary_quantiles_by(DB_PATH, 'position_level', month_range).head(top_n).reset_index()
+st.altair_chart(box_chart(by_level, 'position_level'), use_container_width=True)
 
-st.write("Using CSV:", csv_path)
-st.write("Rows loaded:", len(df))
-st.dataframe(df.head(30))
+st.subheader("Salary by minimum years of experience")
+by_exp = salary_quantiles_by(DB_PATH, 'experience_bucket', month_range).reset_index()
+order = ['0', '1-2', '3-5', '6-9', '10+', 'unspecified']
+st.altair_chart(box_chart(by_exp, 'experience_bucket', sort=order), use_container_width=True)
 
+st.subheader("Median salary by month")
+by_month = salary_quantiles_by(DB_PATH, 'month', month_range).reset_index()
+by_month['month'] = pd.to_datetime(by_month['month'], format='%Y%m')
+band = alt.Chart(by_month).mark_area(opacity=0.3).encode(x=alt.X('month:T', title=None), y=alt.Y('p25:Q', title='monthly salary'),
+                                                          y2='p75:Q')
+line = alt.Chart(by_month).mark_line().encode(x='month:T', y='p50:Q')
+st.altair_chart(band + line, use_container_width=True)
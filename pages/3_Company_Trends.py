@@ -1,17 +1,29 @@
 import streamlit as st
-
-import streamlit as st
-import pandas as pd
+import altair as alt
+from utils import read_sample
 
 st.title("Company Trends")
 
 csv_path = st.session_state.get("csv_path", "data/SGJobData (2).csv")
 sample_size = st.session_state.get("sample_size", 20000)
 top_n = st.session_state.get("top_n", 15)
+TREND_COLUMNS = ['postedCompany_name', 'title', 'metadata_newPostingDate', 'numberOfVacancies']
 
-df = pd.read_csv(csv_path, nrows=sample_size)
+# shared typed sample (cached across pages and sessions, see utils.read_sample)
+try:
+    df = read_sample(csv_path, nrows=sample_size, columns=TREND_COLUMNS)
+except Exception as e:
+    st.error(f"Could not read CSV: {e}")
+    st.stop()
 
 st.write("Using CSV:", csv_path)
 st.write("Rows loaded:", len(df))
-st.dataframe(df.head(30))
 
+top = (df.groupby('postedCompany_name', observed=True)
+         .agg(postings=('title', 'size'), vacancies=('numberOfVacancies', 'sum'))
+         .sort_values('postings', ascending=False).head(top_n).reset_index())
+st.subheader(f"Top {top_n} companies in the sample")
+chart = alt.Chart(top).mark_bar().encode(
+    x=alt.X('postings:Q'), y=alt.Y('postedCompany_name:N', sort='-x', title=None), tooltip=['postings', 'vacancies'])
+st.altair_chart(chart, use_container_width=True)
+st.dataframe(df.head(30))
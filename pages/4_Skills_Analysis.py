@@ -1,16 +1,52 @@
-import streamlit as st
-
 import streamlit as st
 import pandas as pd
+import altair as alt
+import db
+from utils import keyword_cooccurrence, keyword_totals, keyword_trends
 
 st.title("Skills Analysis")
 
-csv_path = st.session_state.get("csv_path", "data/SGJobData (2).csv")
-sample_size = st.session_state.get("sample_size", 20000)
+# full-population title keyword index built by scripts/build_visual_db.py
+DB_PATH = st.text_input("SQLite DB path", value="data/visual.db")
+top_n = st.session_state.get("top_n", 15)
+
+try:
+    top = keyword_totals(DB_PATH, top_n=200) if db.has_table('keyword_totals', DB_PATH) else pd.DataFrame()
+except Exception as e:
+    st.error(f"Could not read the keyword index: {e}")
+    st.stop()
+if top.empty:
+    st.info("No keyword index in this DB. Run `python scripts/build_visual_db.py` (a full build) to generate it.")
+    st.stop()
 
-df = pd.read_csv(csv_path, nrows=sample_size)
+st.subheader(f"Top {top_n} title keywords")
+contains = st.text_input("Filter keywords containing", value="")
+shown = keyword_totals(DB_PATH, top_n=top_n, contains=contains.strip() or None)
+bars = alt.Chart(shown).mark_bar().encode(
+    x=alt.X('postings:Q', title='postings'), y=alt.Y('term:N', sort='-x', title=None), tooltip=['term', 'postings', 'vacancies'])
+st.altair_chart(bars, use_container_width=True)
 
-st.write("Using CSV:", csv_path)
-st.write("Rows loaded:", len(df))
-st.dataframe(df.head(30))
+st.subheader("Keyword trends")
+options = top['term'].tolist()
+terms = st.multiselect("Keywords", options, default=options[:5])
+metric = st.radio("Measure", ['postings', 'vacancies'], horizontal=True)
+trends = keyword_trends(DB_PATH, terms)
+if trends.empty:
+    st.info("Pick one or more keywords.")
+else:
+    line = alt.Chart(trends).mark_line(point=True).encode(
+        x=alt.X('month:T', title=None), y=alt.Y(f'{metric}:Q', title=metric), color='term:N')
+    st.altair_chart(line, use_container_width=True)
 
+st.subheader("Skills that co-occur with a keyword")
+term = st.selectbox("Keyword", options)
+co = keyword_cooccurrence(DB_PATH, term, top_n=top_n)
+if co.empty:
+    st.info(f"No other keyword appears in titles containing '{term}'.")
+else:
+    chart = alt.Chart(co).mark_bar().encode(
+        x=alt.X('share:Q', axis=alt.Axis(format='%'), title=f"share of '{term}' postings"),
+        y=alt.Y('term:N', sort='-x', title=None), tooltip=['term', 'postings', alt.Tooltip('share:Q', format='.1%')])
+    st.altair_chart(chart, use_container_width=True)
+    st.dataframe(co.assign(share=(co['share'] * 100).round(1)).rename(columns={'share': 'share %'}),
+                 use_container_width=True)
@@ -1,18 +1,14 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
 import altair as alt
+import db
 
 st.title('Company-wise Vacancies 📊')
 
 DB_PATH = st.text_input('SQLite DB path', value='data/visual.db')
 
-@st.cache_data
 def load_companies(db_path):
-    conn = sqlite3.connect(db_path)
-    df = pd.read_sql('SELECT id, name FROM companies ORDER BY name', conn)
-    conn.close()
-    return df
+    return db.read_sql('SELECT id, name FROM companies ORDER BY name', db_path=db_path)
 
 if not st.button('Ensure DB exists (build if missing)'):
     pass
@@ -27,15 +23,13 @@ except Exception as e:
 company = st.selectbox('Company', options=['All'] + comps['name'].tolist())
 period_agg = st.selectbox('Period aggregation display', options=['period'], index=0)
 
-conn = sqlite3.connect(DB_PATH)
 if company == 'All':
     q = 'SELECT period, SUM(vacancies) as vacancies, SUM(postings) as postings FROM vacancies GROUP BY period ORDER BY period'
-    df = pd.read_sql(q, conn)
+    df = db.read_sql(q, db_path=DB_PATH)
 else:
     cid = int(comps.loc[comps['name']==company, 'id'].iloc[0])
     q = 'SELECT period, vacancies, postings FROM vacancies WHERE company_id=? ORDER BY period'
-    df = pd.read_sql(q, conn, params=(cid,))
-conn.close()
+    df = db.read_sql(q, (cid,), DB_PATH)
 
 if df.empty:
     st.info('No vacancy data available for selection.')
@@ -49,10 +43,10 @@ else:
     st.altair_chart(chart, use_container_width=True)
 
     st.subheader('Top companies by cumulative vacancies')
-    conn = sqlite3.connect(DB_PATH)
-    topq = 'SELECT c.name, SUM(v.vacancies) as total_vac FROM vacancies v JOIN companies c ON v.company_id=c.id GROUP BY c.name ORDER BY total_vac DESC LIMIT 20'
-    topdf = pd.read_sql(topq, conn)
-    conn.close()
+    # per-company totals are materialized at build time (company_totals rollup)
+    topq = ('SELECT c.name, t.vacancies as total_vac FROM company_totals t JOIN companies c ON c.id=t.company_id '
+            'ORDER BY t.vacancies DESC LIMIT 20')
+    topdf = db.read_sql(topq, db_path=DB_PATH)
     st.table(topdf)
 
     st.markdown('Download aggregated CSV:')
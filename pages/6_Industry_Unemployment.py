@@ -1,7 +1,8 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
 import altair as alt
+import db
+from charts import chart_data
 
 st.title('Industry Unemployment & Vacancy Contrast 🏭')
 
@@ -24,9 +25,8 @@ else:
 # Load industry vacancies from sqlite
 DB_PATH = st.text_input('SQLite DB path', value='data/visual.db')
 try:
-    conn = sqlite3.connect(DB_PATH)
-    ind_df = pd.read_sql('SELECT industry, period, SUM(vacancies) as vacancies, SUM(postings) as postings FROM industry_vacancies GROUP BY industry, period', conn)
-    conn.close()
+    ind_df = db.read_sql('SELECT industry, period, SUM(vacancies) as vacancies, SUM(postings) as postings FROM industry_vacancies GROUP BY industry, period',
+                         db_path=DB_PATH)
 except Exception:
     ind_df = pd.DataFrame()
 
@@ -34,16 +34,25 @@ if ind_df.empty and df_unemp.empty:
     st.info('No industry vacancy or unemployment data available. Run `scripts/build_visual_db.py` to generate `data/visual.db`, or upload unemployment CSV to proceed.')
     st.stop()
 
+# lines beyond the largest TOP_K industries are folded into one "Other" line
+TOP_K = st.slider('Industries to draw', 3, 30, 10)
+
 if not df_unemp.empty:
     st.subheader('Unemployment trends (uploaded)')
     df_unemp['period_dt'] = pd.to_datetime(df_unemp['period'], errors='coerce')
-    chart = alt.Chart(df_unemp).mark_line().encode(x='period_dt:T', y='unemployment_rate:Q', color='industry:N')
+    unemp, notes = chart_data(df_unemp, 'period_dt', 'unemployment_rate', 'industry', top_k=TOP_K, agg='mean')
+    for note in notes:
+        st.caption(note)
+    chart = alt.Chart(unemp).mark_line().encode(x='period_dt:T', y='unemployment_rate:Q', color='industry:N')
     st.altair_chart(chart, use_container_width=True)
 
 if not ind_df.empty:
     st.subheader('Industry vacancies over time (from job postings)')
-    ind_df['period_dt'] = pd.to_datetime(ind_df['period'], errors='coerce')
-    chart = alt.Chart(ind_df).mark_line().encode(x='period_dt:T', y='vacancies:Q', color='industry:N')
+    ind_df['period_dt'] = pd.to_datetime(ind_df['period'].str.split('/').str[0], errors='coerce')
+    lines, notes = chart_data(ind_df, 'period_dt', 'vacancies', 'industry', top_k=TOP_K)
+    for note in notes:
+        st.caption(note)
+    chart = alt.Chart(lines).mark_line().encode(x='period_dt:T', y='vacancies:Q', color='industry:N')
     st.altair_chart(chart, use_container_width=True)
 
     st.markdown('You can compare unemployment vs vacancies by industry by uploading an unemployment CSV and using the download below for sample joining steps.')
@@ -1,20 +1,28 @@
 import streamlit as st
-import pandas as pd
 import altair as alt
-from utils import compute_company_growth, load_company_vacancies, compute_company_yoy_growth, cluster_companies
+from charts import chart_data
+from utils import (MINIBATCH_MIN_COMPANIES, cluster_companies, cluster_sweep, company_matrix, compute_company_growth,
+                   compute_company_yoy_growth)
 
 st.title('Company Vacancy Growth — Top Movers & Clusters 📈')
 
 DB_PATH = st.text_input('SQLite DB path', value='data/visual.db')
+MAX_CLUSTER_SERIES = 10
 TOP_N = st.slider('Top movers N', 5, 200, 20)
+c1, c2, c3 = st.columns(3)
+LOOKBACK = c1.slider('Compare with N periods back', 1, 12, 1) + 1
+WINDOW = c2.slider('Rolling window (periods)', 1, 12, 1)
+RANK_BY = c3.radio('Rank by', ['pct_change', 'zscore'],
+                   format_func=lambda x: 'percent change' if x == 'pct_change' else 'z-score (anomaly)')
 
 with st.spinner('Computing growth rates...'):
-    growth = compute_company_growth(DB_PATH, top_n=TOP_N)
+    growth = compute_company_growth(DB_PATH, lookback_periods=LOOKBACK, top_n=TOP_N, window=WINDOW, rank_by=RANK_BY)
 
 if growth.empty:
     st.info('No company vacancy data available. Run `scripts/build_visual_db.py` to generate `data/visual.db`.')
 else:
-    st.subheader('Top movers (percent change from last period to previous)')
+    span = 'last period' if WINDOW == 1 else f'last {WINDOW} periods'
+    st.subheader(f'Top movers ({span} vs the same span {LOOKBACK - 1} period(s) earlier)')
     # Present table with formatted pct
     display = growth.copy()
     def fmt(x):
@@ -22,6 +30,7 @@ else:
             return '∞ (new)'
         return f"{x:.1f}%"
     display['pct_change'] = display['pct_change'].apply(fmt)
+    display['zscore'] = display['zscore'].round(2)
     show_yoy = st.checkbox('Also show Year-over-Year top table', value=True)
     if show_yoy:
         yoy = compute_company_yoy_growth(DB_PATH, top_n=TOP_N)
@@ -31,14 +40,14 @@ else:
             st.table(yoy)
             st.download_button('Download YoY CSV', yoy.to_csv(index=False), file_name='company_yoy_top.csv')
 
-    st.table(display[['company','last_vacancies','prev_vacancies','pct_change']])
+    st.table(display[['company','last_vacancies','prev_vacancies','pct_change','zscore']])
 
     st.subheader('Sparklines for selected companies')
     companies = st.multiselect('Select companies', options=display['company'].tolist(), default=display['company'].tolist()[:5])
     if companies:
-        df = load_company_vacancies(DB_PATH)
-        df = df[df['company'].isin(companies)].copy()
-        df['period_dt'] = pd.to_datetime(df['period'], errors='coerce')
+        df, notes = chart_data(company_matrix(DB_PATH).series(companies), 'period_dt', 'vacancies', 'company')
+        for note in notes:
+            st.caption(note)
         chart = alt.Chart(df).mark_line(point=True).encode(x='period_dt:T', y='vacancies:Q', color='company:N')
         st.altair_chart(chart, use_container_width=True)
 
@@ -49,9 +58,23 @@ else:
     st.markdown('---')
     st.subheader('Cluster companies by vacancy patterns')
     n_clusters = st.slider('Number of clusters', 2, 20, 5)
-    cluster_top_n = st.slider('Number of companies to consider (top by vacancies)', 20, 1000, 200)
+    n_companies = company_matrix(DB_PATH).shape[0]
+    cluster_top_n = int(st.number_input('Number of companies to consider (top by vacancies)', min_value=min(20, n_companies),
+                                        max_value=n_companies, value=min(200, n_companies), step=100))
+    if cluster_top_n >= MINIBATCH_MIN_COMPANIES:
+        st.caption('Large selection: using MiniBatchKMeans.')
+    params = (DB_PATH, n_clusters, cluster_top_n)
+    # assignments live in the session so the inspector below survives reruns without refitting
     if st.button('Run clustering'):
-        cl_df, pca, kmeans = cluster_companies(DB_PATH, n_clusters=n_clusters, top_n=cluster_top_n)
+        with st.spinner('Clustering...'):
+            st.session_state['company_clusters'] = (params, cluster_companies(DB_PATH, n_clusters=n_clusters,
+                                                                             top_n=cluster_top_n)[0])
+    stored = st.session_state.get('company_clusters')
+    if stored is not None:
+        stored_params, cl_df = stored
+        if stored_params != params:
+            st.caption(f'Showing the last run ({stored_params[1]} clusters of the top {stored_params[2]:,} companies); '
+                       'press "Run clustering" to refit with the current settings.')
         if cl_df.empty:
             st.info('Clustering produced no results. Ensure DB is available and contains data.')
         else:
@@ -64,11 +87,26 @@ else:
             members = cl_df[cl_df['cluster']==chosen]['company'].tolist()
             st.markdown(f'Companies in cluster {chosen} (showing up to 200)')
             st.write(members[:200])
-            # plot time series for selected cluster
+            # plot the cluster's largest members; the rest are averaged into one "Other" line
             if members:
-                dfc = load_company_vacancies(DB_PATH)
-                dfc = dfc[dfc['company'].isin(members)].copy()
-                dfc['period_dt'] = pd.to_datetime(dfc['period'], errors='coerce')
+                dfc, notes = chart_data(company_matrix(stored_params[0]).series(members), 'period_dt', 'vacancies', 'company',
+                                        top_k=MAX_CLUSTER_SERIES, agg='mean')
+                for note in notes:
+                    st.caption(note)
                 chart2 = alt.Chart(dfc).mark_line().encode(x='period_dt:T', y='vacancies:Q', color='company:N')
                 st.altair_chart(chart2, use_container_width=True)
-            st.download_button('Download cluster assignments CSV', cl_df.to_csv(index=False), file_name='company_clusters.csv')
\ No newline at end of file
+            st.download_button('Download cluster assignments CSV', cl_df.to_csv(index=False), file_name='company_clusters.csv')
+
+    with st.expander('Choose the number of clusters (elbow / silhouette sweep)'):
+        k_lo, k_hi = st.slider('k range', 2, 20, (2, 10))
+        if st.button('Run sweep'):
+            with st.spinner('Fitting one clustering per k...'):
+                st.session_state['company_cluster_sweep'] = (params, cluster_sweep(DB_PATH, range(k_lo, k_hi + 1),
+                                                                                   top_n=cluster_top_n))
+        sweep = st.session_state.get('company_cluster_sweep')
+        if sweep is not None:
+            sweep_params, sweep_df = sweep
+            st.caption(f'Top {sweep_params[2]:,} companies. Look for the bend in inertia and the highest silhouette.')
+            base = alt.Chart(sweep_df).encode(x=alt.X('k:O'))
+            st.altair_chart(base.mark_line(point=True).encode(y=alt.Y('inertia:Q', scale=alt.Scale(zero=False)))
+                            | base.mark_line(point=True, color='orange').encode(y='silhouette:Q'), use_container_width=True)
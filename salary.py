@@ -0,0 +1,174 @@
+"""Salary normalization: raw salary strings / columns -> monthly min, max and midpoint.
+
+Handles currency prefixes and thousands separators ("$5,000"), "k" suffixes ("5k",
+"5-7k"), ranges ("5000 - 7000", "5k to 7k"), explicit periods in the text ("60k/year",
+"25 per hour", "4000 pm") and the `salary_type` column (Monthly / Annually / Hourly ...).
+Everything is converted to monthly amounts.
+
+Distinct raw strings are parsed once with a single regex pass and memoized (bounded), so
+recurring values in later chunks cost a dictionary lookup.
+"""
+import numpy as np
+import pandas as pd
+
+from sketches import bin_quantiles
+
+# multiply by this to get a monthly amount (40h weeks, 5-day weeks)
+PERIOD_TO_MONTHLY = {'hour': 40 * 52 / 12, 'day': 5 * 52 / 12, 'week': 52 / 12, 'month': 1.0, 'year': 1 / 12}
+PERIOD_ALIASES = {
+    'h': 'hour', 'hr': 'hour', 'hour': 'hour', 'hourly': 'hour',
+    'd': 'day', 'day': 'day', 'daily': 'day',
+    'wk': 'week', 'week': 'week', 'weekly': 'week',
+    'm': 'month', 'mo': 'month', 'mth': 'month', 'month': 'month', 'monthly': 'month',
+    'a': 'year', 'y': 'year', 'yr': 'year', 'year': 'year', 'yearly': 'year', 'annum': 'year',
+    'annual': 'year', 'annually': 'year',
+}
+
+_NUM = r'(\d+(?:\.\d+)?)'
+_CUR = r'(?:s?\$|sgd)?'
+SALARY_RE = (rf'^{_CUR}\s*{_NUM}\s*(k)?'
+             rf'(?:\s*(?:-|–|to)\s*{_CUR}\s*{_NUM}\s*(k)?)?'
+             r'\s*(?:(?:/|per\b|p\.?)\s*)?([a-z]+)?\.?\s*$')
+SALARY_TYPE_RE = r'(hour|day|daily|week|month|year|annual)'
+
+# raw string -> (low, high, has_period); cleared when it grows past the cap
+SALARY_MEMO_SIZE = 200000
+_salary_memo = {}
+_MISSING = (np.nan, np.nan, False)
+
+
+def _parse_new(raw):
+    """Parse distinct raw strings in one vectorized pass -> list of (low, high, has_period)."""
+    x = pd.Series(raw, dtype=object).astype(str).str.lower().str.replace(',', '', regex=False).str.strip()
+    m = x.str.extract(SALARY_RE)
+    lo = pd.to_numeric(m[0], errors='coerce')
+    hi = pd.to_numeric(m[2], errors='coerce')
+    k_lo, k_hi = m[1].notna(), m[3].notna()
+    # "5-7k": a trailing k applies to a bare low end too
+    k_lo = k_lo | (k_hi & hi.notna() & (lo < 1000))
+    lo = lo.where(~k_lo, lo * 1000)
+    hi = hi.where(~k_hi, hi * 1000)
+    unit = m[4].map(PERIOD_ALIASES)
+    # trailing words that are not a period (e.g. "5000 negotiable") make the value unparseable
+    bad = m[4].notna() & unit.isna()
+    factor = unit.map(PERIOD_TO_MONTHLY).fillna(1.0)
+    hi = (hi.fillna(lo) * factor).where(~bad)
+    lo = (lo * factor).where(~bad)
+    return list(zip(lo.tolist(), hi.tolist(), unit.notna().tolist()))
+
+
+def parse_salary_strings(s):
+    """Parse a Series of raw salary values into a DataFrame of low, high, mid, has_period.
+
+    Numeric Series are passed through (low = high = mid). Unparseable values give NaN.
+    Amounts with an explicit period in the text are already monthly (`has_period`).
+    """
+    if pd.api.types.is_numeric_dtype(s):
+        v = s.astype('float64')
+        return pd.DataFrame({'low': v, 'high': v, 'mid': v, 'has_period': False}, index=s.index)
+    codes, uniques = pd.factorize(s)
+    # plain amounts ("5000", "4500.5") are most of the data: converted in bulk, no regex or memo
+    num = pd.to_numeric(pd.Series(uniques, dtype=object), errors='coerce').to_numpy('float64')
+    plain = np.isfinite(num) & (num >= 0)
+    lo, hi, has_period = num.copy(), num.copy(), np.zeros(len(num), dtype=bool)
+    text = np.flatnonzero(~plain)
+    if len(text):
+        values = [_salary_memo.get(u, None) for u in uniques[text]]
+        new = [i for i, v in enumerate(values) if v is None]
+        if new:
+            if len(_salary_memo) + len(new) > SALARY_MEMO_SIZE:
+                _salary_memo.clear()
+            for i, parsed in zip(new, _parse_new(uniques[text[new]])):
+                values[i] = _salary_memo[uniques[text[i]]] = parsed
+        lo[text], hi[text], has_period[text] = (np.array(col) for col in zip(*values))
+    # per distinct value, then spread to rows; factorize codes missing values as -1 -> _MISSING
+    lo, hi, has_period = (np.append(col, miss)[codes] for col, miss in zip((lo, hi, has_period), _MISSING))
+    return pd.DataFrame({'low': lo.astype('float64'), 'high': hi.astype('float64'), 'mid': (lo + hi) / 2,
+                         'has_period': has_period.astype(bool)}, index=s.index)
+
+
+def salary_type_factor(salary_type):
+    """Monthly multiplier per row from the `salary_type` column (1.0 when missing/unknown)."""
+    unit = salary_type.astype(object).where(salary_type.notna(), '').astype(str).str.lower().str.extract(
+        SALARY_TYPE_RE, expand=False).replace({'daily': 'day', 'annual': 'year'})
+    return unit.map(PERIOD_TO_MONTHLY).fillna(1.0).astype('float64')
+
+
+def normalize_salaries(df):
+    """Monthly `salary_min`, `salary_max`, `salary_mid` for a chunk with the raw salary columns.
+
+    Uses `salary_minimum` / `salary_maximum` (numeric or text; a range in one column fills
+    both ends), fills a missing end from the other, orders the pair, and prefers
+    `average_salary` for the midpoint when present. `salary_type` scales values whose text
+    did not carry its own period.
+    """
+    idx = df.index
+    nan = pd.Series(np.nan, index=idx, dtype='float64')
+    no_period = pd.Series(False, index=idx)
+
+    def parsed(col):
+        if col not in df.columns:
+            return pd.DataFrame({'low': nan, 'high': nan, 'mid': nan, 'has_period': no_period})
+        return parse_salary_strings(df[col])
+
+    pmin, pmax, pavg = parsed('salary_minimum'), parsed('salary_maximum'), parsed('average_salary')
+    lo = pmin['low'].fillna(pmax['low'])
+    hi = pmax['high'].fillna(pmin['high'])
+    lo, hi = np.fmin(lo, hi), np.fmax(lo, hi)
+    mid = pavg['mid'].where(pavg['mid'].notna(), (lo + hi) / 2)
+    if 'salary_type' in df.columns:
+        factor = salary_type_factor(df['salary_type'])
+        has_period = pmin['has_period'] | pmax['has_period']
+        lo = lo * factor.where(~has_period, 1.0)
+        hi = hi * factor.where(~has_period, 1.0)
+        mid = mid * factor.where(~(pavg['has_period'] | (pavg['mid'].isna() & has_period)), 1.0)
+    return pd.DataFrame({'salary_min': lo, 'salary_max': hi, 'salary_mid': mid}, index=idx)
+
+
+# salary cube grain (see scripts/build_visual_db.py): fixed-width monthly bins, the last bin
+# index (SALARY_BINS) collects everything at or above the top edge
+SALARY_BIN_WIDTH = 250
+SALARY_BINS = 200
+SALARY_BIN_EDGES = np.arange(SALARY_BINS + 1) * float(SALARY_BIN_WIDTH)
+
+# (upper bound in whole years, label); anything above the last bound is '10+'
+EXPERIENCE_BUCKETS = [(0, '0'), (2, '1-2'), (5, '3-5'), (9, '6-9')]
+
+
+def salary_bin(values):
+    """Cube bin index of each monthly salary (NaN / negative values are the caller's to drop)."""
+    return np.minimum(np.floor(np.asarray(values, dtype='float64') / SALARY_BIN_WIDTH), SALARY_BINS).astype('int64')
+
+
+def experience_bucket(years):
+    """Label each minimum-years-of-experience value with its bucket ('unspecified' when missing)."""
+    years = pd.to_numeric(years, errors='coerce').astype('float64')
+    out = pd.Series('10+', index=years.index, dtype=object)
+    for bound, label in reversed(EXPERIENCE_BUCKETS):
+        out[years <= bound] = label
+    out[years.isna() | (years < 0)] = 'unspecified'
+    return out
+
+
+SALARY_QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+# salary_quantiles dimension -> salary_cube column ('all' is the whole cube)
+SALARY_DIMENSIONS = {'all': "'all'", 'category': 'category', 'position_level': 'position_level',
+                     'experience_bucket': 'experience_bucket', 'month': 'month_key'}
+
+
+def cube_quantiles(cube, qs=SALARY_QUANTILES):
+    """Per-value postings, mean and quantiles from salary cube rows (`value`, `bin`, `postings`, `salary_sum`).
+
+    Quantiles are interpolated within the cube bins; returns a DataFrame indexed by value
+    with `postings`, `mean` and one `p<NN>` column per quantile.
+    """
+    cols = ['postings', 'mean'] + [f'p{round(q * 100)}' for q in qs]
+    if cube.empty:
+        return pd.DataFrame(columns=cols)
+    counts = cube.pivot_table(index='value', columns='bin', values='postings', aggfunc='sum', fill_value=0)
+    counts = counts.reindex(columns=range(SALARY_BINS + 1), fill_value=0)
+    totals = cube.groupby('value')[['postings', 'salary_sum']].sum().loc[counts.index]
+    out = pd.DataFrame(bin_quantiles(counts.to_numpy(), SALARY_BIN_EDGES, qs), index=counts.index, columns=cols[2:])
+    out.insert(0, 'mean', totals['salary_sum'] / totals['postings'])
+    out.insert(0, 'postings', totals['postings'].astype('int64'))
+    return out
@@ -0,0 +1,403 @@
+"""Micro-benchmarks for the data pipeline on synthetic job data.
+
+Generates a synthetic CSV with the same columns as `SGJobData (2).csv` and times
+the hot paths against their previous (per-row Python) implementations.
+
+Usage:
+    python scripts/benchmark.py stream-summary --rows 1000000
+    python scripts/benchmark.py reservoir --rows 1000000 --sample-size 200000
+    python scripts/benchmark.py categories --rows 1000000 --distinct 50000
+    python scripts/benchmark.py growth --companies 100000 --periods 104
+    python scripts/benchmark.py charts --companies 5000 --periods 104
+    python scripts/benchmark.py engine --rows 1000000   (exits 1 if DuckDB and pandas disagree)
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+# ensure project root is on sys.path so imports of local modules work
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+CATEGORIES = ['Information Technology', 'Engineering', 'Sales / Retail', 'Healthcare / Pharmaceutical',
+              'Accounting / Auditing / Taxation', 'F&B', 'Admin / Secretarial', 'Banking and Finance']
+TITLES = ['Senior Software Engineer', 'Data Analyst', 'Accountant', 'Sales Executive', 'Chef de Partie',
+          'Admin Assistant', 'Python Developer (Backend)', 'Project Manager - IT', 'Staff Nurse',
+          'Mechanical Engineer', 'C++ Developer', 'Retail Assistant']
+LEVELS = ['Executive', 'Senior Executive', 'Manager', 'Junior Executive', 'Fresh/entry level']
+
+
+def make_synthetic_csv(path, n_rows, n_companies=20000, seed=0):
+    """Write a synthetic job CSV (string columns as in the real export, ~2% messy values, ~1% text salaries)."""
+    rng = np.random.default_rng(seed)
+    ncat = len(CATEGORIES)
+    # every (first, second) category pair pre-serialised once, then indexed
+    cat_strings = np.array([json.dumps([{'id': a, 'category': CATEGORIES[a]}, {'id': b, 'category': CATEGORIES[b]}])
+                            for a in range(ncat) for b in range(ncat)])
+    companies = np.array([f'COMPANY {i} PTE. LTD.' for i in range(n_companies)])
+    dates = pd.Timestamp('2022-10-01') + pd.to_timedelta(rng.integers(0, 730, n_rows), unit='D')
+    smin = rng.integers(2000, 9000, n_rows).astype(float)
+    smax = smin + rng.integers(0, 5000, n_rows)
+    df = pd.DataFrame({
+        'categories': cat_strings[rng.integers(0, ncat * ncat, n_rows)],
+        'employmentTypes': '[{"employmentType":"Full Time"}]',
+        'metadata_jobPostId': [f'MCF-2023-{i:07d}' for i in range(n_rows)],
+        'metadata_newPostingDate': dates.strftime('%Y-%m-%d'),
+        'minimumYearsExperience': rng.integers(0, 12, n_rows),
+        'numberOfVacancies': rng.integers(1, 6, n_rows),
+        'positionLevels': rng.choice(LEVELS, n_rows),
+        'postedCompany_name': companies[rng.zipf(1.3, n_rows) % n_companies],
+        'salary_maximum': smax,
+        'salary_minimum': smin,
+        'salary_type': 'Monthly',
+        'status_jobStatus': rng.choice(['Open', 'Closed', 'Re-open'], n_rows),
+        'title': np.array(TITLES)[rng.integers(0, len(TITLES), n_rows)],
+        'average_salary': (smin + smax) / 2,
+    })
+    messy = rng.random(n_rows)
+    df.loc[messy < 0.02, 'average_salary'] = np.nan
+    df['minimumYearsExperience'] = df['minimumYearsExperience'].astype('Int64')
+    df.loc[(messy >= 0.02) & (messy < 0.03), 'minimumYearsExperience'] = pd.NA
+    df.loc[(messy >= 0.03) & (messy < 0.035), 'metadata_newPostingDate'] = 'not a date'
+    df.loc[(messy >= 0.04) & (messy < 0.045), 'categories'] = np.nan
+    # text salaries as they appear in the export: '5.5k', '4,000-6,000', '3000/month' (see salary.py)
+    salaries = ['salary_minimum', 'salary_maximum', 'average_salary']
+    df[salaries] = df[salaries].astype(object)
+    k = (messy >= 0.05) & (messy < 0.055)
+    df.loc[k, 'salary_minimum'] = [f'{v / 1000:g}k' for v in smin[k]]
+    df.loc[k, 'salary_maximum'] = [f'{v / 1000:g}k' for v in smax[k]]
+    ranged = (messy >= 0.055) & (messy < 0.06)
+    df.loc[ranged, 'salary_minimum'] = [f'{a:,.0f}-{b:,.0f}' for a, b in zip(smin[ranged], smax[ranged])]
+    df.loc[ranged, 'salary_maximum'] = np.nan
+    period = (messy >= 0.06) & (messy < 0.062)
+    df.loc[period, 'salary_minimum'] = [f'{v:.0f}/month' for v in smin[period]]
+    df.loc[k | ranged | period, 'average_salary'] = np.nan
+    df.to_csv(path, index=False)
+    return Path(path)
+
+
+def legacy_stream_summary(path, date_freq='W'):
+    """The original per-row stream_summary aggregation (sampling omitted), kept as the baseline."""
+    from ingest import primary_category
+    it = pd.read_csv(path, chunksize=20000, iterator=True, dtype=str)
+    total_rows = 0
+    status_counts, company_counts, category_counts, experience_counts = Counter(), Counter(), Counter(), Counter()
+    sample_salaries = []
+    sum_salary, count_salary = 0.0, 0
+    postings_time, vacancies_time = Counter(), Counter()
+    for chunk in it:
+        total_rows += len(chunk)
+        status_counts.update(chunk['status_jobStatus'].fillna('').values)
+        company_counts.update(chunk['postedCompany_name'].fillna('').values)
+        for s in chunk['categories'].fillna('').values:
+            cat = primary_category(s)
+            if cat:
+                category_counts.update([cat])
+        for v in chunk['minimumYearsExperience'].fillna('').values:
+            try:
+                experience_counts[int(v)] += 1
+            except Exception:
+                experience_counts['unspecified'] += 1
+        for v in chunk['average_salary'].fillna('').values:
+            try:
+                fv = float(v)
+                count_salary += 1
+                sum_salary += fv
+                if fv > 0:
+                    sample_salaries.append(fv)
+            except Exception:
+                continue
+        dates = pd.to_datetime(chunk['metadata_newPostingDate'], errors='coerce')
+        for p in dates.dt.to_period(date_freq).dropna().astype(str).values:
+            postings_time[p] += 1
+        for d, v in zip(dates.values, chunk['numberOfVacancies'].fillna('0').values):
+            if pd.isna(d):
+                continue
+            try:
+                n = int(v)
+            except Exception:
+                n = 0
+            vacancies_time[pd.Period(d, freq=date_freq).strftime('%Y-%m-%d')] += n
+    return {
+        'total_rows': total_rows,
+        'status_counts': status_counts,
+        'top_companies': company_counts.most_common(50),
+        'top_categories': category_counts.most_common(50),
+        'average_salary': sum_salary / count_salary if count_salary else 0.0,
+        'vacancies_over_time': pd.Series(dict(sorted(vacancies_time.items()))),
+        'experience_counts': experience_counts,
+        'unique_companies': len(company_counts),
+    }
+
+
+def legacy_sample_rows(path, sample_size):
+    """The original fill-then-replace-with-p=0.001 sampler (list of dicts), kept as the baseline."""
+    sample_rows = []
+    for chunk in pd.read_csv(path, chunksize=20000, iterator=True, dtype=str):
+        if len(sample_rows) < sample_size:
+            s = chunk.sample(n=min(len(chunk), sample_size - len(sample_rows)))
+            sample_rows.extend(s.to_dict(orient='records'))
+        else:
+            mask = np.random.rand(len(chunk)) < 0.001
+            for _, r in chunk[mask].iterrows():
+                sample_rows[np.random.randint(0, len(sample_rows))] = r.to_dict()
+    return sample_rows
+
+
+def reservoir_sample_rows(path, sample_size):
+    from ingest import iter_chunks
+    from sketches import ReservoirSampler
+    sampler = ReservoirSampler(sample_size)
+    for chunk in iter_chunks(path, chunksize=20000):
+        sampler.update(chunk)
+    return sampler.result()
+
+
+def make_category_strings(n_rows, n_distinct, seed=0):
+    """`categories` JSON strings as in the export, drawn from n_distinct distinct values."""
+    rng = np.random.default_rng(seed)
+    pool = np.array([json.dumps([{'id': int(i), 'category': CATEGORIES[i % len(CATEGORIES)]},
+                                 {'id': int(i) + 1, 'category': CATEGORIES[(i // 7) % len(CATEGORIES)]}])
+                     for i in range(n_distinct)], dtype=object)
+    return pd.Series(pool[rng.integers(0, n_distinct, n_rows)], dtype=object)
+
+
+def bench_categories(args):
+    import ingest
+    cats = make_category_strings(args.rows, args.distinct)
+    chunks = [cats.iloc[a:a + 20000] for a in range(0, len(cats), 20000)]
+
+    def per_row():
+        return [pd.Series([ingest.primary_category(c) for c in ch], index=ch.index) for ch in chunks]
+
+    def per_chunk_distinct():
+        return [ch.map({c: ingest.primary_category(c) for c in ch.dropna().unique()}) for ch in chunks]
+
+    def vectorized():
+        ingest._category_memo.clear()
+        return [ingest.primary_categories(ch) for ch in chunks]
+
+    print(f'{args.rows:,} rows, {args.distinct:,} distinct category strings')
+    base, t_row = _timed('json.loads per row', args.rows, per_row)
+    _, t_chunk = _timed('json.loads per distinct/chunk', args.rows, per_chunk_distinct)
+    new, t_vec = _timed('regex extract + memo', args.rows, vectorized)
+    same = all(a.tolist() == b.tolist() for a, b in zip(base, new))
+    print('result parity:', 'OK' if same else 'MISMATCH')
+    print(f'speedup: {t_row / t_vec:.1f}x vs per row, {t_chunk / t_vec:.1f}x vs per distinct/chunk')
+    _timed('multi-label table', args.rows, ingest.category_labels, cats)
+
+
+def make_company_matrix(n_companies, n_periods, density=0.3, seed=0):
+    """Synthetic weekly CompanyPeriodMatrix: each company is active in ~density of the periods."""
+    from scipy import sparse
+    from utils import CompanyPeriodMatrix
+    rng = np.random.default_rng(seed)
+    postings = sparse.random(n_companies, n_periods, density=density, format='csr', random_state=seed,
+                             data_rvs=lambda k: rng.integers(1, 20, k))
+    vacancies = postings.copy()
+    vacancies.data = postings.data * rng.integers(1, 4, len(postings.data))
+    periods = pd.period_range('2022-01-03', periods=n_periods, freq='W')
+    keys = periods.start_time.strftime('%Y%m%d').astype(int).to_numpy()
+    names = np.array([f'COMPANY {i} PTE. LTD.' for i in range(n_companies)], dtype=object)
+    return CompanyPeriodMatrix(np.arange(1, n_companies + 1), names, periods.astype(str).to_numpy(object), keys,
+                               vacancies.astype('int32'), postings.astype('int32'))
+
+
+def legacy_company_growth(df, top_n=20):
+    """The original pivot + iterrows top movers over the long (company, period, vacancies) table."""
+    pivot = df.pivot_table(index='company', columns='period', values='vacancies', aggfunc='sum', fill_value=0)
+    cols = sorted(pivot.columns, key=lambda x: pd.to_datetime(x, errors='coerce'))
+    last, prev = cols[-1], cols[-2]
+    res = []
+    for comp, row in pivot.iterrows():
+        last_v = row.get(last, 0)
+        prev_v = row.get(prev, 0)
+        pct = (last_v - prev_v) / prev_v * 100 if prev_v != 0 else float('inf') if last_v > 0 else 0.0
+        res.append((comp, int(last_v), int(prev_v), pct, row[cols[-12:]].tolist() if len(cols) > 12 else row.tolist()))
+    out = pd.DataFrame(res, columns=['company', 'last_vacancies', 'prev_vacancies', 'pct_change', 'history'])
+    return out.sort_values('pct_change', ascending=False).head(top_n)
+
+
+def bench_growth(args):
+    from utils import company_growth, company_yoy_growth
+    m = make_company_matrix(args.companies, args.periods)
+    print(f'{args.companies:,} companies x {args.periods} periods, {m.vacancies.nnz:,} non-empty cells '
+          f'(rates below are companies/s)')
+    coo = m.vacancies.tocoo()
+    long = pd.DataFrame({'company': m.companies[coo.row], 'period': m.periods[coo.col], 'vacancies': coo.data})
+    before, t_before = _timed('legacy pivot + iterrows', args.companies, legacy_company_growth, long, 50)
+    after, t_after = _timed('matrix top movers', args.companies, company_growth, m, top_n=50)
+    # the legacy ranking orders ties arbitrarily: compare the values and the rows above the cut
+    cut = before['pct_change'].iloc[-1]
+    rows = [x[x['pct_change'] != cut][['company', 'last_vacancies', 'prev_vacancies', 'pct_change']]
+            .sort_values(['pct_change', 'company']).values.tolist() for x in (before, after)]
+    same = rows[0] == rows[1] and np.array_equal(before['pct_change'].values, after['pct_change'].values)
+    print('result parity:', 'OK' if same else 'MISMATCH')
+    print(f'speedup: {t_before / t_after:.0f}x')
+    _timed('rolling 4, lookback 5', args.companies, company_growth, m, lookback_periods=5, window=4)
+    _timed('z-score anomalies', args.companies, company_growth, m, window=4, rank_by='zscore')
+    _timed('year-over-year', args.companies, company_yoy_growth, m)
+
+
+def _arrow_bytes(df):
+    import pyarrow as pa
+    return pa.Table.from_pandas(df, preserve_index=False).nbytes
+
+
+def bench_charts(args):
+    from charts import chart_data
+    m = make_company_matrix(args.companies, args.periods)
+    long = m.series(m.companies)[['period_dt', 'vacancies', 'company']]
+    print(f'{args.companies:,} company lines, {len(long):,} points')
+    (out, _), _ = _timed('chart_data (top 10 + Other)', len(long), chart_data, long, 'period_dt', 'vacancies', 'company', top_k=10)
+    print(f'arrow payload: {_arrow_bytes(long) / 1e6:.2f} MB -> {_arrow_bytes(out) / 1e3:.1f} kB ({len(out):,} points)')
+    line = pd.DataFrame({'period_dt': pd.date_range('2020-01-01', periods=args.points, freq='min'),
+                         'vacancies': np.random.default_rng(0).normal(size=args.points).cumsum()})
+    for method in ('lttb', 'minmax'):
+        _timed(f'{method} ({args.points:,} -> 400)', args.points, chart_data, line, 'period_dt', 'vacancies',
+                        method=method)
+
+
+def _timed(label, n_rows, fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    out = fn(*args, **kwargs)
+    dt = time.perf_counter() - t0
+    print(f'{label:<28} {dt:8.2f}s  {n_rows / dt:12,.0f} rows/s')
+    return out, dt
+
+
+def bench_stream_summary(args):
+    from utils import stream_summary
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = Path(tmp) / 'synthetic.csv'
+        print(f'Generating {args.rows:,} synthetic rows...')
+        make_synthetic_csv(csv_path, args.rows)
+        before, t_before = _timed('legacy (per-row)', args.rows, legacy_stream_summary, csv_path)
+        after, t_after = _timed('vectorized (CSV)', args.rows, stream_summary, csv_path, sample_size=args.sample_size)
+        mismatched = [k for k, v in before.items()
+                      if not (v.equals(after[k]) if isinstance(v, pd.Series) else v == after[k])
+                      and not (isinstance(v, float) and np.isclose(v, after[k]))]
+        print('result parity:', 'OK' if not mismatched else f'MISMATCH in {mismatched}')
+        print(f'speedup: {t_before / t_after:.1f}x')
+        if args.parquet:
+            from ingest import convert_csv_to_parquet
+            _timed('parquet conversion', args.rows, convert_csv_to_parquet, csv_path)
+            _timed('vectorized (Parquet)', args.rows, stream_summary, csv_path, sample_size=args.sample_size)
+
+
+def _same_aggregates(a, b):
+    """Equal aggregate frames up to row order (salary sums to float tolerance)."""
+    a, b = a.sort_index(), b.sort_index()
+    if not a.index.equals(b.index) or list(a.columns) != list(b.columns):
+        return False
+    return all(np.allclose(a[c], b[c]) if c == 'salary_sum' else a[c].equals(b[c]) for c in a.columns)
+
+
+def _same_summary(a, b):
+    """Keys of two stream_summary dicts that differ (top lists compared tie-insensitively, sample rows skipped)."""
+    differ = []
+    for k, v in a.items():
+        w = b[k]
+        if k in ('top_companies', 'top_categories', 'top_title_words'):
+            same = sorted(v, key=lambda t: (-t[1], t[0])) == sorted(w, key=lambda t: (-t[1], t[0]))
+        elif k in ('salary_digest', 'salary_hist', 'salary_quantiles', 'sample_rows'):
+            continue  # sketch internals depend on insertion order; hist and quantiles are compared below
+        elif isinstance(v, pd.Series):
+            same = v.equals(w)
+        elif isinstance(v, float):
+            same = np.isclose(v, w)
+        else:
+            same = v == w
+        if not same:
+            differ.append(k)
+    if a['salary_hist'].to_frame().to_dict() != b['salary_hist'].to_frame().to_dict():
+        differ.append('salary_hist')
+    if not np.allclose(list(a['salary_quantiles'].values()), list(b['salary_quantiles'].values()), rtol=0.01):
+        differ.append('salary_quantiles')
+    return differ
+
+
+def _salary_rows(csv_path):
+    """Postings with a positive monthly salary, parsed straight from the CSV text by salary.normalize_salaries."""
+    from salary import normalize_salaries
+    return sum(int((normalize_salaries(ch)['salary_mid'] > 0).sum())
+               for ch in pd.read_csv(csv_path, chunksize=200000, dtype=str))
+
+
+def bench_engine(args):
+    """Returns True when the engines disagree (the script then exits 1, so CI can gate on it)."""
+    import duckdb_engine
+    from build_visual_db import aggregate_source
+    from utils import stream_summary
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = Path(tmp) / 'synthetic.csv'
+        print(f'Generating {args.rows:,} synthetic rows...')
+        make_synthetic_csv(csv_path, args.rows)
+        before, t_before = _timed('build aggregates (pandas)', args.rows, aggregate_source, csv_path)
+        after, t_after = _timed('build aggregates (duckdb)', args.rows, duckdb_engine.aggregate, csv_path)
+        same = all(_same_aggregates(x, y) for x, y in zip(before[:-2], after[:-2])) and before[-2:] == after[-2:]
+        print('result parity:', 'OK' if same else 'MISMATCH')
+        print(f'speedup: {t_before / t_after:.1f}x')
+        before, t_before = _timed('stream_summary (pandas)', args.rows, stream_summary, csv_path)
+        after, t_after = _timed('stream_summary (duckdb)', args.rows, stream_summary, csv_path, engine='duckdb')
+        mismatched = _same_summary(before, after)
+        print('result parity:', 'OK' if not mismatched else f'MISMATCH in {mismatched}')
+        print(f'speedup: {t_before / t_after:.1f}x')
+        # text salaries ('5k', ranges, '/month') must survive ingest in both engines
+        expected = _salary_rows(csv_path)
+        parsed = expected == before['salary_digest'].count == after['salary_digest'].count
+        print(f'salary rows: parsed {expected:,}, pandas {before["salary_digest"].count:,}, '
+              f'duckdb {after["salary_digest"].count:,}:', 'OK' if parsed else 'MISMATCH')
+    return not same or bool(mismatched) or not parsed
+
+
+def bench_reservoir(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = Path(tmp) / 'synthetic.csv'
+        print(f'Generating {args.rows:,} synthetic rows...')
+        make_synthetic_csv(csv_path, args.rows)
+        before, _ = _timed('legacy (fill + p=0.001)', args.rows, legacy_sample_rows, csv_path, args.sample_size)
+        after, _ = _timed('reservoir (Algorithm L)', args.rows, reservoir_sample_rows, csv_path, args.sample_size)
+        # share of the sample drawn from the second half of the file (uniform -> ~0.5)
+        half = f'MCF-2023-{args.rows // 2:07d}'
+        late_before = np.mean([r['metadata_jobPostId'] >= half for r in before])
+        late_after = float((after['metadata_jobPostId'] >= half).mean())
+        print(f'rows from 2nd half of file: legacy {late_before:.3f}, reservoir {late_after:.3f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest='bench', required=True)
+    p = sub.add_parser('stream-summary', help='stream_summary rows/sec before vs after vectorization')
+    p.add_argument('--rows', type=int, default=1000000)
+    p.add_argument('--sample-size', type=int, default=20000)
+    p.add_argument('--parquet', action='store_true', help='also time the Parquet ingest path')
+    p.set_defaults(func=bench_stream_summary)
+    p = sub.add_parser('reservoir', help='sample_rows sampler: legacy vs Algorithm L (time and uniformity)')
+    p.add_argument('--rows', type=int, default=1000000)
+    p.add_argument('--sample-size', type=int, default=200000)
+    p.set_defaults(func=bench_reservoir)
+    p = sub.add_parser('categories', help='primary category extraction: json.loads vs regex + memo')
+    p.add_argument('--rows', type=int, default=1000000)
+    p.add_argument('--distinct', type=int, default=50000)
+    p.set_defaults(func=bench_categories)
+    p = sub.add_parser('growth', help='company top movers: pivot + iterrows vs company x period matrix')
+    p.add_argument('--companies', type=int, default=100000)
+    p.add_argument('--periods', type=int, default=104)
+    p.set_defaults(func=bench_growth)
+    p = sub.add_parser('charts', help='chart data reduction: payload size and downsampling time')
+    p.add_argument('--companies', type=int, default=5000)
+    p.add_argument('--periods', type=int, default=104)
+    p.add_argument('--points', type=int, default=1000000, help='length of the single line to downsample')
+    p.set_defaults(func=bench_charts)
+    p = sub.add_parser('engine', help='build aggregates and stream_summary: pandas stream vs DuckDB (time and parity)')
+    p.add_argument('--rows', type=int, default=1000000)
+    p.set_defaults(func=bench_engine)
+    args = parser.parse_args()
+    sys.exit(1 if args.func(args) else 0)
@@ -1,158 +1,715 @@
 """Build a visual SQLite database from the large job CSV for fast dashboard queries.
 
-Produces `data/visual.db` with tables:
- - companies(id INTEGER PRIMARY KEY, name TEXT)
- - vacancies(company_id INTEGER, period TEXT, year INTEGER, month INTEGER, week INTEGER, vacancies INTEGER, postings INTEGER)
- - industry_vacancies(industry TEXT, period TEXT, vacancies INTEGER, postings INTEGER)
+Produces `data/visual.db` (WAL mode) with tables:
+ - companies(id INTEGER PRIMARY KEY, name TEXT UNIQUE)
+ - vacancies(company_id, period, period_key, year, month, week, vacancies, postings), PRIMARY KEY (company_id, period)
+ - industry_vacancies(industry, period, period_key, vacancies, postings), PRIMARY KEY (industry, period)
+ - salary_cube(category, position_level, experience_bucket, month_key, bin, postings, salary_sum):
+   counts of postings per monthly-salary bin (see salary.py), PRIMARY KEY on all five dimensions
+ - keyword_postings(term, period, period_key, vacancies, postings), PRIMARY KEY (term, period):
+   postings lists of the lowercase title keywords (tokenized once per distinct title)
+ - keyword_cooccurrence(term_a, term_b, postings), PRIMARY KEY (term_a, term_b): postings whose
+   title contains both keywords (both orders stored, so "co-occurs with X" is one key range)
+ - build_state(key, value)
+ - rollups: vacancies_monthly / vacancies_yearly / company_totals,
+   industry_monthly / industry_yearly / industry_totals, keyword_monthly / keyword_totals
+   and salary_quantiles (p10..p90 and mean per category / position level / experience bucket / month)
+`period_key` is the period's start date as an integer YYYYMMDD. DBs from older builds
+are migrated in place (`--migrate` does only that) and the plan of every page query
+is printed after each build.
+
+The typed Parquet copy of the CSV (see `scripts/convert_to_parquet.py`) is read
+instead of the CSV whenever it is newer.
+
+With `--workers N` the source is split into N shards (byte ranges on record
+boundaries for the CSV, row groups for the Parquet copy) that are aggregated in a
+process pool and merged; the resulting tables are identical to a single-process build.
+
+`--fts` also builds `postings_fts`, an FTS5 index over the title, company and primary
+category of every posting (with job id, posting date, vacancies and monthly salary
+stored alongside for display); once present it is kept up to date by every later build.
+
+Every build records a
+high-water mark in `build_state` (CSV byte offset, rows and max posting date read);
+`--incremental` aggregates only the rows appended to the CSV since then and upserts
+them, falling back to a full rebuild when the CSV was rewritten rather than appended.
+
+`--engine duckdb` runs the full-rebuild aggregation in DuckDB instead of the pandas
+stream (see `duckdb_engine.py`): same aggregates, written by the same upserts, with
+the scan and group-bys multi-threaded. Incremental appends always use pandas.
 
 Usage:
     python scripts/build_visual_db.py --csv data/SGJobData\ \(2\).csv --db data/visual.db --date-freq W
+    python scripts/build_visual_db.py --workers 4
+    python scripts/build_visual_db.py --incremental
+    python scripts/build_visual_db.py --fts
+    python scripts/build_visual_db.py --engine duckdb
 """
 import argparse
+import hashlib
+import os
 import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-import pandas as pd
 import numpy as np
-from collections import defaultdict
-import json
+import pandas as pd
+# ensure project root is on sys.path so imports of local modules work
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from ingest import iter_shard, plan_shards, primary_category, title_keywords  # noqa: E402,F401
+from salary import (SALARY_DIMENSIONS, SALARY_QUANTILES, cube_quantiles, experience_bucket,  # noqa: E402
+                    normalize_salaries, salary_bin)
 
-def primary_category(cat_str):
-    if not isinstance(cat_str, str) or not cat_str:
-        return None
+# bytes hashed at the start of the CSV and just before the high-water mark
+FINGERPRINT_BYTES = 1 << 16
+
+# only these columns are read from the source (CSV or its Parquet copy)
+BUILD_COLUMNS = ['metadata_newPostingDate', 'postedCompany_name', 'numberOfVacancies', 'primary_category',
+                 'salary_minimum', 'salary_maximum', 'average_salary', 'salary_type', 'positionLevels',
+                 'minimumYearsExperience', 'title']
+
+SALARY_CUBE_KEYS = ['category', 'position_level', 'experience_bucket', 'month_key', 'bin']
+# company, industry, salary cube, keyword postings, keyword co-occurrence
+N_AGGREGATES = 5
+
+# read in a separate pass when the full-text index is built (--fts)
+FTS_COLUMNS = ['metadata_jobPostId', 'title', 'postedCompany_name', 'primary_category', 'metadata_newPostingDate',
+               'numberOfVacancies', 'salary_minimum', 'salary_maximum', 'average_salary', 'salary_type']
+
+
+def aggregate_chunk(chunk, date_freq='W'):
+    """Vectorized (company, period) and (industry, period) sums of vacancies and postings for one chunk.
+
+    Rows without a parsable posting date are dropped. Returns N_AGGREGATES DataFrames: company
+    and industry aggregates indexed by (name, period) with `vacancies` and `postings` columns,
+    the salary cube slice indexed by SALARY_CUBE_KEYS with `postings` and `salary_sum`, and
+    the title keyword postings and co-occurrence counts (see `keyword_chunk`).
+    """
+    dates = pd.to_datetime(chunk['metadata_newPostingDate'], errors='coerce')
+    periods = dates.dt.to_period(date_freq)
+    vacs = chunk.get('numberOfVacancies', pd.Series(1, index=chunk.index)).fillna(1)
+    # ensure numeric
+    vacs = pd.to_numeric(vacs, errors='coerce').fillna(0).astype(int)
+    frame = pd.DataFrame({
+        'company': chunk['postedCompany_name'].fillna('UNKNOWN'),
+        # primary category is extracted once at ingest
+        'industry': chunk['primary_category'].fillna('Unknown').replace('', 'Unknown'),
+        'period': periods,
+        'vacancies': vacs,
+        'postings': 1,
+    })[periods.notna()]
+    comp = frame.groupby(['company', 'period'], sort=False)[['vacancies', 'postings']].sum()
+    ind = frame.groupby(['industry', 'period'], sort=False)[['vacancies', 'postings']].sum()
+    return (comp, ind, salary_cube_chunk(chunk, dates),
+            *keyword_chunk(frame['vacancies'], periods[periods.notna()], chunk['title'][periods.notna()]))
+
+
+def keyword_chunk(vacancies, periods, titles):
+    """Title keyword postings lists and keyword pair co-occurrence for one chunk's dated rows.
+
+    Returns (terms, pairs): postings and vacancies per (term, period), and postings per
+    ordered (term_a, term_b) pair of distinct keywords appearing in the same title.
+    """
+    codes, terms = title_keywords(titles)
+    rows = pd.DataFrame({'code': codes, 'period': periods.to_numpy(), 'vacancies': vacancies.to_numpy(), 'postings': 1})
+    by_term = rows.merge(terms, on='code').groupby(['term', 'period'], sort=False)[['vacancies', 'postings']].sum()
+    # pairs are formed per distinct title, weighted by how many postings carry that title
+    weight = np.bincount(codes[codes >= 0])
+    pairs = terms.merge(terms, on='code', suffixes=('_a', '_b'))
+    pairs = pairs[pairs['term_a'] != pairs['term_b']]
+    pairs = pairs.assign(postings=weight[pairs['code'].to_numpy()]).groupby(['term_a', 'term_b'], sort=False)[['postings']].sum()
+    return by_term.rename_axis(['name', 'period']), pairs
+
+
+def salary_cube_chunk(chunk, dates):
+    """Postings and salary sums per (category, position level, experience bucket, month, salary bin)."""
+    mid = normalize_salaries(chunk)['salary_mid']
+    keep = (mid > 0) & dates.notna()
+    if not keep.any():
+        return _empty_agg(SALARY_CUBE_KEYS, ['postings', 'salary_sum'])
+    chunk, mid, dates = chunk[keep], mid[keep], dates[keep]
+    level = chunk['positionLevels'] if 'positionLevels' in chunk.columns else pd.Series(None, index=chunk.index)
+    exp = chunk['minimumYearsExperience'] if 'minimumYearsExperience' in chunk.columns else pd.Series(np.nan, index=chunk.index)
+    frame = pd.DataFrame({
+        'category': chunk['primary_category'].fillna('Unknown').replace('', 'Unknown'),
+        'position_level': level.fillna('Unspecified').replace('', 'Unspecified'),
+        'experience_bucket': experience_bucket(exp),
+        'month_key': dates.dt.year * 100 + dates.dt.month,
+        'bin': salary_bin(mid),
+        'postings': 1,
+        'salary_sum': mid,
+    })
+    return frame.groupby(SALARY_CUBE_KEYS, sort=False)[['postings', 'salary_sum']].sum()
+
+
+def _merge(parts):
+    """Sum partial aggregate frames that share the same index (e.g. (name, period))."""
+    if len(parts) == 1:
+        return parts[0]
+    merged = pd.concat(parts)
+    return merged.groupby(level=list(range(merged.index.nlevels)), sort=False).sum()
+
+
+def _latest(*dates):
+    """Most recent of the given timestamps, ignoring NaT/None."""
+    dates = [pd.Timestamp(d) for d in dates if d is not None and not pd.isna(d)]
+    return max(dates) if dates else pd.NaT
+
+
+def _empty_agg(names=('name', 'period'), columns=('vacancies', 'postings')):
+    return pd.DataFrame({c: [] for c in columns}, dtype='int64',
+                        index=pd.MultiIndex.from_tuples([], names=list(names)))
+
+
+def _empty_aggs():
+    return (_empty_agg(), _empty_agg(), _empty_agg(SALARY_CUBE_KEYS, ['postings', 'salary_sum']), _empty_agg(),
+            _empty_agg(['term_a', 'term_b'], ['postings']))
+
+
+def aggregate_shard(shard, date_freq='W', chunksize=20000):
+    """Aggregate one shard from `plan_shards`.
+
+    Returns the N_AGGREGATES frames of `aggregate_chunk` followed by rows_read and max_posting_date.
+    """
+    parts = tuple([] for _ in range(N_AGGREGATES))
+    total = 0
+    max_date = pd.NaT
+    for chunk in iter_shard(shard, columns=BUILD_COLUMNS, chunksize=chunksize):
+        total += len(chunk)
+        for acc, agg in zip(parts, aggregate_chunk(chunk, date_freq)):
+            acc.append(agg)
+        max_date = _latest(max_date, pd.to_datetime(chunk['metadata_newPostingDate'], errors='coerce').max())
+        # fold partials periodically so memory tracks distinct keys, not chunks
+        if len(parts[0]) >= 16:
+            parts = tuple([_merge(p)] for p in parts)
+    if not parts[0]:
+        return (*_empty_aggs(), 0, pd.NaT)
+    return (*(_merge(p) for p in parts), total, max_date)
+
+
+def aggregate_source(csv_path, date_freq='W', chunksize=20000, workers=1, start=None, end=None):
+    """Aggregate the source, optionally across a pool of `workers` processes.
+
+    `start` and `end` are CSV byte offsets to aggregate from and up to (see `plan_shards`).
+    Returns the N_AGGREGATES frames of `aggregate_chunk` followed by rows_read and max_posting_date.
+    """
+    shards = plan_shards(csv_path, max(1, workers), start=start, end=end)
+    if workers > 1 and len(shards) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(aggregate_shard, shards, [date_freq] * len(shards), [chunksize] * len(shards)))
+    else:
+        results = [aggregate_shard(s, date_freq, chunksize) for s in shards]
+    if not results:
+        return (*_empty_aggs(), 0, pd.NaT)
+    aggs = (_merge([r[i] for r in results]) for i in range(N_AGGREGATES))
+    return (*aggs, sum(r[-2] for r in results), _latest(*(r[-1] for r in results)))
+
+
+def _period_parts(periods):
+    """period_key (YYYYMMDD), year, month and ISO week of each period's start date."""
+    start = pd.PeriodIndex(periods).start_time
+    keys = start.year * 10000 + start.month * 100 + start.day
+    return keys, start.year, start.month, start.isocalendar().week.values
+
+
+def _fingerprints(csv_path, offset):
+    """sha1 of the CSV's first bytes and of the bytes just before `offset`."""
+    with open(csv_path, 'rb') as f:
+        head = hashlib.sha1(f.read(min(offset, FINGERPRINT_BYTES))).hexdigest()
+        f.seek(max(0, offset - FINGERPRINT_BYTES))
+        mark = hashlib.sha1(f.read(min(offset, FINGERPRINT_BYTES))).hexdigest()
+    return head, mark
+
+
+def read_build_state(conn):
+    """Return the recorded high-water mark as a dict (empty if the DB has none)."""
     try:
-        arr = json.loads(cat_str)
-        if isinstance(arr, list) and arr:
-            return arr[0].get('category')
-    except Exception:
-        # naive parse
-        try:
-            s = cat_str
-            idx = s.find('"category":')
-            if idx >= 0:
-                sub = s[idx+len('"category":'):]
-                # find next '"'
-                q = sub.find('"')
-                if q >= 0:
-                    return sub[q+1:sub.find('"', q+1)]
-        except Exception:
-            pass
-    return None
-
-
-def build_db(csv_path, db_path, chunksize=20000, date_freq='W'):
-    p_csv = Path(csv_path)
-    p_db = Path(db_path)
-    if not p_csv.exists():
-        raise FileNotFoundError(f"CSV not found: {p_csv}")
+        return dict(conn.execute('SELECT key, value FROM build_state').fetchall())
+    except sqlite3.OperationalError:
+        return {}
 
-    conn = sqlite3.connect(str(p_db))
-    cur = conn.cursor()
 
-    # create tables
-    cur.executescript('''
-    CREATE TABLE IF NOT EXISTS companies (
+def _write_build_state(conn, csv_path, offset, rows, max_date, date_freq):
+    head, mark = _fingerprints(csv_path, offset)
+    state = {
+        'source': str(Path(csv_path).resolve()),
+        'csv_offset': str(offset),
+        'rows': str(rows),
+        'max_posting_date': '' if pd.isna(max_date) else pd.Timestamp(max_date).strftime('%Y-%m-%d'),
+        'date_freq': date_freq,
+        'head_sha1': head,
+        'mark_sha1': mark,
+    }
+    conn.executemany('INSERT OR REPLACE INTO build_state (key, value) VALUES (?, ?)', state.items())
+
+
+def _resume_offset(conn, csv_path, date_freq):
+    """Byte offset to continue an incremental build from, or None if a full rebuild is needed."""
+    state = read_build_state(conn)
+    if not state.get('csv_offset') or state.get('date_freq') != date_freq:
+        return None
+    offset = int(state['csv_offset'])
+    if Path(csv_path).stat().st_size < offset:
+        return None
+    # the processed prefix must be byte-for-byte unchanged (append-only file)
+    if _fingerprints(csv_path, offset) != (state.get('head_sha1'), state.get('mark_sha1')):
+        return None
+    return offset
+
+
+SCHEMA_VERSION = 4  # PRAGMA user_version; 0 = pre-index, 1 = no rollups, 2 = no salary cube, 3 = no keywords
+
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS companies (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         name TEXT UNIQUE
-    );
-    CREATE TABLE IF NOT EXISTS vacancies (
-        company_id INTEGER,
-        period TEXT,
+    )''',
+    '''CREATE TABLE IF NOT EXISTS vacancies (
+        company_id INTEGER NOT NULL,
+        period TEXT NOT NULL,
+        period_key INTEGER NOT NULL,
         year INTEGER,
         month INTEGER,
         week INTEGER,
-        vacancies INTEGER,
-        postings INTEGER
-    );
-    CREATE TABLE IF NOT EXISTS industry_vacancies (
-        industry TEXT,
-        period TEXT,
-        vacancies INTEGER,
-        postings INTEGER
-    );
-    ''')
+        vacancies INTEGER NOT NULL DEFAULT 0,
+        postings INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (company_id, period)
+    ) WITHOUT ROWID''',
+    '''CREATE TABLE IF NOT EXISTS industry_vacancies (
+        industry TEXT NOT NULL,
+        period TEXT NOT NULL,
+        period_key INTEGER NOT NULL,
+        vacancies INTEGER NOT NULL DEFAULT 0,
+        postings INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (industry, period)
+    ) WITHOUT ROWID''',
+    '''CREATE TABLE IF NOT EXISTS salary_cube (
+        category TEXT NOT NULL,
+        position_level TEXT NOT NULL,
+        experience_bucket TEXT NOT NULL,
+        month_key INTEGER NOT NULL,
+        bin INTEGER NOT NULL,
+        postings INTEGER NOT NULL DEFAULT 0,
+        salary_sum REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (category, position_level, experience_bucket, month_key, bin)
+    ) WITHOUT ROWID''',
+    '''CREATE TABLE IF NOT EXISTS keyword_postings (
+        term TEXT NOT NULL,
+        period TEXT NOT NULL,
+        period_key INTEGER NOT NULL,
+        vacancies INTEGER NOT NULL DEFAULT 0,
+        postings INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (term, period)
+    ) WITHOUT ROWID''',
+    '''CREATE TABLE IF NOT EXISTS keyword_cooccurrence (
+        term_a TEXT NOT NULL,
+        term_b TEXT NOT NULL,
+        postings INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (term_a, term_b)
+    ) WITHOUT ROWID''',
+    '''CREATE TABLE IF NOT EXISTS build_state (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    )''',
+    # the primary keys cover (company_id, period) and (industry, period) lookups;
+    # this covers the all-companies GROUP BY period on the vacancies page
+    'CREATE INDEX IF NOT EXISTS ix_vacancies_period ON vacancies (period, vacancies, postings)',
+]
+
+# rollups materialized from the base (date_freq grain, weekly by default) tables after
+# every build. Periods are attributed to the month/year of their start date.
+ROLLUPS = [
+    ('vacancies_monthly', '''CREATE TABLE IF NOT EXISTS vacancies_monthly (
+        company_id INTEGER NOT NULL,
+        month_key INTEGER NOT NULL,
+        vacancies INTEGER NOT NULL,
+        postings INTEGER NOT NULL,
+        PRIMARY KEY (company_id, month_key)
+    ) WITHOUT ROWID''', '''INSERT INTO vacancies_monthly
+        SELECT company_id, period_key / 100, SUM(vacancies), SUM(postings)
+        FROM vacancies GROUP BY company_id, period_key / 100'''),
+    ('vacancies_yearly', '''CREATE TABLE IF NOT EXISTS vacancies_yearly (
+        company_id INTEGER NOT NULL,
+        year INTEGER NOT NULL,
+        vacancies INTEGER NOT NULL,
+        postings INTEGER NOT NULL,
+        PRIMARY KEY (company_id, year)
+    ) WITHOUT ROWID''', '''INSERT INTO vacancies_yearly
+        SELECT company_id, period_key / 10000, SUM(vacancies), SUM(postings)
+        FROM vacancies GROUP BY company_id, period_key / 10000'''),
+    ('company_totals', '''CREATE TABLE IF NOT EXISTS company_totals (
+        company_id INTEGER PRIMARY KEY,
+        vacancies INTEGER NOT NULL,
+        postings INTEGER NOT NULL,
+        periods INTEGER NOT NULL,
+        first_period_key INTEGER,
+        last_period_key INTEGER
+    )''', '''INSERT INTO company_totals
+        SELECT company_id, SUM(vacancies), SUM(postings), COUNT(*), MIN(period_key), MAX(period_key)
+        FROM vacancies GROUP BY company_id'''),
+    ('industry_monthly', '''CREATE TABLE IF NOT EXISTS industry_monthly (
+        industry TEXT NOT NULL,
+        month_key INTEGER NOT NULL,
+        vacancies INTEGER NOT NULL,
+        postings INTEGER NOT NULL,
+        PRIMARY KEY (industry, month_key)
+    ) WITHOUT ROWID''', '''INSERT INTO industry_monthly
+        SELECT industry, period_key / 100, SUM(vacancies), SUM(postings)
+        FROM industry_vacancies GROUP BY industry, period_key / 100'''),
+    ('industry_yearly', '''CREATE TABLE IF NOT EXISTS industry_yearly (
+        industry TEXT NOT NULL,
+        year INTEGER NOT NULL,
+        vacancies INTEGER NOT NULL,
+        postings INTEGER NOT NULL,
+        PRIMARY KEY (industry, year)
+    ) WITHOUT ROWID''', '''INSERT INTO industry_yearly
+        SELECT industry, period_key / 10000, SUM(vacancies), SUM(postings)
+        FROM industry_vacancies GROUP BY industry, period_key / 10000'''),
+    ('industry_totals', '''CREATE TABLE IF NOT EXISTS industry_totals (
+        industry TEXT PRIMARY KEY,
+        vacancies INTEGER NOT NULL,
+        postings INTEGER NOT NULL
+    )''', '''INSERT INTO industry_totals
+        SELECT industry, SUM(vacancies), SUM(postings) FROM industry_vacancies GROUP BY industry'''),
+    ('keyword_monthly', '''CREATE TABLE IF NOT EXISTS keyword_monthly (
+        term TEXT NOT NULL,
+        month_key INTEGER NOT NULL,
+        vacancies INTEGER NOT NULL,
+        postings INTEGER NOT NULL,
+        PRIMARY KEY (term, month_key)
+    ) WITHOUT ROWID''', '''INSERT INTO keyword_monthly
+        SELECT term, period_key / 100, SUM(vacancies), SUM(postings)
+        FROM keyword_postings GROUP BY term, period_key / 100'''),
+    ('keyword_totals', '''CREATE TABLE IF NOT EXISTS keyword_totals (
+        term TEXT PRIMARY KEY,
+        vacancies INTEGER NOT NULL,
+        postings INTEGER NOT NULL
+    )''', '''INSERT INTO keyword_totals
+        SELECT term, SUM(vacancies), SUM(postings) FROM keyword_postings GROUP BY term'''),
+]
+
+# per-dimension salary quantiles, computed from salary_cube in Python (see build_salary_quantiles)
+SALARY_QUANTILES_TABLE = '''CREATE TABLE IF NOT EXISTS salary_quantiles (
+    dimension TEXT NOT NULL,
+    value TEXT NOT NULL,
+    postings INTEGER NOT NULL,
+    mean REAL,
+    p10 REAL,
+    p25 REAL,
+    p50 REAL,
+    p75 REAL,
+    p90 REAL,
+    PRIMARY KEY (dimension, value)
+) WITHOUT ROWID'''
+
+# optional full-text index (--fts); only title, company and category are searchable, prefix
+# indexes make type-ahead prefix queries ("eng*") cheap
+FTS_TABLE = '''CREATE VIRTUAL TABLE IF NOT EXISTS postings_fts USING fts5(
+    title, company, category,
+    job_id UNINDEXED, posted UNINDEXED, vacancies UNINDEXED, salary UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+)'''
+
+ROLLUP_INDEXES = [
+    # top-N by total vacancies and "all companies in year Y" reads
+    'CREATE INDEX IF NOT EXISTS ix_company_totals_vacancies ON company_totals (vacancies DESC, company_id)',
+    'CREATE INDEX IF NOT EXISTS ix_vacancies_yearly_year ON vacancies_yearly (year, company_id, vacancies)',
+    # top keywords by postings
+    'CREATE INDEX IF NOT EXISTS ix_keyword_totals_postings ON keyword_totals (postings DESC, term)',
+]
+
+# the queries the pages issue, reported with EXPLAIN QUERY PLAN after each build
+PAGE_QUERIES = [
+    ('5_Company_Vacancies: company list', 'SELECT id, name FROM companies ORDER BY name', ()),
+    ('5_Company_Vacancies: all companies by period',
+     'SELECT period, SUM(vacancies) as vacancies, SUM(postings) as postings FROM vacancies GROUP BY period ORDER BY period',
+     ()),
+    ('5_Company_Vacancies: one company',
+     'SELECT period, vacancies, postings FROM vacancies WHERE company_id=? ORDER BY period', (1,)),
+    ('5_Company_Vacancies: top companies',
+     'SELECT c.name, t.vacancies as total_vac FROM company_totals t JOIN companies c ON c.id=t.company_id '
+     'ORDER BY t.vacancies DESC LIMIT 20', ()),
+    ('6_Industry_Unemployment: industry by period',
+     'SELECT industry, period, SUM(vacancies) as vacancies, SUM(postings) as postings FROM industry_vacancies '
+     'GROUP BY industry, period', ()),
+    ('utils.load_company_vacancies',
+     'SELECT c.name as company, v.period, v.vacancies, v.postings FROM vacancies v JOIN companies c ON v.company_id=c.id',
+     ()),
+    ('utils.load_industry_vacancies', 'SELECT industry, period, vacancies, postings FROM industry_vacancies', ()),
+    ('utils.compute_company_yoy_growth',
+     'SELECT y.company_id, y.year, y.vacancies FROM vacancies_yearly y WHERE y.year IN (?, ?)', (2024, 2023)),
+    ('utils top industries', 'SELECT industry FROM industry_totals ORDER BY vacancies DESC LIMIT 20', ()),
+    ('utils.salary_quantiles_by', 'SELECT * FROM salary_quantiles WHERE dimension=?', ('category',)),
+    ('utils.salary_distribution: month range',
+     'SELECT bin, SUM(postings), SUM(salary_sum) FROM salary_cube WHERE month_key BETWEEN ? AND ? GROUP BY bin',
+     (202301, 202312)),
+    ('utils.keyword_totals', 'SELECT term, postings, vacancies FROM keyword_totals ORDER BY postings DESC LIMIT ?',
+     (30,)),
+    ('utils.keyword_trends', 'SELECT term, month_key, postings, vacancies FROM keyword_monthly WHERE term IN (?, ?)',
+     ('engineer', 'manager')),
+    ('utils.keyword_cooccurrence',
+     'SELECT term_b, postings FROM keyword_cooccurrence WHERE term_a=? ORDER BY postings DESC LIMIT ?',
+     ('engineer', 20)),
+]
+
+
+def period_key(period):
+    """Integer YYYYMMDD of a period's start date ('2023-01-02/2023-01-08' -> 20230102, '2023-01' -> 20230101)."""
+    if period is None:
+        return None
+    return int(pd.Period(str(period).split('/')[0]).start_time.strftime('%Y%m%d'))
+
+
+def apply_pragmas(conn):
+    """WAL journal (readers never block on the writer) plus write/scan friendly settings."""
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA cache_size=-65536')  # 64MB
+    conn.execute('PRAGMA mmap_size=268435456')  # 256MB
+
+
+def migrate_schema(conn):
+    """Create the current schema, upgrading tables written by older builds in place.
+
+    Pre-index tables are copied into the keyed tables with a computed `period_key`;
+    any duplicate (key, period) rows they contain are summed.
+    """
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    legacy = [t for t in ('vacancies', 'industry_vacancies') if t in tables] if version < 1 else []
+    conn.create_function('period_key', 1, period_key, deterministic=True)
+    conn.execute('BEGIN')
+    for t in legacy:
+        conn.execute(f'ALTER TABLE {t} RENAME TO {t}_legacy')
+    for stmt in SCHEMA:
+        conn.execute(stmt)
+    if 'vacancies' in legacy:
+        print('Migrating vacancies to the keyed schema...')
+        conn.execute('''
+            INSERT INTO vacancies (company_id, period, period_key, year, month, week, vacancies, postings)
+            SELECT company_id, period, period_key(period), MIN(year), MIN(month), MIN(week),
+                   SUM(vacancies), SUM(postings)
+            FROM vacancies_legacy WHERE company_id IS NOT NULL AND period IS NOT NULL
+            GROUP BY company_id, period
+        ''')
+        conn.execute('DROP TABLE vacancies_legacy')
+    if 'industry_vacancies' in legacy:
+        print('Migrating industry_vacancies to the keyed schema...')
+        conn.execute('''
+            INSERT INTO industry_vacancies (industry, period, period_key, vacancies, postings)
+            SELECT industry, period, period_key(period), SUM(vacancies), SUM(postings)
+            FROM industry_vacancies_legacy WHERE industry IS NOT NULL AND period IS NOT NULL
+            GROUP BY industry, period
+        ''')
+        conn.execute('DROP TABLE industry_vacancies_legacy')
+    for _, create, _ in ROLLUPS:
+        conn.execute(create)
+    conn.execute(SALARY_QUANTILES_TABLE)
+    for stmt in ROLLUP_INDEXES:
+        conn.execute(stmt)
+    if version < 2 and tables:
+        build_rollups(conn)
+    if 0 < version < 4:
+        # the salary cube (v3) and keyword index (v4) are built from raw columns older builds never
+        # kept: they stay empty until the next full build, and dropping the high-water mark makes
+        # the next --incremental run a full one
+        conn.execute('DELETE FROM build_state')
+        print('Added salary cube / keyword tables; the next build will be a full rebuild to populate them.')
+    conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
     conn.commit()
 
-    company_id_map = {}
 
-    # aggregates as dicts: (company, period) -> (vacancies_sum, postings_count)
-    comp_period_vac = defaultdict(lambda: [0, 0])
-    ind_period_vac = defaultdict(lambda: [0, 0])
+def build_rollups(conn):
+    """Re-materialize every rollup table from the base tables (caller commits)."""
+    print('Materializing rollups...')
+    for name, _, populate in ROLLUPS:
+        conn.execute(f'DELETE FROM {name}')
+        conn.execute(populate)
+    build_salary_quantiles(conn)
+
+
+def build_salary_quantiles(conn):
+    """Recompute salary_quantiles from salary_cube: interpolated bin quantiles per dimension value."""
+    conn.execute('DELETE FROM salary_quantiles')
+    for dimension, column in SALARY_DIMENSIONS.items():
+        cube = pd.read_sql_query(
+            f'SELECT {column} AS value, bin, SUM(postings) AS postings, SUM(salary_sum) AS salary_sum '
+            f'FROM salary_cube GROUP BY {column}, bin', conn)
+        table = cube_quantiles(cube, SALARY_QUANTILES)
+        rows = zip([dimension] * len(table), table.index.astype(str).tolist(), *(table[c].tolist() for c in table.columns))
+        conn.executemany('INSERT INTO salary_quantiles VALUES (?,?,?,?,?,?,?,?,?)', rows)
+
+
+def build_fts(conn, csv_path, chunksize=20000, start=None, end=None):
+    """Add the postings from CSV byte `start` (all postings if None) up to `end` to postings_fts (caller commits).
 
-    it = pd.read_csv(p_csv, chunksize=chunksize, iterator=True, dtype=str)
+    A full build recreates the table; returns the number of postings indexed.
+    """
+    if start is None:
+        conn.execute('DROP TABLE IF EXISTS postings_fts')
+    conn.execute(FTS_TABLE)
     total = 0
-    print('Streaming CSV and aggregating...')
-    for chunk in it:
-        total += len(chunk)
-        # parse dates
-        dates = pd.to_datetime(chunk['metadata_newPostingDate'], errors='coerce')
-        periods = dates.dt.to_period(date_freq)
-        companies = chunk['postedCompany_name'].fillna('UNKNOWN')
-        vacs = chunk.get('numberOfVacancies', pd.Series(1, index=chunk.index)).fillna('1')
-        # ensure numeric
-        vacs = pd.to_numeric(vacs, errors='coerce').fillna(0).astype(int)
-
-        # categories
-        cats = chunk['categories'].fillna('')
-        for comp, p, v, cat_str in zip(companies.values, periods.values, vacs.values, cats.values):
-            if pd.isna(p):
-                continue
-            period = str(p)
-            comp_period_vac[(comp, period)][0] += int(v)
-            comp_period_vac[(comp, period)][1] += 1
-            ind = primary_category(cat_str) or 'Unknown'
-            ind_period_vac[(ind, period)][0] += int(v)
-            ind_period_vac[(ind, period)][1] += 1
+    for shard in plan_shards(csv_path, 1, start=start, end=end):
+        for chunk in iter_shard(shard, columns=FTS_COLUMNS, chunksize=chunksize):
+            rows = pd.DataFrame({
+                'title': chunk['title'].fillna(''),
+                'company': chunk['postedCompany_name'].fillna(''),
+                'category': chunk['primary_category'].fillna(''),
+                'job_id': chunk['metadata_jobPostId'],
+                'posted': pd.to_datetime(chunk['metadata_newPostingDate'], errors='coerce').dt.strftime('%Y-%m-%d'),
+                'vacancies': chunk['numberOfVacancies'],
+                'salary': normalize_salaries(chunk)['salary_mid'].round(0),
+            })
+            # plain Python values with None for missing ones, which is what sqlite3 binds
+            rows = rows.astype(object).where(rows.notna(), None)
+            conn.executemany('INSERT INTO postings_fts (title, company, category, job_id, posted, vacancies, salary) '
+                             'VALUES (?,?,?,?,?,?,?)', rows.itertuples(index=False, name=None))
+            total += len(chunk)
+    # merge the index segments written by the batches above
+    conn.execute("INSERT INTO postings_fts (postings_fts) VALUES ('optimize')")
+    return total
+
+
+def report_query_plans(conn):
+    """Print EXPLAIN QUERY PLAN for each page query."""
+    print('Query plans:')
+    for label, sql, params in PAGE_QUERIES:
+        plan = conn.execute('EXPLAIN QUERY PLAN ' + sql, params).fetchall()
+        print(f'  {label}')
+        for row in plan:
+            print(f'    {row[-1]}')
+
+
+def _reset(cur):
+    """Empty all aggregate tables ahead of a full rebuild (company ids restart at 1).
+
+    Not committed here: the reset and the rebuilt rows land in one transaction.
+    """
+    for table in ('vacancies', 'industry_vacancies', 'salary_cube', 'keyword_postings', 'keyword_cooccurrence',
+                  'companies', 'build_state'):
+        cur.execute(f'DELETE FROM {table}')
+    cur.execute("DELETE FROM sqlite_sequence WHERE name = 'companies'")
+
+
+def build_db(csv_path, db_path, chunksize=20000, date_freq='W', workers=1, incremental=False, fts=False,
+             engine='pandas'):
+    p_csv = Path(csv_path)
+    p_db = Path(db_path)
+    if not p_csv.exists():
+        raise FileNotFoundError(f"CSV not found: {p_csv}")
+
+    conn = sqlite3.connect(str(p_db))
+    apply_pragmas(conn)
+    migrate_schema(conn)
+    cur = conn.cursor()
+
+    # high-water mark of this run: the CSV size before reading it; nothing past it is read
+    csv_size = p_csv.stat().st_size
+    start = _resume_offset(conn, p_csv, date_freq) if incremental else None
+    if incremental and start is None:
+        print('No usable high-water mark (first build, changed --date-freq or rewritten CSV); full rebuild.')
+    if start is not None and start >= csv_size:
+        print('No new rows since the last build; nothing to do.')
+        conn.close()
+        return
+    if start is None:
+        _reset(cur)
+
+    if start is None and engine == 'duckdb':
+        import duckdb_engine
+        print('Aggregating source with DuckDB...')
+        aggs = duckdb_engine.aggregate(p_csv, date_freq)
+        if p_csv.stat().st_size != csv_size:
+            # DuckDB read to the end of a CSV that grew meanwhile; recount up to the high-water mark
+            print('CSV changed during the DuckDB scan; aggregating up to the recorded size with pandas...')
+            aggs = aggregate_source(p_csv, date_freq, chunksize, workers, end=csv_size)
+    else:
+        if start is None:
+            print(f'Streaming source and aggregating ({workers} worker(s))...')
+        else:
+            print(f'Aggregating rows appended after byte {start:,} ({workers} worker(s))...')
+        aggs = aggregate_source(p_csv, date_freq, chunksize, workers, start=start, end=csv_size)
+    comp_agg, ind_agg, sal_agg, kw_agg, pair_agg, total, max_date = aggs
+    comp_agg = comp_agg.sort_index()
+    ind_agg = ind_agg.sort_index()
     print('Aggregated rows:', total)
 
     print('Inserting companies...')
-    # insert companies
-    comps = set(k[0] for k in comp_period_vac.keys())
-    for c in comps:
-        if c in ('', None):
-            continue
-        try:
-            cur.execute('INSERT OR IGNORE INTO companies (name) VALUES (?)', (c,))
-        except Exception:
-            continue
-    conn.commit()
+    # sorted insert keeps company ids deterministic across runs and worker counts
+    names = sorted(comp_agg.index.get_level_values(0).unique())
+    cur.executemany('INSERT OR IGNORE INTO companies (name) VALUES (?)', [(c,) for c in names])
 
     # load company id map
     cur.execute('SELECT id, name FROM companies')
-    for _id, name in cur.fetchall():
-        company_id_map[name] = _id
-
-    print('Inserting vacancy aggregates (companies)...')
-    rows = []
-    for (comp, period), (vac_sum, postings) in comp_period_vac.items():
-        cid = company_id_map.get(comp)
-        if cid is None:
-            # try to insert
-            cur.execute('INSERT OR IGNORE INTO companies (name) VALUES (?)', (comp,))
-            conn.commit()
-            cur.execute('SELECT id FROM companies WHERE name=?', (comp,))
-            cid = cur.fetchone()[0]
-            company_id_map[comp] = cid
-        # parse year/month/week
-        try:
-            per = pd.Period(period)
-            year = per.start_time.year
-            month = per.start_time.month
-            week = per.start_time.isocalendar()[1]
-        except Exception:
-            year = month = week = None
-        rows.append((cid, period, year, month, week, vac_sum, postings))
-
-    cur.executemany('INSERT INTO vacancies VALUES (?,?,?,?,?,?,?)', rows)
-    conn.commit()
+    company_id_map = {name: _id for _id, name in cur.fetchall()}
+
+    print('Upserting vacancy aggregates (companies)...')
+    comps = comp_agg.index.get_level_values(0)
+    periods = comp_agg.index.get_level_values(1)
+    keys, years, months, weeks = _period_parts(periods)
+    rows = zip(comps.map(company_id_map).tolist(), periods.astype(str).tolist(), keys.tolist(), years.tolist(),
+               months.tolist(), weeks.tolist(), comp_agg['vacancies'].tolist(), comp_agg['postings'].tolist())
+    cur.executemany('''
+        INSERT INTO vacancies (company_id, period, period_key, year, month, week, vacancies, postings)
+        VALUES (?,?,?,?,?,?,?,?)
+        ON CONFLICT (company_id, period) DO UPDATE SET
+            vacancies = vacancies + excluded.vacancies, postings = postings + excluded.postings
+    ''', rows)
+
+    print('Upserting industry vacancy aggregates...')
+    ind_periods = ind_agg.index.get_level_values(1)
+    rows = zip(ind_agg.index.get_level_values(0).tolist(), ind_periods.astype(str).tolist(),
+               _period_parts(ind_periods)[0].tolist(), ind_agg['vacancies'].tolist(), ind_agg['postings'].tolist())
+    cur.executemany('''
+        INSERT INTO industry_vacancies (industry, period, period_key, vacancies, postings) VALUES (?,?,?,?,?)
+        ON CONFLICT (industry, period) DO UPDATE SET
+            vacancies = vacancies + excluded.vacancies, postings = postings + excluded.postings
+    ''', rows)
+
+    print('Upserting salary cube...')
+    sal = sal_agg.reset_index()
+    cur.executemany('''
+        INSERT INTO salary_cube (category, position_level, experience_bucket, month_key, bin, postings, salary_sum)
+        VALUES (?,?,?,?,?,?,?)
+        ON CONFLICT (category, position_level, experience_bucket, month_key, bin) DO UPDATE SET
+            postings = postings + excluded.postings, salary_sum = salary_sum + excluded.salary_sum
+    ''', zip(*(sal[c].tolist() for c in SALARY_CUBE_KEYS), sal['postings'].tolist(), sal['salary_sum'].tolist()))
+
+    print('Upserting keyword postings and co-occurrence...')
+    kw_periods = kw_agg.index.get_level_values(1)
+    rows = zip(kw_agg.index.get_level_values(0).tolist(), kw_periods.astype(str).tolist(),
+               _period_parts(kw_periods)[0].tolist(), kw_agg['vacancies'].tolist(), kw_agg['postings'].tolist())
+    cur.executemany('''
+        INSERT INTO keyword_postings (term, period, period_key, vacancies, postings) VALUES (?,?,?,?,?)
+        ON CONFLICT (term, period) DO UPDATE SET
+            vacancies = vacancies + excluded.vacancies, postings = postings + excluded.postings
+    ''', rows)
+    cur.executemany('''
+        INSERT INTO keyword_cooccurrence (term_a, term_b, postings) VALUES (?,?,?)
+        ON CONFLICT (term_a, term_b) DO UPDATE SET postings = postings + excluded.postings
+    ''', zip(pair_agg.index.get_level_values(0).tolist(), pair_agg.index.get_level_values(1).tolist(),
+             pair_agg['postings'].tolist()))
+
+    has_fts = bool(cur.execute("SELECT 1 FROM sqlite_master WHERE name = 'postings_fts'").fetchone())
+    if fts or has_fts:
+        print('Indexing postings for full-text search...')
+        # a newly requested index covers every posting, not just the appended ones
+        print('Indexed postings:', build_fts(conn, p_csv, chunksize, start=start if has_fts else None,
+                                                 end=csv_size))
 
-    print('Inserting industry vacancy aggregates...')
-    rows = []
-    for (ind, period), (vac_sum, postings) in ind_period_vac.items():
-        rows.append((ind, period, vac_sum, postings))
-    cur.executemany('INSERT INTO industry_vacancies VALUES (?,?,?,?)', rows)
+    # advance the high-water mark in the same transaction as the data it covers
+    prev = read_build_state(conn) if start is not None else {}
+    max_date = _latest(prev.get('max_posting_date') or None, max_date)
+    _write_build_state(conn, p_csv, csv_size, int(prev.get('rows', 0)) + total, max_date, date_freq)
+    build_rollups(conn)
     conn.commit()
 
+    # refresh planner statistics, then fold the WAL back into the main file
+    conn.execute('ANALYZE')
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    report_query_plans(conn)
     conn.close()
     print('DB built at', p_db)
 
@@ -163,5 +720,23 @@ if __name__ == '__main__':
     parser.add_argument('--db', default='data/visual.db')
     parser.add_argument('--chunksize', type=int, default=20000)
     parser.add_argument('--date-freq', default='W')
+    parser.add_argument('--workers', type=int, default=1, help='aggregate in N processes (default: 1)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='only fold in rows appended to the CSV since the last build')
+    parser.add_argument('--migrate', action='store_true',
+                        help='only upgrade an existing DB to the current schema and report query plans')
+    parser.add_argument('--fts', action='store_true',
+                        help='also build the postings_fts full-text index (kept up to date by later builds)')
+    parser.add_argument('--engine', choices=('pandas', 'duckdb'), default='pandas',
+                        help='aggregate full rebuilds with DuckDB (multi-threaded) instead of the pandas stream')
     args = parser.parse_args()
-    build_db(args.csv, args.db, chunksize=args.chunksize, date_freq=args.date_freq)
+    if args.migrate:
+        conn = sqlite3.connect(args.db)
+        apply_pragmas(conn)
+        migrate_schema(conn)
+        conn.execute('ANALYZE')
+        report_query_plans(conn)
+        conn.close()
+        sys.exit(0)
+    build_db(args.csv, args.db, chunksize=args.chunksize, date_freq=args.date_freq, workers=args.workers,
+             incremental=args.incremental, fts=args.fts, engine=args.engine)
@@ -0,0 +1,28 @@
+"""Convert the job CSV into the typed, column-pruned Parquet copy used by all readers.
+
+Run once after downloading / refreshing the CSV; `utils.stream_summary`, `read_sample`
+and `scripts/build_visual_db.py` pick the Parquet file up automatically while it is
+newer than the CSV.
+
+Usage:
+    python scripts/convert_to_parquet.py --csv "data/SGJobData (2).csv"
+"""
+import argparse
+import os
+import sys
+import time
+# ensure project root is on sys.path so imports of local modules work
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ingest import convert_csv_to_parquet  # noqa: E402
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--csv', default='data/SGJobData (2).csv')
+    parser.add_argument('--out', default=None, help='defaults to the CSV path with a .parquet suffix')
+    parser.add_argument('--chunksize', type=int, default=200000)
+    args = parser.parse_args()
+    t0 = time.time()
+    out, total = convert_csv_to_parquet(args.csv, args.out, chunksize=args.chunksize)
+    print(f'Wrote {total:,} rows to {out} in {time.time() - t0:.1f}s')
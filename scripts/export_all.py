@@ -0,0 +1,125 @@
+"""Export every shareable artifact in one headless batch run (no Streamlit server needed).
+
+The CSV summary and the DB analytics are computed once in the parent process, then
+the artifacts are written by a process pool:
+ - `executive_brief.pdf` (same content as the Executive Brief page)
+ - `screenshots/*.png` (see `scripts/generate_screenshots.py`)
+ - `tables/*.csv` and/or `tables/*.parquet`: the aggregates behind the pages' CSV
+   downloads (industry vacancies and heatmap, company movers, YoY and clusters,
+   salary quantiles per dimension, keyword totals)
+
+Meant for a nightly job after `scripts/build_visual_db.py`; exits non-zero if any
+artifact failed.
+
+Usage:
+    python scripts/export_all.py --csv "data/SGJobData (2).csv" --db data/visual.db --out exports
+    python scripts/export_all.py --formats csv parquet --workers 4 --skip screenshots
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+# ensure project root is on sys.path so imports of local modules work
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import db  # noqa: E402
+from brief import render_charts, render_pdf  # noqa: E402
+from generate_screenshots import dashboard_image, df_to_image, page_tables  # noqa: E402
+from salary import SALARY_DIMENSIONS  # noqa: E402
+from utils import (cached_stream_summary, cluster_companies, compute_company_growth, compute_company_yoy_growth,  # noqa: E402
+                   industry_heatmap_matrix, keyword_totals, load_industry_vacancies, salary_months, salary_quantiles_by)
+
+ARTIFACTS = ('brief', 'screenshots', 'tables')
+
+
+def write_brief(summary, hm, yoy, clip_pct, path):
+    path.write_bytes(render_pdf(summary, render_charts(summary, hm, clip_pct), yoy))
+    return path
+
+
+def write_dashboard(summary, path):
+    dashboard_image(summary, path)
+    return path
+
+
+def write_table_image(df, title, path):
+    df_to_image(df, title, path)
+    return path
+
+
+def write_table(df, path):
+    if path.suffix == '.parquet':
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+    return path
+
+
+def analytics_tables(db_path, top_n=20):
+    """The DB aggregates to export, by file stem."""
+    tables = {
+        'industry_vacancies': load_industry_vacancies(db_path),
+        'industry_heatmap': industry_heatmap_matrix(db_path, top_n=top_n).reset_index(),
+        'company_growth_top_movers': compute_company_growth(db_path, top_n=top_n),
+        'company_yoy_top': compute_company_yoy_growth(db_path, top_n=top_n),
+        'company_clusters': cluster_companies(db_path)[0],
+    }
+    if salary_months(db_path):
+        for dimension in SALARY_DIMENSIONS:
+            tables[f'salary_quantiles_{dimension}'] = salary_quantiles_by(db_path, dimension).reset_index()
+    if db.has_table('keyword_totals', db_path):
+        tables['keyword_totals'] = keyword_totals(db_path, top_n=1000)
+    return tables
+
+
+def export_all(csv_path, db_path, out_dir, sample_size=20000, clip_pct=99, formats=('csv',), workers=None, skip=()):
+    """Write the artifacts under out_dir; returns the number that failed."""
+    out_dir = Path(out_dir)
+    t0 = time.perf_counter()
+    print('Computing summary and DB analytics...')
+    summary = cached_stream_summary(csv_path, sample_size=sample_size, date_freq='W')
+    jobs = []
+    if 'brief' not in skip:
+        jobs.append((write_brief, summary, industry_heatmap_matrix(db_path, top_n=10),
+                     compute_company_yoy_growth(db_path, top_n=10), clip_pct, out_dir / 'executive_brief.pdf'))
+    if 'screenshots' not in skip:
+        (out_dir / 'screenshots').mkdir(parents=True, exist_ok=True)
+        jobs.append((write_dashboard, summary, out_dir / 'screenshots' / '0_Dashboard.png'))
+        for name, df in page_tables(summary, csv_path).items():
+            jobs.append((write_table_image, df, name.replace('_', ' '), out_dir / 'screenshots' / f'{name}.png'))
+    if 'tables' not in skip:
+        (out_dir / 'tables').mkdir(parents=True, exist_ok=True)
+        for name, df in analytics_tables(db_path).items():
+            for fmt in formats:
+                jobs.append((write_table, df, out_dir / 'tables' / f'{name}.{fmt}'))
+    out_dir.mkdir(parents=True, exist_ok=True)
+    print(f'Analytics ready in {time.perf_counter() - t0:.1f}s; writing {len(jobs)} artifacts...')
+
+    failed = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(fn, *args): args[-1] for fn, *args in jobs}
+        for future in as_completed(futures):
+            try:
+                print('Wrote', future.result())
+            except Exception as e:
+                failed += 1
+                print(f'FAILED {futures[future]}: {e}', file=sys.stderr)
+    print(f'Exported {len(jobs) - failed}/{len(jobs)} artifacts to {out_dir} in {time.perf_counter() - t0:.1f}s')
+    return failed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--csv', default='data/SGJobData (2).csv')
+    parser.add_argument('--db', default='data/visual.db')
+    parser.add_argument('--out', default='exports')
+    parser.add_argument('--sample-size', type=int, default=20000)
+    parser.add_argument('--clip-pct', type=int, default=99, help='salary chart clip percentile in the brief')
+    parser.add_argument('--formats', nargs='+', choices=('csv', 'parquet'), default=['csv'])
+    parser.add_argument('--workers', type=int, default=None, help='writer processes (default: one per CPU)')
+    parser.add_argument('--skip', nargs='+', choices=ARTIFACTS, default=[])
+    args = parser.parse_args()
+    sys.exit(1 if export_all(args.csv, args.db, args.out, args.sample_size, args.clip_pct, args.formats, args.workers,
+                             args.skip) else 0)
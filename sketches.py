@@ -0,0 +1,339 @@
+"""Streaming sketches used by `stream_summary` (one pass, bounded memory, mergeable where noted)."""
+import math
+
+import numpy as np
+import pandas as pd
+
+
+class ReservoirSampler:
+    """Uniform sample of `k` rows from a stream of DataFrame chunks (Li's Algorithm L).
+
+    The reservoir is kept as a columnar DataFrame. After the reservoir is full only the
+    rows that enter it are touched: the positions of successive replacements are drawn in
+    NumPy batches (geometric skips with a running threshold `W`), so the cost per chunk is
+    proportional to the number of replacements, not the number of rows. Every row of the
+    stream ends up in the sample with probability k / n.
+    """
+
+    def __init__(self, k, random_state=None):
+        self.k = int(k)
+        self.rng = np.random.default_rng(random_state)
+        self.n_seen = 0
+        self._parts = []  # chunk slices while filling
+        self._reservoir = None
+        self._w = None
+        self._next = None  # global index of the next row to enter the reservoir
+
+    def _uniform(self, size=None):
+        return 1.0 - self.rng.random(size)  # (0, 1], safe to take the log of
+
+    def _skip(self, w):
+        skip = np.floor(np.log(self._uniform(np.shape(w))) / np.log1p(-w))
+        return np.minimum(skip, 2 ** 40).astype('int64') + 1
+
+    def _start_sampling(self):
+        self._reservoir = pd.concat(self._parts, ignore_index=True) if self._parts else pd.DataFrame()
+        self._parts = []
+        self._w = math.exp(math.log(self._uniform()) / self.k)
+        self._next = self.k - 1 + int(self._skip(self._w))
+
+    def _positions(self, end):
+        """Global positions (< end) of the next replacements; advances `_w` / `_next` past them."""
+        out = []
+        while self._next < end:
+            # expected replacements in [next, end) is about k * ln(end / next)
+            batch = int(self.k * math.log(end / max(self._next, 1))) + 16
+            w = self._w * np.exp(np.cumsum(np.log(self._uniform(batch))) / self.k)
+            pos = self._next + np.concatenate(([0], np.cumsum(self._skip(w[:-1]))))
+            inside = int(np.searchsorted(pos, end))
+            out.append(pos[:inside])
+            if inside < batch:
+                self._next = int(pos[inside])
+                self._w = float(w[inside - 1]) if inside else self._w
+            else:
+                self._w = float(w[-1])
+                self._next = int(pos[-1] + self._skip(self._w))
+        return np.concatenate(out) if out else np.empty(0, dtype='int64')
+
+    def update(self, chunk):
+        """Feed the next chunk of the stream."""
+        start, n = self.n_seen, len(chunk)
+        self.n_seen += n
+        if self.k <= 0 or n == 0:
+            return
+        if self._reservoir is None:
+            take = min(n, self.k - start)
+            self._parts.append(chunk.iloc[:take])
+            if start + take < self.k:
+                return
+            self._start_sampling()
+            chunk, start = chunk.iloc[take:], start + take
+        pos = self._positions(self.n_seen)
+        if not len(pos):
+            return
+        slots = self.rng.integers(0, self.k, len(pos))
+        # a slot hit twice keeps only its last replacement
+        last = len(slots) - 1 - np.unique(slots[::-1], return_index=True)[1]
+        keep = np.ones(self.k, dtype=bool)
+        keep[slots[last]] = False
+        self._reservoir = pd.concat([self._reservoir[keep], chunk.iloc[pos[last] - start]], ignore_index=True)
+
+    def result(self):
+        """The sample as a DataFrame (fewer than k rows if the stream was shorter)."""
+        if self._reservoir is None:
+            return pd.concat(self._parts, ignore_index=True) if self._parts else pd.DataFrame()
+        return self._reservoir.reset_index(drop=True)
+
+
+class TDigest:
+    """Mergeable quantile sketch (merging t-digest with the arcsine k-scale).
+
+    Centroids are (mean, weight) arrays; each `update` / `merge` sorts the incoming values
+    together with the existing centroids and re-clusters them in one vectorized pass, so a
+    cluster spans at most one unit of k(q) = delta / (2 pi) * asin(2q - 1). That keeps about
+    `delta / 2` centroids and small relative error in the tails (p99) in constant memory.
+    Count, sum, min and max are exact.
+    """
+
+    def __init__(self, delta=200):
+        self.delta = delta
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.count = 0
+        self.total = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def _compress(self, means, weights):
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+        q_left = (np.cumsum(weights) - weights) / weights.sum()
+        group = np.floor(self.delta / (2 * np.pi) * np.arcsin(2 * q_left - 1)).astype('int64')
+        group -= group[0]
+        w = np.bincount(group, weights=weights)
+        m = np.bincount(group, weights=weights * means)
+        nz = w > 0
+        self.weights, self.means = w[nz], m[nz] / w[nz]
+
+    def update(self, values, weights=None):
+        """Add a batch of values, optionally with integer weights (repeat counts); NaNs are ignored."""
+        values = np.asarray(values, dtype='float64')
+        weights = np.ones(len(values)) if weights is None else np.asarray(weights, dtype='float64')
+        keep = ~np.isnan(values)
+        values, weights = values[keep], weights[keep]
+        if not len(values):
+            return
+        self.count += int(weights.sum())
+        self.total += float((values * weights).sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self._compress(np.concatenate([self.means, values]), np.concatenate([self.weights, weights]))
+
+    def merge(self, other):
+        """Fold another digest into this one."""
+        if not other.count:
+            return
+        self.count += other.count
+        self.total += other.total
+        self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+        self._compress(np.concatenate([self.means, other.means]), np.concatenate([self.weights, other.weights]))
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else float('nan')
+
+    def quantile(self, q):
+        """Approximate quantile(s) for q in [0, 1] (NaN when empty)."""
+        q = np.asarray(q, dtype='float64')
+        if not self.count:
+            return np.full(q.shape, np.nan) if q.ndim else float('nan')
+        # each centroid's mean sits at the middle of its weight; min / max pin the ends
+        mid = np.cumsum(self.weights) - self.weights / 2
+        x = np.concatenate(([0.0], mid, [self.weights.sum()]))
+        y = np.concatenate(([self.min], self.means, [self.max]))
+        out = np.interp(q * self.weights.sum(), x, y)
+        return out if q.ndim else float(out)
+
+
+class FixedHistogram:
+    """Counts over fixed-width bins on [lo, hi) plus under/overflow; merge by adding counts."""
+
+    def __init__(self, lo=0.0, hi=50000.0, bins=500):
+        self.edges = np.linspace(lo, hi, bins + 1)
+        self.counts = np.zeros(bins, dtype='int64')
+        self.underflow = 0
+        self.overflow = 0
+
+    def update(self, values, weights=None):
+        values = np.asarray(values, dtype='float64')
+        weights = np.ones(len(values), dtype='int64') if weights is None else np.asarray(weights, dtype='int64')
+        keep = ~np.isnan(values)
+        values, weights = values[keep], weights[keep]
+        self.underflow += int(weights[values < self.edges[0]].sum())
+        self.overflow += int(weights[values >= self.edges[-1]].sum())
+        self.counts += np.histogram(values, bins=self.edges, weights=weights)[0].astype('int64')
+
+    def merge(self, other):
+        self.counts += other.counts
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+
+    def to_frame(self, upper=None, max_bins=60):
+        """Bins up to `upper` (e.g. a clip percentile), coarsened to at most `max_bins` rows."""
+        n = len(self.counts)
+        if upper is not None and not np.isnan(upper):
+            n = int(np.clip(np.searchsorted(self.edges, upper, side='left'), 1, n))
+        last = np.flatnonzero(self.counts[:n])
+        n = int(last[-1]) + 1 if len(last) else 0
+        step = max(1, -(-n // max_bins))
+        starts = np.arange(0, n, step)
+        return pd.DataFrame({
+            'bin_start': self.edges[starts],
+            'bin_end': self.edges[np.minimum(starts + step, n)],
+            'count': np.add.reduceat(self.counts[:n], starts) if n else np.empty(0, dtype='int64'),
+        })
+
+
+def _hash(values, seed=0):
+    """Stable 64-bit hashes of a Series / array (same across processes and runs)."""
+    return pd.util.hash_array(np.asarray(values, dtype=object), hash_key=f'{seed:016d}')
+
+
+class HyperLogLog:
+    """Distinct-count sketch; relative standard error is about 1.04 / sqrt(2 ** p).
+
+    Pass `error` instead of `p` to size the registers for a target error. Merge = max of registers.
+    """
+
+    def __init__(self, p=None, error=0.01):
+        if p is None:
+            p = int(math.ceil(math.log2((1.04 / error) ** 2)))
+        self.p = min(max(p, 4), 18)
+        self.registers = np.zeros(1 << self.p, dtype='uint8')
+
+    def update(self, values):
+        values = pd.Series(values).dropna().unique()
+        if not len(values):
+            return
+        h = _hash(values)
+        idx = (h >> np.uint64(64 - self.p)).astype('int64')
+        rest = h & np.uint64((1 << (64 - self.p)) - 1)
+        # rank = leading zeros in the remaining 64 - p bits, plus one
+        bits = np.zeros(len(rest), dtype='int64')
+        for shift in (32, 16, 8, 4, 2, 1):
+            big = rest >= np.uint64(1 << shift)
+            bits[big] += shift
+            rest[big] >>= np.uint64(shift)
+        bits += (rest > 0)
+        rank = (64 - self.p - bits + 1).astype('uint8')
+        np.maximum.at(self.registers, idx, rank)
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        est = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype('int64')))
+        zeros = int((self.registers == 0).sum())
+        if est <= 2.5 * m and zeros:
+            est = m * math.log(m / zeros)  # linear counting for small cardinalities
+        return int(round(est))
+
+
+class CountMinSketch:
+    """Frequency sketch: estimates never undercount and overcount by at most epsilon * N with
+    probability 1 - delta. Merge = add tables (same epsilon / delta)."""
+
+    def __init__(self, epsilon=0.001, delta=0.01):
+        self.width = int(math.ceil(math.e / epsilon))
+        self.depth = int(math.ceil(math.log(1 / delta)))
+        self.table = np.zeros((self.depth, self.width), dtype='int64')
+
+    def _cols(self, items):
+        return [(_hash(items, seed=i + 1) % np.uint64(self.width)).astype('int64') for i in range(self.depth)]
+
+    def update_counts(self, counts):
+        """Add a Series of item -> count (e.g. a chunk's value_counts)."""
+        if not len(counts):
+            return
+        for row, cols in zip(self.table, self._cols(counts.index)):
+            np.add.at(row, cols, counts.to_numpy(dtype='int64'))
+
+    def update(self, values):
+        self.update_counts(pd.Series(values).value_counts(sort=False))
+
+    def merge(self, other):
+        self.table += other.table
+
+    def estimate(self, items):
+        """Estimated counts for `items` as an int array."""
+        if not len(items):
+            return np.empty(0, dtype='int64')
+        return np.min([row[cols] for row, cols in zip(self.table, self._cols(items))], axis=0)
+
+
+class SpaceSaving:
+    """Top-k heavy hitters in `capacity` counters; a count overestimates by at most N / capacity.
+
+    Chunks are folded in as exact value_counts using the mergeable-summaries rule: an item
+    missing from a full summary is assumed to have that summary's minimum count. The same
+    rule merges two sketches.
+    """
+
+    def __init__(self, capacity=1000):
+        self.capacity = int(capacity)
+        self.counts = pd.Series(dtype='int64')
+        self.errors = pd.Series(dtype='int64')
+
+    def _floor(self):
+        return int(self.counts.min()) if len(self.counts) >= self.capacity else 0
+
+    def _fold(self, counts, errors, other_floor):
+        mine = self._floor()
+        idx = self.counts.index.union(counts.index, sort=False)
+        total = self.counts.reindex(idx, fill_value=mine) + counts.reindex(idx, fill_value=other_floor)
+        err = self.errors.reindex(idx, fill_value=mine) + errors.reindex(idx, fill_value=other_floor)
+        keep = total.sort_values(ascending=False, kind='stable').index[:self.capacity]
+        self.counts, self.errors = total[keep].astype('int64'), err[keep].astype('int64')
+
+    def update_counts(self, counts):
+        """Add a Series of item -> exact count (e.g. a chunk's value_counts)."""
+        if len(counts):
+            self._fold(counts, pd.Series(0, index=counts.index), 0)
+
+    def update(self, values):
+        self.update_counts(pd.Series(values).value_counts(sort=False))
+
+    def merge(self, other):
+        self._fold(other.counts, other.errors, other._floor())
+
+    def top(self, n=50):
+        """The n largest [(item, estimated count)], highest first."""
+        top = self.counts.sort_values(ascending=False, kind='stable').head(n)
+        return list(zip(top.index.tolist(), top.values.tolist()))
+
+
+def bin_quantiles(counts, edges, qs=(0.25, 0.5, 0.75)):
+    """Quantiles per row of a (groups x bins) count matrix, interpolated linearly within bins.
+
+    `edges` has one more entry than the bins it describes; extra trailing columns in `counts`
+    (an overflow bin) count towards the total and put quantiles falling there at `edges[-1]`.
+    Returns an array of shape (groups, len(qs)); NaN for empty rows.
+    """
+    counts = np.atleast_2d(np.asarray(counts, dtype='float64'))
+    nbins = len(edges) - 1
+    total = counts.sum(axis=1)
+    cum = np.cumsum(counts[:, :nbins], axis=1)
+    rows = np.arange(len(counts))
+    out = np.full((len(counts), len(qs)), np.nan)
+    for j, q in enumerate(qs):
+        target = q * total
+        b = np.array([np.searchsorted(c, t, side='left') for c, t in zip(cum, target)], dtype='int64')
+        bc = np.minimum(b, nbins - 1)
+        before = np.where(bc > 0, cum[rows, np.maximum(bc - 1, 0)], 0.0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            frac = np.nan_to_num(np.clip((target - before) / counts[rows, bc], 0, 1))
+        val = np.where(b < nbins, edges[bc] + frac * (edges[bc + 1] - edges[bc]), edges[-1])
+        out[:, j] = np.where(total > 0, val, np.nan)
+    return out
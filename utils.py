@@ -1,106 +1,125 @@
 import pandas as pd
 import numpy as np
 import streamlit as st
-from sklearn.cluster import KMeans
+from scipy import sparse
+from sklearn.cluster import KMeans, MiniBatchKMeans
 from sklearn.decomposition import PCA
+from sklearn.metrics import silhouette_score
 from sklearn.preprocessing import StandardScaler
+from charts import CHART_MAX_CELLS, coarsen_columns
+from ingest import CATEGORY_PATTERN, compact_dtypes, iter_chunks, read_typed, source_version, title_token_counts
+from salary import (SALARY_BIN_EDGES, SALARY_BINS, SALARY_DIMENSIONS, cube_quantiles, normalize_salaries,
+                    parse_salary_strings)
+from sketches import CountMinSketch, FixedHistogram, HyperLogLog, ReservoirSampler, SpaceSaving, TDigest
 
-@st.cache_data
-def read_sample(csv_path: str, nrows: int = 20000):
-    """Read only first nrows for fast interactive charts."""
-    return pd.read_csv(csv_path, nrows=nrows)
+@st.cache_data(max_entries=8, show_spinner=False)
+def _read_sample(csv_path, nrows, columns, version):
+    return compact_dtypes(read_typed(csv_path, nrows=nrows, columns=list(columns) if columns else None))
+
+
+def read_sample(csv_path: str, nrows: int = 20000, columns=None):
+    """First nrows as a typed, compact DataFrame for interactive charts (Parquet copy when fresh).
+
+    Loaded once per (path, nrows, columns, source version) and shared by every page and
+    session; a refreshed CSV or Parquet copy is picked up on the next call.
+    """
+    return _read_sample(csv_path, nrows, tuple(columns) if columns else None, source_version(csv_path))
 def clean_salary_series(s: pd.Series) -> pd.Series:
     """
-    Convert salary column that may contain text like '$5,000', '5000-7000', etc. into numeric.
+    Convert salary column that may contain text like '$5,000', '5000-7000', '5k', '60k/year' etc. into numeric.
+    Ranges give the midpoint; amounts with a period in the text are converted to monthly.
     Returns float Series with NaNs for non-parsable values.
     """
     if s is None:
         return pd.Series(dtype="float64")
-
-    # If already numeric, just return
-    if pd.api.types.is_numeric_dtype(s):
-        return s.astype("float64")
-
-    x = s.astype(str).str.lower().str.strip()
-
-    # Remove currency symbols and commas
-    x = x.str.replace(r"[\$,]", "", regex=True)
-
-    # Handle ranges like "5000-7000" -> take midpoint
-    is_range = x.str.contains(r"^\d+(\.\d+)?\s*-\s*\d+(\.\d+)?$")
-    mid = pd.Series([None] * len(x), index=x.index, dtype="float64")
-    if is_range.any():
-        parts = x[is_range].str.split("-", expand=True)
-        a = pd.to_numeric(parts[0].str.strip(), errors="coerce")
-        b = pd.to_numeric(parts[1].str.strip(), errors="coerce")
-        mid.loc[is_range] = (a + b) / 2
-
-    # For non-range, parse as number
-    num = pd.to_numeric(x, errors="coerce")
-
-    # Prefer midpoint where range exists
-    out = num.astype("float64")
-    out.loc[is_range] = mid.loc[is_range]
-    return out
+    return parse_salary_strings(s)["mid"]
 
 import json
 from collections import Counter, defaultdict
 from datetime import datetime
 import math
+import re
 
 
 def parse_categories(cat_str):
-    """Return list of category strings from the stored JSON-like string."""
+    """Return list of category strings from the stored JSON-like string.
+
+    Uses the same compiled regex as the vectorized ingest extractor (see
+    `ingest.category_labels` for a whole-Series multi-label table).
+    """
     if not cat_str or not isinstance(cat_str, str):
         return []
-    try:
-        # data appears to be a JSON array string
-        parsed = json.loads(cat_str)
-        return [c.get('category') for c in parsed if 'category' in c]
-    except Exception:
-        # fallback: try to heuristically extract text
-        try:
-            s = cat_str.strip().strip('[]')
-            parts = s.split('"category":')
-            cats = []
-            for p in parts[1:]:
-                # take up to next '"' or '}'
-                p = p.strip()
-                end = p.find('"')
-                if end > 0:
-                    cats.append(p[1:end])
-            return cats
-        except Exception:
-            return []
-
-
-def stream_summary(path, sample_size=20000, date_freq='W'):
-    """Stream the CSV and compute summary statistics + a sampled set of rows for interactive charts.
+    found = CATEGORY_PATTERN.findall(cat_str)
+    return [json.loads(f'"{c}"') if '\\' in c else c for c in found]
+
+
+# columns stream_summary needs: aggregates plus what the pages show from sample_rows
+SUMMARY_COLUMNS = ['status_jobStatus', 'postedCompany_name', 'primary_category', 'minimumYearsExperience',
+                   'average_salary', 'salary_minimum', 'salary_maximum', 'metadata_newPostingDate',
+                   'numberOfVacancies', 'title', 'positionLevels', 'salary_type']
+
+
+def _count_values(counter, values):
+    """Add the value counts of a Series into a Counter (one Python step per distinct value)."""
+    vc = values.value_counts(sort=False)  # first-seen order keeps most_common() tie-breaking stable
+    counter.update(dict(zip(vc.index.tolist(), vc.values.tolist())))
+
+
+def stream_summary(path, sample_size=20000, date_freq='W', sketch=False, distinct_error=0.01, topk_error=0.001,
+                   engine='pandas'):
+    """Stream the CSV (or its Parquet copy) and compute summary statistics + a sampled set of rows for interactive charts.
+
+    With sketch=True, companies, categories and title keywords are tracked in bounded-memory
+    sketches instead of exact Counters: HyperLogLog for unique_companies (relative error about
+    `distinct_error`) and Space-Saving, tightened by Count-Min for companies, for the top lists
+    (counts overestimate by at most `topk_error` * total_rows). The sketches are returned under
+    'sketches' and can be merged with those of other runs.
+
+    engine='duckdb' computes the same exact statistics with DuckDB (see `duckdb_engine`); the
+    sample rows then come from DuckDB's reservoir sample. Sketches are pandas-only.
 
     Returns a dict containing:
       - total_rows
       - status_counts (Counter)
       - top_companies (list of (company, count))
       - top_categories (list of (category, count))
+      - top_title_words (list of (keyword, count))
       - average_salary (approx from sums)
-      - sample_rows (list of dicts)
-      - sample_salaries (list)
+      - sample_rows (DataFrame; uniform reservoir sample of up to sample_size rows)
+      - salary_digest (TDigest of positive monthly salaries, see salary.normalize_salaries; full population, mergeable)
+      - salary_hist (FixedHistogram of the same values)
+      - salary_quantiles (dict p50 / p90 / p99 from the digest)
       - postings_over_time (pd.Series indexed by period)
       - vacancies_over_time (pd.Series)
       - experience_counts (dict)
       - unique_companies
+      - sketches (dict of sketch objects when sketch=True, else None)
     """
+    if engine == 'duckdb' and not sketch:
+        import duckdb_engine
+        return duckdb_engine.summary(path, sample_size=sample_size, date_freq=date_freq)
     chunksize = 20000
-    it = pd.read_csv(path, chunksize=chunksize, iterator=True, dtype=str)
+    it = iter_chunks(path, columns=SUMMARY_COLUMNS, chunksize=chunksize)
 
     total_rows = 0
     status_counts = Counter()
     company_counts = Counter()
     category_counts = Counter()
     experience_counts = Counter()
-
-    sample_rows = []
-    sample_salaries = []
+    title_counts = Counter()
+    if sketch:
+        capacity = int(math.ceil(1 / topk_error))
+        sketches = {
+            'companies_hll': HyperLogLog(error=distinct_error),
+            'companies_top': SpaceSaving(capacity),
+            'companies_cms': CountMinSketch(epsilon=topk_error),
+            'categories_top': SpaceSaving(capacity),
+            'title_words_top': SpaceSaving(capacity),
+        }
+
+    sampler = ReservoirSampler(sample_size)
+    salary_digest = TDigest()
+    salary_hist = FixedHistogram()
 
     sum_salary = 0.0
     count_salary = 0
@@ -108,173 +127,449 @@ def stream_summary(path, sample_size=20000, date_freq='W'):
     postings_time = Counter()
     vacancies_time = Counter()
 
-    # for speed: parse column names to expected
     for chunk in it:
         total_rows += len(chunk)
-        # status
-        sc = chunk['status_jobStatus'].fillna('')
-        status_counts.update(sc.values)
-        # companies
-        companies = chunk['postedCompany_name'].fillna('')
-        company_counts.update(companies.values)
-        # categories: parse primary category
-        cats = chunk['categories'].fillna('')
-        for s in cats.values:
-            parsed = parse_categories(s)
-            if parsed:
-                category_counts.update([parsed[0]])
-        # experience
-        minexp = chunk['minimumYearsExperience'].fillna('')
-        # clean and count
-        for v in minexp.values:
-            try:
-                experience_counts[int(v)] += 1
-            except Exception:
-                experience_counts['unspecified'] += 1
-        # salaries
+        _count_values(status_counts, chunk['status_jobStatus'].fillna(''))
+        if sketch:
+            companies = chunk['postedCompany_name'].fillna('').value_counts(sort=False)
+            sketches['companies_hll'].update(companies.index)
+            sketches['companies_top'].update_counts(companies)
+            sketches['companies_cms'].update_counts(companies)
+            sketches['categories_top'].update(chunk['primary_category'].dropna())
+            sketches['title_words_top'].update_counts(title_token_counts(chunk['title']))
+        else:
+            _count_values(company_counts, chunk['postedCompany_name'].fillna(''))
+            # categories: primary category is extracted once at ingest
+            _count_values(category_counts, chunk['primary_category'].dropna())
+            title_counts.update(title_token_counts(chunk['title']).to_dict())
+        # experience: whole years, anything else is 'unspecified'
+        minexp = pd.to_numeric(chunk['minimumYearsExperience'], errors='coerce').astype('float64')
+        minexp = minexp[minexp == minexp.round()]
+        _count_values(experience_counts, minexp.astype('int64'))
+        unspecified = len(chunk) - len(minexp)
+        if unspecified:
+            experience_counts['unspecified'] += unspecified
+        # salaries: the average_salary KPI is the mean of the raw column, as before
         if 'average_salary' in chunk.columns:
-            av = chunk['average_salary'].fillna('')
-            for v in av.values:
-                try:
-                    fv = float(v)
-                    count_salary += 1
-                    sum_salary += fv
-                    if fv > 0:
-                        sample_salaries.append(fv)
-                except Exception:
-                    continue
-        # postings over time
+            av = pd.to_numeric(chunk['average_salary'], errors='coerce').astype('float64').dropna()
+            count_salary += len(av)
+            sum_salary += float(av.sum())
+        # monthly salary midpoints (ranges, k suffixes, salary_type) for the distribution sketches
+        mid = normalize_salaries(chunk)['salary_mid']
+        positive = mid > 0
+        salary_digest.update(mid[positive].to_numpy())
+        salary_hist.update(mid[positive].to_numpy())
+        # postings / vacancies over time, bucketed at the array level
         if 'metadata_newPostingDate' in chunk.columns:
-            dates = pd.to_datetime(chunk['metadata_newPostingDate'], errors='coerce')
-            # group by period
-            periods = dates.dt.to_period(date_freq).dropna().astype(str).values
-            for p in periods:
-                postings_time[p] += 1
-        # vacancies
-        if 'numberOfVacancies' in chunk.columns and 'metadata_newPostingDate' in chunk.columns:
-            dates = pd.to_datetime(chunk['metadata_newPostingDate'], errors='coerce')
-            vacancies = chunk['numberOfVacancies'].fillna('0')
-            for d, v in zip(dates.values, vacancies.values):
-                if pd.isna(d):
-                    continue
-                try:
-                    n = int(v)
-                except Exception:
-                    n = 0
-                p = pd.Period(d, freq=date_freq).strftime('%Y-%m-%d')
-                vacancies_time[p] += n
-        # reservoir-like sample: sample fractionally from chunk to keep sample <= sample_size
-        if len(sample_rows) < sample_size:
-            need = sample_size - len(sample_rows)
-            # sample min(need, chunk_size)
-            s = chunk.sample(n=min(len(chunk), need))
-            sample_rows.extend(s.to_dict(orient='records'))
-        else:
-            # replace with small prob to maintain randomness
-            # For simplicity, occasionally replace some samples
-            replace_prob = 0.001
-            mask = np.random.rand(len(chunk)) < replace_prob
-            if mask.any():
-                s = chunk[mask]
-                for _, r in s.iterrows():
-                    idx = np.random.randint(0, len(sample_rows))
-                    sample_rows[idx] = r.to_dict()
+            periods = pd.to_datetime(chunk['metadata_newPostingDate'], errors='coerce').dt.to_period(date_freq)
+            valid = periods.notna()
+            _count_values(postings_time, periods[valid])
+            if 'numberOfVacancies' in chunk.columns:
+                n = pd.to_numeric(chunk['numberOfVacancies'], errors='coerce').astype('float64')
+                n = n.where(n == n.round(), 0).fillna(0).astype('int64')
+                by_period = n[valid].groupby(periods[valid]).sum()
+                vacancies_time.update(dict(zip(by_period.index.strftime('%Y-%m-%d'), by_period.values.tolist())))
+        # uniform reservoir sample over the whole stream
+        sampler.update(chunk)
 
     avg_salary = sum_salary / count_salary if count_salary else 0.0
 
     # Postings over time to series
     if postings_time:
-        # convert period strings back to timestamp for plotting (period start)
-        pst = {pd.Period(k, freq=date_freq).start_time: v for k, v in postings_time.items()}
+        # convert periods to timestamp for plotting (period start)
+        pst = {k.start_time: v for k, v in postings_time.items()}
         postings_series = pd.Series(pst).sort_index()
     else:
         postings_series = pd.Series(dtype=int)
 
     vacancies_series = pd.Series(dict(sorted(vacancies_time.items())))
 
+    if sketch:
+        # both sketches only overcount, so the smaller estimate is the tighter one
+        top = sketches['companies_top'].top(50)
+        cms = sketches['companies_cms'].estimate([c for c, _ in top])
+        top_companies = sorted(((c, int(min(n, m))) for (c, n), m in zip(top, cms)), key=lambda t: -t[1])
+        top_categories = sketches['categories_top'].top(50)
+        top_title_words = sketches['title_words_top'].top(50)
+        unique_companies = sketches['companies_hll'].count()
+    else:
+        sketches = None
+        top_companies = company_counts.most_common(50)
+        top_categories = category_counts.most_common(50)
+        top_title_words = title_counts.most_common(50)
+        unique_companies = len(company_counts)
+
     result = {
         'total_rows': total_rows,
         'status_counts': status_counts,
-        'top_companies': company_counts.most_common(50),
-        'top_categories': category_counts.most_common(50),
+        'top_companies': top_companies,
+        'top_categories': top_categories,
+        'top_title_words': top_title_words,
         'average_salary': avg_salary,
-        'sample_rows': sample_rows,
-        'sample_salaries': sample_salaries,
+        'sample_rows': sampler.result(),
+        'salary_digest': salary_digest,
+        'salary_hist': salary_hist,
+        'salary_quantiles': dict(zip(['p50', 'p90', 'p99'], salary_digest.quantile([0.5, 0.9, 0.99]).tolist())),
         'postings_over_time': postings_series,
         'vacancies_over_time': vacancies_series,
         'experience_counts': experience_counts,
-        'unique_companies': len(company_counts)
+        'unique_companies': unique_companies,
+        'sketches': sketches,
     }
     return result
 
 
+# --- Persistent summary cache ---
+import hashlib
+import os
+import pickle
+from pathlib import Path
+
+SUMMARY_CACHE_DIR = 'data/.cache'
+SUMMARY_CACHE_VERSION = '7'  # bump when the stream_summary results change (layout or parsing)
+
+
+def summary_cache_path(path, sample_size=20000, date_freq='W', sketch=False, cache_dir=SUMMARY_CACHE_DIR,
+                       engine='pandas'):
+    """Cache file for a summary of `path`; the name changes whenever the CSV's size or mtime does."""
+    p = Path(path).resolve()
+    st_ = p.stat()
+    slot = hashlib.sha1(repr((str(p), int(sample_size), date_freq, bool(sketch), engine, SUMMARY_CACHE_VERSION)).encode()).hexdigest()[:16]
+    version = hashlib.sha1(repr((st_.st_size, st_.st_mtime_ns)).encode()).hexdigest()[:16]
+    return Path(cache_dir) / f'summary-{slot}-{version}.pkl'
+
+
+def _summary_from_disk(cache_file, path, sample_size, date_freq, sketch, engine='pandas'):
+    cache_file = Path(cache_file)
+    try:
+        with open(cache_file, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        pass
+    result = stream_summary(path, sample_size=sample_size, date_freq=date_freq, sketch=sketch, engine=engine)
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = cache_file.with_name(f'{cache_file.name}.{os.getpid()}.tmp')
+        with open(tmp, 'wb') as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cache_file)
+        # drop summaries of older versions of the same file/settings
+        slot = cache_file.name.rsplit('-', 1)[0]
+        for stale in cache_file.parent.glob(f'{slot}-*.pkl'):
+            if stale != cache_file:
+                stale.unlink(missing_ok=True)
+    except OSError:
+        pass  # read-only checkout: still return the fresh result
+    return result
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def _cached_summary(cache_file, path, sample_size, date_freq, sketch, engine='pandas'):
+    return _summary_from_disk(cache_file, path, sample_size, date_freq, sketch, engine)
+
+
+def stored_stream_summary(path, sample_size=20000, date_freq='W', sketch=False, cache_dir=SUMMARY_CACHE_DIR,
+                          engine='pandas'):
+    """`cached_stream_summary` through the on-disk cache only (no Streamlit cache), for background threads."""
+    cache_file = summary_cache_path(path, sample_size, date_freq, sketch, cache_dir, engine)
+    return _summary_from_disk(cache_file, str(path), int(sample_size), date_freq, bool(sketch), engine)
+
+
+def cached_stream_summary(path, sample_size=20000, date_freq='W', sketch=False, cache_dir=SUMMARY_CACHE_DIR,
+                          engine='pandas'):
+    """`stream_summary` backed by an on-disk cache shared by all sessions and restarts.
+
+    Keyed on the CSV path, size and mtime plus `date_freq`, `sample_size`, `sketch` and `engine`; any change to
+    the source file produces a new key, so stale summaries are never served.
+    """
+    cache_file = summary_cache_path(path, sample_size, date_freq, sketch, cache_dir, engine)
+    return _cached_summary(str(cache_file), str(path), int(sample_size), date_freq, bool(sketch), engine)
+
+
 # --- New helpers for visual DB analyses ---
-import sqlite3
+# all reads go through db's shared read-only connection pool and query cache
+import db
 
 
 def load_industry_vacancies(db_path='data/visual.db'):
     """Return DataFrame of industry, period, vacancies, postings."""
-    conn = sqlite3.connect(db_path)
-    df = pd.read_sql('SELECT industry, period, vacancies, postings FROM industry_vacancies', conn)
-    conn.close()
+    df = db.read_sql('SELECT industry, period, vacancies, postings FROM industry_vacancies', db_path=db_path)
     if not df.empty:
         # period strings are ranges like 'YYYY-MM-DD/YYYY-MM-DD' -> use start date
         df['period_dt'] = pd.to_datetime(df['period'].astype(str).str.split('/').str[0], errors='coerce')
     return df
 
 
-def industry_heatmap_matrix(db_path='data/visual.db', top_n=20):
-    """Return pivoted DataFrame suitable for heatmaps: index=industry, columns=period (sorted), values=vacancies."""
-    df = load_industry_vacancies(db_path)
-    if df.empty:
-        return pd.DataFrame()
+# rollup tables materialized by build_visual_db, with equivalent GROUP BYs over the base
+# tables for DBs built before the rollups existed
+_ROLLUP_FALLBACKS = {
+    'vacancies_yearly': '(SELECT company_id, year, SUM(vacancies) AS vacancies FROM vacancies GROUP BY company_id, year)',
+    'company_totals': '(SELECT company_id, SUM(vacancies) AS vacancies FROM vacancies GROUP BY company_id)',
+    'industry_totals': '(SELECT industry, SUM(vacancies) AS vacancies FROM industry_vacancies GROUP BY industry)',
+}
+
+
+def _rollup(db_path, name):
+    """Name of a rollup table, or an equivalent subquery when the DB predates it."""
+    return name if db.has_table(name, db_path) else _ROLLUP_FALLBACKS[name]
+
+
+def _placeholders(values):
+    return ','.join('?' * len(values))
+
+
+HEATMAP_CAP_PERCENTILES = np.arange(90, 101)
+
+
+class IndustryHeatmap:
+    """Top-n industries x periods vacancies as a dense array, built once per DB version and top_n.
+
+    Rows are industries by total vacancies (largest first), columns are periods in time
+    order (`periods`, `period_keys` = YYYYMMDD of the period start). Shared by every
+    session through `industry_heatmap`: treat instances as read-only.
+    """
+
+    def __init__(self, industries, periods, period_keys, values):
+        self.industries = industries
+        self.periods = periods
+        self.period_keys = period_keys
+        self.values = values
+        self.period_dt = pd.to_datetime(period_keys.astype(str), format='%Y%m%d')
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def frame(self):
+        """The matrix as a DataFrame: index=industry, columns=period."""
+        return pd.DataFrame(self.values, index=pd.Index(self.industries, name='industry'),
+                            columns=pd.Index(self.periods, name='period'))
+
+    def caps(self, start=0, end=None):
+        """Percentiles HEATMAP_CAP_PERCENTILES of the cells in columns start..end (inclusive)."""
+        cells = self.values[:, start:None if end is None else end + 1]
+        if not cells.size:
+            return pd.Series(np.nan, index=HEATMAP_CAP_PERCENTILES)
+        return pd.Series(np.percentile(cells, HEATMAP_CAP_PERCENTILES), index=HEATMAP_CAP_PERCENTILES)
+
+    def tile(self, start=0, end=None, max_cells=CHART_MAX_CELLS):
+        """Long (industry, period, period_dt, vacancies) frame of columns start..end, plus periods per cell.
+
+        Wide ranges are averaged over adjacent periods (labelled by the first) to keep at
+        most max_cells cells.
+        """
+        cols = slice(start, None if end is None else end + 1)
+        values, starts = coarsen_columns(self.values[:, cols], max_cells)
+        periods, period_dt = self.periods[cols][starts], self.period_dt[cols][starts]
+        n = len(starts)
+        return pd.DataFrame({
+            'industry': np.repeat(self.industries, n),
+            'period': np.tile(periods, len(self.industries)),
+            'period_dt': np.tile(period_dt, len(self.industries)),
+            'vacancies': values.ravel(),
+        }), int(starts[1] - starts[0]) if n > 1 else 1
+
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def _industry_heatmap(db_path, version, top_n):
     # choose top industries by total vacancies
-    top_inds = df.groupby('industry')['vacancies'].sum().nlargest(top_n).index.tolist()
-    df_top = df[df['industry'].isin(top_inds)].copy()
-    pivot = df_top.pivot_table(index='industry', columns='period', values='vacancies', aggfunc='sum', fill_value=0)
-    # sort columns chronologically using datetime parsing (robust to mixed freq)
-    cols_sorted = sorted(pivot.columns, key=lambda x: pd.to_datetime(x, errors='coerce'))
-    pivot = pivot[cols_sorted]
-    return pivot
+    top_inds = [r[0] for r in db.fetch_all(
+        f'SELECT industry FROM {_rollup(db_path, "industry_totals")} ORDER BY vacancies DESC LIMIT ?', (top_n,), db_path)]
+    cells = db.read_sql('SELECT industry, period, period_key, vacancies FROM industry_vacancies '
+                        f'WHERE industry IN ({_placeholders(top_inds)})', top_inds, db_path)
+    keys, cols = np.unique(cells['period_key'].to_numpy('int64'), return_inverse=True)
+    rows = pd.Index(top_inds).get_indexer(cells['industry'])
+    values = np.zeros((len(top_inds), len(keys)), dtype='int64')
+    np.add.at(values, (rows, cols), cells['vacancies'].to_numpy('int64'))
+    periods = dict(zip(cells['period_key'].tolist(), cells['period'].tolist()))
+    return IndustryHeatmap(np.array(top_inds, dtype=object), np.array([periods[k] for k in keys.tolist()], dtype=object),
+                           keys, values)
+
+
+def industry_heatmap(db_path='data/visual.db', top_n=20):
+    """The shared IndustryHeatmap of the top_n industries in `db_path` (rebuilt after the DB changes)."""
+    return _industry_heatmap(db_path, db.db_version(db_path), top_n)
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _heatmap_tile(db_path, version, top_n, start, end, max_cells):
+    heat = _industry_heatmap(db_path, version, top_n)
+    tile, step = heat.tile(start, end, max_cells)
+    return tile, step, heat.caps(start, end)
+
+
+def heatmap_tile(db_path='data/visual.db', top_n=20, start=0, end=None, max_cells=CHART_MAX_CELLS):
+    """(long frame, periods per cell, percentile caps) of a period range of the top_n heatmap.
+
+    Cached per range, so changing the palette or cap percentile, or returning to a range
+    already viewed, costs nothing; new ranges are sliced from the shared matrix.
+    """
+    return _heatmap_tile(db_path, db.db_version(db_path), top_n, start, end, max_cells)
+
+
+def industry_heatmap_matrix(db_path='data/visual.db', top_n=20):
+    """Return pivoted DataFrame suitable for heatmaps: index=industry, columns=period (in time order), values=vacancies."""
+    heat = industry_heatmap(db_path, top_n)
+    return heat.frame() if heat.values.size else pd.DataFrame()
 
 
 def load_company_vacancies(db_path='data/visual.db'):
     """Return DataFrame of company name, period, vacancies, postings."""
-    conn = sqlite3.connect(db_path)
-    df = pd.read_sql('SELECT c.name as company, v.period, v.vacancies, v.postings FROM vacancies v JOIN companies c ON v.company_id=c.id', conn)
-    conn.close()
+    df = db.read_sql('SELECT c.name as company, v.period, v.vacancies, v.postings FROM vacancies v JOIN companies c ON v.company_id=c.id',
+                     db_path=db_path)
     if not df.empty:
         # period strings are ranges like 'YYYY-MM-DD/YYYY-MM-DD' -> use start date
         df['period_dt'] = pd.to_datetime(df['period'].astype(str).str.split('/').str[0], errors='coerce')
     return df
 
 
-def compute_company_growth(db_path='data/visual.db', lookback_periods=2, top_n=20):
-    """Compute recent growth rates for companies.
+class CompanyPeriodMatrix:
+    """Company x period vacancies and postings as CSR matrices, built once per DB version.
 
-    lookback_periods=2 computes percent change between last period and previous (week-over-week if weekly).
-    Returns DataFrame with company, last_vacancies, prev_vacancies, pct_change, and sparkline data.
+    Rows are companies in DB id order (`company_ids`, `companies`), columns are periods in
+    time order (`periods`, `period_keys` = YYYYMMDD of the period start). Instances are
+    shared by every session through `company_matrix`: treat them as read-only.
     """
-    df = load_company_vacancies(db_path)
-    if df.empty:
-        return pd.DataFrame()
-    # Pivot to companies x period
-    pivot = df.pivot_table(index='company', columns='period', values='vacancies', aggfunc='sum', fill_value=0)
-    # identify last two periods
-    cols = sorted(pivot.columns, key=lambda x: pd.to_datetime(x, errors='coerce'))
-    if len(cols) < 2:
+
+    def __init__(self, company_ids, companies, periods, period_keys, vacancies, postings):
+        self.company_ids = company_ids
+        self.companies = companies
+        self.periods = periods
+        self.period_keys = period_keys
+        self.vacancies = vacancies
+        self.postings = postings
+        # alphabetical rank of each company, the tie-break when ranking
+        self.name_rank = np.empty(len(companies), dtype='int64')
+        self.name_rank[np.argsort(companies, kind='stable')] = np.arange(len(companies))
+        self._rows = None
+
+    @property
+    def shape(self):
+        return self.vacancies.shape
+
+    @property
+    def nbytes(self):
+        m = (self.vacancies, self.postings)
+        return (sum(x.data.nbytes + x.indices.nbytes + x.indptr.nbytes for x in m) + self.company_ids.nbytes
+                + sum(len(n) for n in self.companies) + self.period_keys.nbytes)
+
+    def recent(self, k, which='vacancies'):
+        """Dense (companies x k) counts of the last k periods, oldest first."""
+        mat = getattr(self, which)
+        return mat[:, max(0, mat.shape[1] - k):].toarray()
+
+    def period_dates(self, cols=slice(None)):
+        return pd.to_datetime(self.period_keys[cols].astype(str), format='%Y%m%d')
+
+    def rows(self, names):
+        """Row index of each company name (names not in the DB are dropped)."""
+        if self._rows is None:
+            self._rows = pd.Index(self.companies)
+        idx = self._rows.get_indexer(list(names))
+        return idx[idx >= 0]
+
+    def series(self, names):
+        """Long DataFrame (company, period, period_dt, vacancies, postings) of the given companies' non-empty periods."""
+        rows = self.rows(names)
+        post = self.postings[rows].tocoo()
+        return pd.DataFrame({
+            'company': self.companies[rows[post.row]],
+            'period': self.periods[post.col],
+            'period_dt': self.period_dates(post.col),
+            'vacancies': self.vacancies[rows].toarray()[post.row, post.col],
+            'postings': post.data,
+        })
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _company_matrix(db_path, version):
+    # integer columns only, read outside the query cache: the matrix is the cached form
+    with db.get_pool(db_path).connection() as conn:
+        companies = pd.read_sql_query('SELECT id, name FROM companies ORDER BY id', conn)
+        cells = pd.read_sql_query('SELECT company_id, period_key, vacancies, postings FROM vacancies', conn)
+        periods = dict(conn.execute('SELECT DISTINCT period_key, period FROM vacancies').fetchall())
+    ids = companies['id'].to_numpy('int64')
+    keys = np.unique(cells['period_key'].to_numpy('int64'))
+    shape = (len(ids), len(keys))
+    rows = np.searchsorted(ids, cells['company_id'].to_numpy('int64'))
+    cols = np.searchsorted(keys, cells['period_key'].to_numpy('int64'))
+
+    def csr(values):
+        return sparse.csr_matrix((values.to_numpy('int32'), (rows, cols)), shape=shape)
+
+    return CompanyPeriodMatrix(ids, companies['name'].to_numpy(object), np.array([periods[k] for k in keys], dtype=object),
+                               keys, csr(cells['vacancies']), csr(cells['postings']))
+
+
+def company_matrix(db_path='data/visual.db'):
+    """The shared CompanyPeriodMatrix of `db_path` (rebuilt after the DB changes)."""
+    db.get_pool(db_path)  # raises FileNotFoundError for a missing DB
+    return _company_matrix(os.path.abspath(str(db_path)), db.db_version(db_path))
+
+
+def _pct_change(last, prev):
+    """Percent change last vs prev; inf for new activity (prev == 0 < last), 0.0 when both are 0."""
+    last = np.asarray(last, dtype='float64')
+    prev = np.asarray(prev, dtype='float64')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pct = (last - prev) / prev * 100
+    return np.where(prev != 0, pct, np.where(last > 0, np.inf, 0.0))
+
+
+def _top_rows(m, rows, metric, top_n):
+    """The top_n of `rows` by `metric` (descending), ties in company name order."""
+    return rows[np.lexsort((m.name_rank[rows], -metric[rows]))[:top_n]]
+
+
+def company_growth(m, lookback_periods=2, window=1, top_n=20, rank_by='pct_change', history_periods=12):
+    """Top movers of a CompanyPeriodMatrix, computed with array operations over all companies.
+
+    Growth compares the vacancies of the latest `window` periods with the `window` periods
+    ending `lookback_periods - 1` periods earlier (lookback_periods=2, window=1: last period vs
+    the previous one). `zscore` measures the latest window against the mean and spread of the
+    earlier windows in the last `history_periods` periods (+/-inf when those never varied).
+    Only companies with postings in the compared periods are ranked, by `rank_by`
+    ('pct_change' or 'zscore').
+    """
+    lookback = max(int(lookback_periods), 2)
+    window = max(int(window), 1)
+    span = lookback - 1 + window
+    if m.shape[1] < span:
         return pd.DataFrame()
-    last = cols[-1]
-    prev = cols[-2]
-    res = []
-    for comp, row in pivot.iterrows():
-        last_v = row.get(last, 0)
-        prev_v = row.get(prev, 0)
-        pct = (last_v - prev_v) / prev_v * 100 if prev_v != 0 else float('inf') if last_v>0 else 0.0
-        res.append((comp, int(last_v), int(prev_v), pct, row[cols[-12:]].tolist() if len(cols)>12 else row.tolist()))
-    out = pd.DataFrame(res, columns=['company','last_vacancies','prev_vacancies','pct_change','history'])
-    out = out.sort_values('pct_change', ascending=False).head(top_n)
-    return out
+    k = min(m.shape[1], max(span, history_periods, window + 2))
+    vac = m.recent(k).astype('int64')
+    # rolling `window` sums ending at each of the k periods (full windows from column window - 1)
+    csum = np.cumsum(vac, axis=1)
+    roll = csum.copy()
+    roll[:, window:] -= csum[:, :-window]
+    last, prev = roll[:, -1], roll[:, -lookback]
+    base = roll[:, window - 1:-1]
+    mean, std = base.mean(axis=1), base.std(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = np.where(std > 0, (last - mean) / std, np.sign(last - mean) * np.inf)
+    z = np.nan_to_num(z, nan=0.0, posinf=np.inf, neginf=-np.inf)
+    pct = _pct_change(last, prev)
+    active = np.flatnonzero(m.recent(span, 'postings').any(axis=1))
+    top = _top_rows(m, active, z if rank_by == 'zscore' else pct, top_n)
+    return pd.DataFrame({
+        'company': m.companies[top],
+        'last_vacancies': last[top].astype(int),
+        'prev_vacancies': prev[top].astype(int),
+        'pct_change': pct[top],
+        'zscore': z[top],
+        # raw per-period vacancies (oldest first) for the sparkline
+        'history': vac[top, -history_periods:].tolist(),
+    })
+
+
+def compute_company_growth(db_path='data/visual.db', lookback_periods=2, top_n=20, window=1, rank_by='pct_change'):
+    """Compute recent growth rates for companies.
+
+    lookback_periods=2 computes percent change between last period and previous (week-over-week if weekly);
+    larger values compare with earlier periods and `window` > 1 compares rolling sums (see `company_growth`).
+    Returns DataFrame with company, last_vacancies, prev_vacancies, pct_change, zscore, and sparkline data.
+    """
+    return company_growth(company_matrix(db_path), lookback_periods, window, top_n, rank_by)
 
 
 def load_policy_notes(path='data/policy_notes.csv'):
@@ -289,59 +584,250 @@ def save_policy_notes(df, path='data/policy_notes.csv'):
     return path
 
 
+def company_yoy_growth(m, top_n=20):
+    """Year-over-year top movers of a CompanyPeriodMatrix (see compute_company_yoy_growth)."""
+    years = m.period_keys // 10000
+    latest = np.unique(years)[::-1][:2]
+    if len(latest) < 2:
+        return pd.DataFrame()
+    # (periods x 2) indicator of the last / previous year; one sparse product gives both totals
+    pick = sparse.csr_matrix(np.stack([years == y for y in latest], axis=1).astype('int32'))
+    vac = (m.vacancies @ pick).toarray()
+    active = np.flatnonzero((m.postings @ pick).getnnz(axis=1))
+    pct = _pct_change(vac[:, 0], vac[:, 1])
+    top = _top_rows(m, active, pct, top_n)
+    return pd.DataFrame({
+        'company': m.companies[top],
+        'last_year_total': vac[top, 0],
+        'prev_year_total': vac[top, 1],
+        'yoy_pct': pct[top],
+    })
+
+
 def compute_company_yoy_growth(db_path='data/visual.db', top_n=20):
     """Compute year-over-year growth per company using annual totals.
 
+    Sums the company matrix over the periods starting in each of the two latest years.
     Returns DataFrame with company, last_year, prev_year, yoy_pct sorted descending.
     """
-    df = load_company_vacancies(db_path)
-    if df.empty:
-        return pd.DataFrame()
-    # ensure period_dt exists and is datetime
-    if 'period_dt' not in df.columns or not pd.api.types.is_datetime64_any_dtype(df['period_dt']):
-        df['period_dt'] = pd.to_datetime(df['period'], errors='coerce')
-    df['year'] = df['period_dt'].dt.year
-    agg = df.groupby(['company','year'])['vacancies'].sum().unstack(fill_value=0)
-    years = sorted(agg.columns)
-    if len(years) < 2:
-        return pd.DataFrame()
-    last = years[-1]
-    prev = years[-2]
-    res = []
-    for comp, row in agg.iterrows():
-        last_v = int(row[last])
-        prev_v = int(row[prev])
-        if prev_v == 0:
-            pct = float('inf') if last_v>0 else 0.0
-        else:
-            pct = (last_v - prev_v) / prev_v * 100
-        res.append((comp, last_v, prev_v, pct))
-    out = pd.DataFrame(res, columns=['company','last_year_total','prev_year_total','yoy_pct'])
-    out = out.sort_values('yoy_pct', ascending=False).head(top_n)
-    return out
+    return company_yoy_growth(company_matrix(db_path), top_n)
+
+
+# clustering: above this many companies MiniBatchKMeans replaces full KMeans
+MINIBATCH_MIN_COMPANIES = 5000
+SILHOUETTE_SAMPLE = 5000
+
+
+def embed_companies(m, top_n=200, n_components=10):
+    """PCA embedding of the scaled vacancy series of the top_n companies by total vacancies.
+
+    Returns (rows, embedding, pca): matrix rows of the companies (largest first) and their
+    coordinates.
+    """
+    totals = np.asarray(m.vacancies.sum(axis=1, dtype='int64')).ravel()
+    rows = np.lexsort((m.company_ids, -totals))[:top_n]
+    X = m.vacancies[rows]
+    # only the periods these companies appear in
+    X = X[:, np.flatnonzero(m.postings[rows].getnnz(axis=0))].toarray()
+    # rows -> features are periods; scale by row
+    X_scaled = StandardScaler().fit_transform(X)
+    # reduce dims
+    pca = PCA(n_components=min(n_components, *X_scaled.shape), random_state=42)
+    return rows, pca.fit_transform(X_scaled), pca
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _company_embedding(db_path, version, top_n, n_components):
+    return embed_companies(company_matrix(db_path), top_n, n_components)
+
+
+def company_embedding(db_path='data/visual.db', top_n=200, n_components=10):
+    """`embed_companies` of the DB's company matrix, cached per DB version and top_n (read-only)."""
+    db.get_pool(db_path)
+    return _company_embedding(os.path.abspath(str(db_path)), db.db_version(db_path), top_n, n_components)
+
+
+def fit_clusters(X, n_clusters):
+    """KMeans (MiniBatchKMeans for MINIBATCH_MIN_COMPANIES+ rows) on an embedding -> (model, labels)."""
+    n_clusters = min(n_clusters, len(X))
+    if len(X) >= MINIBATCH_MIN_COMPANIES:
+        model = MiniBatchKMeans(n_clusters=n_clusters, random_state=42, batch_size=4096, n_init=3)
+    else:
+        model = KMeans(n_clusters=n_clusters, random_state=42)
+    return model, model.fit_predict(X)
 
 
 def cluster_companies(db_path='data/visual.db', n_clusters=5, top_n=200):
     """Cluster companies by their vacancy time-series.
 
-    - selects top_n companies by total vacancies, pivots to company x period, scales rows,
-      reduces dimensionality with PCA, and applies KMeans.
+    - selects top_n companies by total vacancies, scales rows and reduces dimensionality with PCA
+      (cached per DB version, see `company_embedding`), then applies KMeans / MiniBatchKMeans.
     - returns DataFrame with company and cluster label, and the fitted model (PCA, KMeans) for plotting if needed.
     """
-    df = load_company_vacancies(db_path)
-    if df.empty:
+    m = company_matrix(db_path)
+    if m.vacancies.nnz == 0:
         return pd.DataFrame(), None, None
-    pivot = df.pivot_table(index='company', columns='period', values='vacancies', aggfunc='sum', fill_value=0)
-    totals = pivot.sum(axis=1).sort_values(ascending=False)
-    selected = totals.head(top_n).index.tolist()
-    X = pivot.loc[selected]
-    # rows -> features are periods; scale by row
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
-    # reduce dims
-    pca = PCA(n_components=min(10, X_scaled.shape[1]))
-    X_p = pca.fit_transform(X_scaled)
-    kmeans = KMeans(n_clusters=min(n_clusters, len(selected)), random_state=42)
-    labels = kmeans.fit_predict(X_p)
-    out = pd.DataFrame({'company': selected, 'cluster': labels})
+    rows, X_p, pca = company_embedding(db_path, top_n)
+    kmeans, labels = fit_clusters(X_p, n_clusters)
+    out = pd.DataFrame({'company': m.companies[rows], 'cluster': labels})
     return out, pca, kmeans
+
+
+def cluster_sweep(db_path='data/visual.db', k_values=range(2, 11), top_n=200, workers=4):
+    """Elbow / silhouette sweep: inertia and silhouette score of a clustering per k, fitted in parallel.
+
+    Silhouette scores use a fixed sample of at most SILHOUETTE_SAMPLE companies.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    _, X, _ = company_embedding(db_path, top_n)
+
+    def run(k):
+        model, labels = fit_clusters(X, k)
+        n_labels = len(np.unique(labels))
+        sil = (silhouette_score(X, labels, sample_size=min(len(X), SILHOUETTE_SAMPLE), random_state=42)
+               if 1 < n_labels < len(X) else np.nan)
+        return k, float(model.inertia_), float(sil)
+
+    # the fits release the GIL in sklearn's compiled code, so threads run them concurrently
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = list(pool.map(run, [k for k in k_values if 2 <= k <= len(X)]))
+    return pd.DataFrame(results, columns=['k', 'inertia', 'silhouette'])
+
+
+def _month_filter(months):
+    """WHERE clause and params for an optional inclusive (first, last) YYYYMM month_key range."""
+    if months is None:
+        return '', ()
+    return 'WHERE month_key BETWEEN ? AND ?', (int(months[0]), int(months[1]))
+
+
+def salary_months(db_path='data/visual.db'):
+    """Sorted YYYYMM month keys present in the salary cube (empty for DBs built before it)."""
+    if not db.has_table('salary_cube', db_path):
+        return []
+    return [r[0] for r in db.fetch_all('SELECT DISTINCT month_key FROM salary_cube ORDER BY month_key', (), db_path)]
+
+
+def salary_distribution(db_path='data/visual.db', months=None):
+    """FixedHistogram of monthly salaries rebuilt from the salary cube, optionally for a month range."""
+    where, params = _month_filter(months)
+    rows = db.fetch_all(f'SELECT bin, SUM(postings) FROM salary_cube {where} GROUP BY bin', params, db_path)
+    hist = FixedHistogram(SALARY_BIN_EDGES[0], SALARY_BIN_EDGES[-1], SALARY_BINS)
+    for b, n in rows:
+        if b >= SALARY_BINS:
+            hist.overflow += int(n)
+        else:
+            hist.counts[b] += int(n)
+    return hist
+
+
+def salary_quantiles_by(db_path='data/visual.db', dimension='category', months=None):
+    """Postings, mean and p10/p25/p50/p75/p90 monthly salary per value of a cube dimension.
+
+    Reads the precomputed salary_quantiles rollup; with a month range the quantiles are
+    computed from the matching cube rows instead. Sorted by postings, largest first.
+    """
+    column = SALARY_DIMENSIONS[dimension]
+    if months is None and db.has_table('salary_quantiles', db_path):
+        out = db.read_sql('SELECT value, postings, mean, p10, p25, p50, p75, p90 FROM salary_quantiles '
+                          'WHERE dimension=?', (dimension,), db_path).set_index('value')
+    else:
+        where, params = _month_filter(months)
+        cube = db.read_sql(f'SELECT {column} AS value, bin, SUM(postings) AS postings, SUM(salary_sum) AS salary_sum '
+                           f'FROM salary_cube {where} GROUP BY {column}, bin', params, db_path)
+        out = cube_quantiles(cube)
+        out.index = out.index.astype(str)
+    out.index.name = dimension
+    return out.sort_values('postings', ascending=False)
+
+
+def keyword_totals(db_path='data/visual.db', top_n=30, contains=None):
+    """Title keywords with their total postings and vacancies, most frequent first.
+
+    `contains` keeps only keywords containing that substring (case-insensitive).
+    """
+    if contains:
+        # % and _ in the filter are literal characters, not wildcards
+        pattern = contains.lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        return db.read_sql("SELECT term, postings, vacancies FROM keyword_totals WHERE term LIKE ? ESCAPE '\\' "
+                           'ORDER BY postings DESC LIMIT ?', (f'%{pattern}%', top_n), db_path)
+    return db.read_sql('SELECT term, postings, vacancies FROM keyword_totals ORDER BY postings DESC LIMIT ?',
+                       (top_n,), db_path)
+
+
+def keyword_trends(db_path='data/visual.db', terms=()):
+    """Monthly postings and vacancies of the given keywords (columns term, month, postings, vacancies)."""
+    terms = list(terms)
+    if not terms:
+        return pd.DataFrame(columns=['term', 'month', 'postings', 'vacancies'])
+    df = db.read_sql(f'SELECT term, month_key, postings, vacancies FROM keyword_monthly WHERE term IN ({_placeholders(terms)}) '
+                     'ORDER BY term, month_key', terms, db_path)
+    df['month'] = pd.to_datetime(df.pop('month_key').astype(str), format='%Y%m')
+    return df[['term', 'month', 'postings', 'vacancies']]
+
+
+def keyword_cooccurrence(db_path='data/visual.db', term='', top_n=20):
+    """Keywords most often found in the same title as `term`.
+
+    `share` is the fraction of `term`'s postings whose title also contains the keyword.
+    """
+    df = db.read_sql('SELECT term_b AS term, postings FROM keyword_cooccurrence WHERE term_a=? '
+                     'ORDER BY postings DESC LIMIT ?', (term.lower(), top_n), db_path)
+    total = db.fetch_all('SELECT postings FROM keyword_totals WHERE term=?', (term.lower(),), db_path)
+    df['share'] = df['postings'] / total[0][0] if total else np.nan
+    return df
+
+
+# search fields -> FTS5 column filter; bm25 weights rank title hits above company and category hits
+SEARCH_FIELDS = {'all': None, 'title': 'title', 'company': 'company', 'category': 'category'}
+SEARCH_WEIGHTS = (10.0, 4.0, 1.0)
+# matches counted (and bm25-ranked) per query; broader queries show "N+" and list newest first
+SEARCH_COUNT_CAP = 50000
+
+
+def fts_query(text, field='all'):
+    """FTS5 MATCH expression for free text: every word must occur (as a word prefix) in `field`.
+
+    Punctuation and FTS operators in `text` are ignored, so any input is a valid query.
+    Returns None when `text` has no words.
+    """
+    words = re.findall(r'\w+', str(text).lower())
+    if not words:
+        return None
+    expr = ' '.join(f'"{w}"*' for w in words)
+    column = SEARCH_FIELDS[field]
+    return f'{column} : ({expr})' if column else expr
+
+
+def count_postings(query, db_path='data/visual.db', field='all', cap=SEARCH_COUNT_CAP):
+    """Number of postings matching `query`, counted up to cap + 1 (more than `cap` means "cap+")."""
+    match = fts_query(query, field)
+    if match is None:
+        return 0
+    rows = db.fetch_all('SELECT count(*) FROM (SELECT 1 FROM postings_fts WHERE postings_fts MATCH ? LIMIT ?)',
+                        (match, cap + 1), db_path)
+    return rows[0][0]
+
+
+def search_postings(query, db_path='data/visual.db', field='all', page=0, page_size=25):
+    """BM25-ranked full-text search over postings_fts (built with `build_visual_db.py --fts`).
+
+    Returns (page of results, `count_postings` total); results have title, company, category,
+    job_id, posted, vacancies, salary (monthly) and score (lower is better). Only the requested
+    page is fetched (LIMIT / OFFSET). Up to SEARCH_COUNT_CAP matches are ranked by FTS5; scoring
+    costs time per match, so broader queries (score NULL) list the newest postings first instead.
+    """
+    match = fts_query(query, field)
+    if match is None:
+        return pd.DataFrame(), 0
+    total = count_postings(query, db_path, field)
+    columns = 'title, company, category, job_id, posted, vacancies, salary'
+    if total > SEARCH_COUNT_CAP:
+        df = db.read_sql(f'SELECT {columns}, NULL AS score FROM postings_fts WHERE postings_fts MATCH ? '
+                         'ORDER BY rowid DESC LIMIT ? OFFSET ?', (match, page_size, page * page_size), db_path)
+        return df, total
+    weights = ', '.join(map(str, SEARCH_WEIGHTS))
+    # rank MATCH sets this query's rank function: bm25 with the column weights
+    df = db.read_sql(f'SELECT {columns}, rank AS score FROM postings_fts WHERE postings_fts MATCH ? AND rank MATCH ? '
+                     'ORDER BY rank LIMIT ? OFFSET ?', (match, f'bm25({weights})', page_size, page * page_size), db_path)
+    return df, total